@@ -0,0 +1,136 @@
+#!/usr/bin/python
+
+from optparse import OptionParser
+import sys
+import os
+import multiprocessing
+
+#Makes the shared 'tgp' package (located in the same directory) importable
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from tgp.analysis import DEFAULT_CENTRAL_GRAN, Diagnoser, aggregate, diagnose, filter_gc, load_samples, load_tasks, merge_diagnoses
+from tgp.compression import find_trace
+from tgp.sketch import QuantileSketch
+
+helper = '''This script runs the diagnosis on the traces of many profiling runs (e.g., the 'traces/' directories of several profiling sessions of the same benchmark configuration), and merges the statistics of all runs.
+
+Each trace directory is analyzed as by pipeline.py, i.e., the CS and CPU traces are filtered (if a GC trace is present), nested tasks are aggregated, and the diagnosis is run on the results. The trace directories are analyzed in parallel by a pool of processes.
+
+For each statistic of the diagnosis (number of tasks, average granularity, percentiles, IQC, whiskers range, percentage of tasks within the whiskers range and around the central granularity, average number of context switches, and average CPU utilization), the script computes the mean across runs and its confidence interval (with a confidence of 0.95, based on the Student's t-distribution since runs are usually few).
+
+The mean of the percentiles of each run is not a percentile of the tasks of all runs. The granularity of the tasks of all runs can also be recorded in a single quantile sketch (--save-sketch), from which characterization/histograms.py (with -S) computes the percentiles of the tasks of all runs.
+
+The script produces a csv file containing the merged statistics, and optionally a csv file containing the statistics of each run. Trace directories which cannot be analyzed (e.g., with missing or malformed traces) are reported and skipped.
+
+Usage: ./batch.py -d <path to trace directory> -d <path to trace directory> ... [-o <path to output file> -r <path to per-run output file> -s <specific class> -g <central granularity> -j <jobs> --save-sketch <path to sketch (output)> --no-cache]
+       ./batch.py [options] <path to trace directory> <path to trace directory> ...'''
+
+#Default name for the output csv file
+DEFAULT_OUT_FILE = "batch-diagnostics.csv"
+#By default, all CPUs are used
+DEFAULT_JOBS = 0
+
+#The names of the traces in a trace directory
+TASKS_FILE = "tasks.csv"
+CS_FILE = "cs.csv"
+CPU_FILE = "cpu.csv"
+GC_FILE = "gc.csv"
+
+def analyze_run(run):
+    '''
+    Analyzes the traces of a run, in a worker process.
+    run: a tuple containing the trace directory, the specific class (None for all tasks), the central granularity, whether the binary cache of the traces is used, and whether the granularity of the tasks is recorded in a quantile sketch.
+    Returns a tuple containing the trace directory, the Diagnosis of the run (None if the run cannot be analyzed), an error message (None if the run has been analyzed), and the QuantileSketch of the granularity of the executed tasks (None if not requested).
+    '''
+    trace_dir, specific_class, central_gran, cache, use_sketch = run
+    paths = {}
+    for name in [TASKS_FILE, CS_FILE, CPU_FILE, GC_FILE]:
+        paths[name] = find_trace(trace_dir, name)
+        if paths[name] is None and name != GC_FILE:
+            return trace_dir, None, "Missing trace: %s" % os.path.join(trace_dir, name), None
+    try:
+        label = "task"
+        tasks = load_tasks(paths[TASKS_FILE], None, cache)
+        label = "CS"
+        cs_trace = load_samples(paths[CS_FILE], "cs", cache)
+        label = "CPU"
+        cpu_trace = load_samples(paths[CPU_FILE], "cpu", cache)
+        if paths[GC_FILE] is not None:
+            label = "GC"
+            cs_trace, cpu_trace = filter_gc(cs_trace, cpu_trace, load_samples(paths[GC_FILE], "gc", cache))
+    except ValueError:
+        return trace_dir, None, "Wrong %s trace format" % label, None
+    try:
+        tasks = aggregate(tasks).tasks
+    except ValueError as error:
+        return trace_dir, None, str(error), None
+    sketch = None
+    if use_sketch:
+        sketch = QuantileSketch()
+        sketch.record(Diagnoser(specific_class).select(tasks)["granularity"])
+    return trace_dir, diagnose(tasks, cs_trace, cpu_trace, specific_class, central_gran), None, sketch
+
+if __name__ == "__main__":
+    #Flags parser
+    parser = OptionParser(helper)
+    parser.add_option('-d', '--traces', dest='trace_dirs', type='string', action='append', help="path to a directory containing the traces produced by tgp (at least 'tasks.csv', 'cs.csv', and 'cpu.csv'). This option can be repeated, and trace directories can also be passed as arguments", metavar="TRACE_DIR")
+    parser.add_option('-o', '--output', dest='output_file', type='string', help="path to the output file containing the statistics merged across runs. If none is provided, then the output file will be produced in the current directory with name 'batch-diagnostics.csv'", metavar="OUTPUT_FILE")
+    parser.add_option('-r', '--runs', dest='runs_file', type='string', help="path to an output file containing the statistics of each run, one run per row", metavar="RUNS_FILE")
+    parser.add_option('-s', '--class', dest='specific_class', type='string', help="a specific class on which focusing the analysis. If none is provided, then all tasks are analyzed", metavar="SPECIFIC_CLASS")
+    parser.add_option('-g', '--gran', dest='gran_central', type='int', help="the central granularity (100000 by default)", metavar="CENTRAL_GRAN")
+    parser.add_option('-j', '--jobs', dest='jobs', type='int', help="the number of trace directories analyzed in parallel. If none or 0 is passed, then all CPUs are used", metavar="JOBS")
+    parser.add_option('--save-sketch', dest='sketch_file', type='string', help="records the granularity of the executed tasks of all runs in a single quantile sketch, and saves it into a NumPy .npz file, from which characterization/histograms.py (with -S) computes the percentiles of the tasks of all runs", metavar="SKETCH_FILE")
+    parser.add_option('--no-cache', dest='no_cache', action='store_true', default=False, help="do not read or write the binary cache of the input traces. By default, the traces are parsed once and their content is cached next to them (e.g., in 'tasks.csv.cache'), so that later runs on the same traces load them faster")
+    (options, arguments) = parser.parse_args()
+    trace_dirs = (options.trace_dirs or []) + arguments
+    if len(trace_dirs) == 0:
+        print(parser.usage)
+        exit(0)
+    if (options.output_file is None):
+        output_file = DEFAULT_OUT_FILE
+    else:
+        output_file = options.output_file
+    runs_file = options.runs_file
+    specific_class = options.specific_class
+    if (options.gran_central is None):
+        gran_central = DEFAULT_CENTRAL_GRAN
+    else:
+        gran_central = options.gran_central
+    if (options.jobs is None):
+        jobs = DEFAULT_JOBS
+    else:
+        jobs = options.jobs
+    if jobs <= 0:
+        jobs = multiprocessing.cpu_count()
+    sketch_file = options.sketch_file
+    cache = not options.no_cache
+
+    print("")
+    print("Analyzing %s runs with %s processes..." % (str(len(trace_dirs)), str(min(jobs, len(trace_dirs)))))
+    if specific_class is not None:
+        print("Restricting the analysis to class: %s" % specific_class)
+
+    pool = multiprocessing.Pool(min(jobs, len(trace_dirs)))
+    runs = []
+    #The quantile sketch of the granularity of the tasks of all runs
+    merged_sketch = QuantileSketch()
+    for trace_dir, diagnosis, error, sketch in pool.imap(analyze_run, [(trace_dir, specific_class, gran_central, cache, sketch_file is not None) for trace_dir in trace_dirs]):
+        if diagnosis is None:
+            print("Skipping %s: %s" % (trace_dir, error))
+        else:
+            runs.append((trace_dir, diagnosis))
+            if sketch is not None:
+                merged_sketch.merge(sketch)
+    pool.close()
+    pool.join()
+
+    if len(runs) == 0:
+        print("No run could be analyzed")
+        exit(-1)
+    print("%s runs out of %s have been analyzed" % (str(len(runs)), str(len(trace_dirs))))
+    merged = merge_diagnoses(runs)
+    print(merged.report())
+    merged.write(output_file)
+    if runs_file is not None:
+        merged.write_runs(runs_file)
+    if sketch_file is not None:
+        merged_sketch.save(sketch_file)
@@ -0,0 +1,226 @@
+#!/usr/bin/python
+
+from __future__ import division
+from optparse import OptionParser
+import sys
+import os
+import csv
+import shlex
+import subprocess
+import time
+
+helper = '''This script measures how the post-processing and characterization scripts scale with the size of the traces. For each requested number of tasks, the script generates synthetic traces (see generate.py), and runs each script on them several times, measuring its wall-clock time, its CPU time, and its peak memory usage (maximum resident set size, including the processes it starts).
+
+The measurements are appended to a result trace (named 'benchmark-results.csv' by default), labeled with the version of tgp being measured (by default, the current git commit), so that the results of different versions can be compared. Another version (e.g., an older checkout of tgp) can be measured on the same traces with --root, and the results of a previous label are compared with the current ones with --compare.
+
+Traces are generated once for each number of tasks, in a subdirectory of the trace directory ('benchmark-traces' by default), and are reused by later runs with the same generator options. By default, scripts are run with --no-cache, so that each run parses the traces. With --cache, each script is first run once to create the cache of the traces, which is then used by the measured runs (for versions which do not support caching, --cache should be passed as well).
+
+The available scripts are: aggregation, aggregation-stream, gc-filtering, diagnose, fine_grained, coarse_grained, and pipeline.
+
+Usage: ./benchmark.py [-n <tasks> -s <script> -r <repeats> -l <label> -d <path to trace directory> -o <path to result trace (output)> --root <path to tgp directory> --generate <generator options> --cache --compare <label>]'''
+
+#Default numbers of tasks
+DEFAULT_SIZES = [100000, 1000000]
+#Default number of runs of each script
+DEFAULT_REPEATS = 3
+#Default directory of the generated traces
+DEFAULT_TRACE_DIR = "benchmark-traces"
+#Default name for the output csv file
+DEFAULT_OUT_FILE = "benchmark-results.csv"
+#Label of the results if none is provided and the version cannot be found
+DEFAULT_LABEL = "unlabeled"
+
+#The directory containing this script
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+
+#The file recording the options of the generator in each trace directory
+PARAMETERS_FILE = "parameters.txt"
+
+#The path of each script (relative to the root directory of tgp), and its arguments given the trace directory and the output directory
+SCRIPTS = [("aggregation", os.path.join("postprocessing", "aggregation.py"), lambda traces, out: ["-t", os.path.join(traces, "tasks.csv"), "-o", os.path.join(out, "aggregated-tasks.csv")]),
+           ("aggregation-stream", os.path.join("postprocessing", "aggregation.py"), lambda traces, out: ["-t", os.path.join(traces, "tasks.csv"), "-o", os.path.join(out, "aggregated-tasks.csv"), "--stream"]),
+           ("gc-filtering", os.path.join("postprocessing", "gc-filtering.py"), lambda traces, out: ["-c", os.path.join(traces, "cs.csv"), "-p", os.path.join(traces, "cpu.csv"), "-g", os.path.join(traces, "gc.csv"),
+                                                                                                   "--outcs", os.path.join(out, "filtered-cs.csv"), "--outcpu", os.path.join(out, "filtered-cpu.csv")]),
+           ("diagnose", os.path.join("characterization", "diagnose.py"), lambda traces, out: ["-t", os.path.join(traces, "tasks.csv"), "-c", os.path.join(traces, "cs.csv"), "-p", os.path.join(traces, "cpu.csv"), "-o", os.path.join(out, "diagnostics.csv")]),
+           ("fine_grained", os.path.join("characterization", "fine_grained.py"), lambda traces, out: ["-t", os.path.join(traces, "tasks.csv"), "-c", os.path.join(traces, "cs.csv"), "-o", os.path.join(out, "fine-grained.csv")]),
+           ("coarse_grained", os.path.join("characterization", "coarse_grained.py"), lambda traces, out: ["-t", os.path.join(traces, "tasks.csv"), "-c", os.path.join(traces, "cs.csv"), "-p", os.path.join(traces, "cpu.csv"), "-o", os.path.join(out, "coarse-grained.csv")]),
+           ("pipeline", "pipeline.py", lambda traces, out: ["-d", traces, "-o", out])]
+
+#The names of the available scripts
+SCRIPT_NAMES = [name for name, path, arguments in SCRIPTS]
+
+#The columns of the result trace
+FIELDNAMES = ["Label", "Script", "Tasks", "Run", "Wall time (s)", "CPU time (s)", "Peak memory (MB)", "Exit code"]
+
+#The measurements of the current label, as rows of the result trace
+results = []
+
+def current_label():
+    '''
+    Returns the short hash of the current git commit of the measured version, or DEFAULT_LABEL if it cannot be found.
+    '''
+    try:
+        with open(os.devnull, 'w') as devnull:
+            label = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=root_dir, stderr=devnull).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return DEFAULT_LABEL
+    return label if label else DEFAULT_LABEL
+
+def prepare_traces(size):
+    '''
+    Generates the traces with the input number of tasks, unless they have already been generated with the same options.
+    Returns the directory containing the traces.
+    '''
+    directory = os.path.join(trace_dir, str(size))
+    arguments = ["-o", directory, "-n", str(size)] + generator_options
+    parameters = " ".join(arguments)
+    stamp = os.path.join(directory, PARAMETERS_FILE)
+    if os.path.isfile(stamp):
+        with open(stamp) as stampfile:
+            if stampfile.read() == parameters:
+                return directory
+    print("Generating traces with %s tasks..." % str(size))
+    if subprocess.call([sys.executable, os.path.join(BENCHMARK_DIR, "generate.py")] + arguments) != 0:
+        print("Failed to generate the traces")
+        exit(-1)
+    with open(stamp, 'w') as stampfile:
+        stampfile.write(parameters)
+    return directory
+
+def run_script(path, arguments):
+    '''
+    Runs a script, discarding its output.
+    Returns its wall-clock time and its CPU time (in seconds), its peak memory usage (in MB), and its exit code.
+    '''
+    with open(os.devnull, 'w') as devnull:
+        start = time.time()
+        process = subprocess.Popen([sys.executable, os.path.join(root_dir, path)] + arguments, stdout=devnull, stderr=devnull)
+        #Unlike Popen.wait, wait4 returns the resource usage of the process (and of the processes it waited for)
+        pid, status, usage = os.wait4(process.pid, 0)
+        wall_time = time.time() - start
+    process.returncode = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -os.WTERMSIG(status)
+    #ru_maxrss is in kilobytes on Linux
+    return wall_time, usage.ru_utime + usage.ru_stime, usage.ru_maxrss / 1024.0, process.returncode
+
+def benchmark(size):
+    '''
+    Runs the selected scripts on the traces with the input number of tasks, printing and recording each measurement.
+    '''
+    traces = prepare_traces(size)
+    output = os.path.join(traces, "results")
+    if not os.path.isdir(output):
+        os.makedirs(output)
+    for name, path, arguments in SCRIPTS:
+        if name not in scripts:
+            continue
+        script_arguments = arguments(traces, output)
+        if cache:
+            run_script(path, script_arguments)
+        else:
+            script_arguments.append("--no-cache")
+        for run in range(1, repeats + 1):
+            wall_time, cpu_time, memory, code = run_script(path, script_arguments)
+            print("Script: %s -> Tasks: %s -> Run: %s -> Wall time: %ss -> CPU time: %ss -> Peak memory: %sMB%s" % (name, str(size), str(run), str(round(wall_time, 3)), str(round(cpu_time, 3)), str(round(memory, 1)), "" if code == 0 else " -> FAILED (exit code %s)" % str(code)))
+            results.append({"Label": label, "Script": name, "Tasks": str(size), "Run": str(run), "Wall time (s)": str(wall_time), "CPU time (s)": str(cpu_time), "Peak memory (MB)": str(memory), "Exit code": str(code)})
+
+def write_results():
+    '''
+    Appends the measurements to the result trace, writing its header if the trace is new.
+    '''
+    new = not os.path.isfile(output_file)
+    with open(output_file, 'a') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES)
+        if new:
+            writer.writeheader()
+        for result in results:
+            writer.writerow(result)
+
+def medians(rows):
+    '''
+    Returns the dictionary associating each (script, number of tasks) pair with the median wall-clock time, CPU time, and peak memory usage of its successful runs among the input rows.
+    '''
+    measurements = {}
+    for row in rows:
+        if row["Exit code"] == "0":
+            measurements.setdefault((row["Script"], int(row["Tasks"])), []).append([float(row[column]) for column in FIELDNAMES[4:7]])
+    result = {}
+    for key, values in measurements.items():
+        columns = list(zip(*values))
+        result[key] = [sorted(column)[len(column) // 2] for column in columns]
+    return result
+
+def compare():
+    '''
+    Prints the ratio between the median measurements of the current label and those of the compared label (read from the result trace), for each script and number of tasks measured by both.
+    '''
+    with open(output_file) as csvfile:
+        previous = [row for row in csv.DictReader(csvfile) if row["Label"] == compared_label]
+    if len(previous) == 0:
+        print("No results labeled %s in %s" % (compared_label, output_file))
+        return
+    old = medians(previous)
+    new = medians(results)
+    print("")
+    print("COMPARISON WITH %s (ratio of the medians, < 1 is better):" % compared_label)
+    for key in sorted(new):
+        if key in old:
+            ratios = [str(round(value / reference, 3)) if reference > 0 else "-" for value, reference in zip(new[key], old[key])]
+            print("Script: %s -> Tasks: %s -> Wall time: %s -> CPU time: %s -> Peak memory: %s" % (key[0], str(key[1]), ratios[0], ratios[1], ratios[2]))
+
+if __name__ == "__main__":
+    #Flags parser
+    parser = OptionParser(helper)
+    parser.add_option('-n', '--tasks', dest='sizes', type='long', action='append', help="the number of tasks of the generated traces. Can be passed several times (10^5 and 10^6 by default)", metavar="TASKS")
+    parser.add_option('-s', '--script', dest='scripts', type='choice', choices=SCRIPT_NAMES, action='append', help="the script to measure. Can be passed several times. If none is provided, then all scripts are measured", metavar="SCRIPT")
+    parser.add_option('-r', '--repeats', dest='repeats', type='int', help="the number of measured runs of each script (3 by default)", metavar="REPEATS")
+    parser.add_option('-l', '--label', dest='label', type='string', help="the label of the measurements in the result trace (by default, the current git commit of the measured version)", metavar="LABEL")
+    parser.add_option('-d', '--traces', dest='trace_dir', type='string', help="path to the directory where the traces are generated. If none is provided, then the traces will be generated in './benchmark-traces'", metavar="TRACE_DIR")
+    parser.add_option('-o', '--output', dest='output_file', type='string', help="the path to the result trace, to which the measurements are appended. If none is provided, then the result trace will be './benchmark-results.csv'", metavar="RESULT_TRACE")
+    parser.add_option('--root', dest='root_dir', type='string', help="path to the root directory of the version of tgp to measure (by default, the one containing this script)", metavar="ROOT_DIR")
+    parser.add_option('--generate', dest='generator_options', type='string', help="additional options passed to generate.py (e.g., \"-d 3 -f 8\")", metavar="OPTIONS")
+    parser.add_option('--cache', dest='cache', action='store_true', default=False, help="measure the scripts when the cache of the traces is used, instead of passing --no-cache")
+    parser.add_option('--compare', dest='compared_label', type='string', help="compare the measurements with those of a previous label in the result trace", metavar="LABEL")
+    (options, arguments) = parser.parse_args()
+    if (options.sizes is None):
+        sizes = DEFAULT_SIZES
+    else:
+        sizes = options.sizes
+    if (options.scripts is None):
+        scripts = SCRIPT_NAMES
+    else:
+        scripts = options.scripts
+    if (options.repeats is None):
+        repeats = DEFAULT_REPEATS
+    else:
+        repeats = options.repeats
+    if (options.trace_dir is None):
+        trace_dir = DEFAULT_TRACE_DIR
+    else:
+        trace_dir = options.trace_dir
+    if (options.output_file is None):
+        output_file = DEFAULT_OUT_FILE
+    else:
+        output_file = options.output_file
+    if (options.root_dir is None):
+        root_dir = os.path.dirname(BENCHMARK_DIR)
+    else:
+        root_dir = os.path.abspath(options.root_dir)
+    if (options.generator_options is None):
+        generator_options = []
+    else:
+        generator_options = shlex.split(options.generator_options)
+    if (options.label is None):
+        label = current_label()
+    else:
+        label = options.label
+    cache = options.cache
+    compared_label = options.compared_label
+
+    print("")
+    print("Starting benchmark of %s (label: %s)..." % (root_dir, label))
+    for size in sizes:
+        benchmark(size)
+    write_results()
+    if compared_label is not None:
+        compare()
+    print("")
@@ -0,0 +1,329 @@
+#!/usr/bin/python
+
+from __future__ import division
+from optparse import OptionParser
+import sys
+import os
+import numpy
+
+#Makes the shared 'tgp' package (located in the parent directory) importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from tgp.compression import EXTENSIONS, open_trace
+
+helper = '''This script generates synthetic traces in the format produced by tgp in the bytecode profiling mode (a task trace, a CS trace, a CPU trace, and a GC trace), e.g., to measure how the post-processing and characterization scripts scale with the size of the traces.
+
+The application is modeled as a pool of worker threads executing trees of tasks in rounds: in each round, each thread executes several outer tasks one after the other, and each outer task executes its nested tasks (up to the maximum nesting depth, each task spawning FAN_OUT nested tasks on average) within its own execution. Rounds are separated by short idle periods. The granularity of each task follows a log-normal distribution, whose median depends on the class of the task (log-uniformly distributed between MIN_GRAN and MAX_GRAN across classes), and the execution time of a task is its granularity (in nanoseconds) plus the execution time of its nested tasks. A small fraction of the tasks is created but never executed.
+
+Tasks are written in order of entry execution time (followed by the tasks which are not executed in the same round), and are generated in rounds, so traces with hundreds of millions of tasks can be generated without keeping them in memory. As tasks are generated by whole trees, the number of generated tasks can slightly differ from the requested one.
+
+CS and CPU measurements are sampled periodically (every 100ms and 150ms by default, as tgp does), and GC cycles occur at exponentially distributed intervals.
+
+The traces ('tasks.csv', 'cs.csv', 'cpu.csv', and 'gc.csv') are produced in the output directory ('synthetic-traces' by default). The same seed always produces the same traces.
+
+Usage: ./generate.py [-o <path to output directory> -n <tasks> -T <threads> -d <depth> -f <fan-out> -C <classes> -g <MIN_GRAN> -G <MAX_GRAN> --gc-interval <ms> --gc-pause <ms> --unexecuted <fraction> -s <seed> --compress <format>]'''
+
+#Default output directory
+DEFAULT_OUT_DIR = "synthetic-traces"
+#Default number of tasks
+DEFAULT_TASKS = 1000000
+#Default number of worker threads
+DEFAULT_THREADS = 8
+#Default maximum nesting depth
+DEFAULT_DEPTH = 2
+#Default average number of nested tasks spawned by a task
+DEFAULT_FAN_OUT = 4
+#Default number of task classes
+DEFAULT_CLASSES = 50
+#Default minimum and maximum median granularity of a class
+DEFAULT_MIN_GRAN = 1000
+DEFAULT_MAX_GRAN = 10000000
+#Default average interval between two GC cycles, and default median duration of a GC cycle (in milliseconds)
+DEFAULT_GC_INTERVAL = 1000
+DEFAULT_GC_PAUSE = 20
+#Default fraction of tasks which are not executed
+DEFAULT_UNEXECUTED = 0.01
+#Default seed
+DEFAULT_SEED = 0
+
+#The average number of tasks generated in a round
+ROUND_TASKS = 65536
+#The standard deviation of the logarithm of the granularity of the tasks of a class
+GRAN_SIGMA = 0.5
+#The probability that a nested task belongs to the same class as its outer task
+SAME_CLASS = 0.5
+#The average idle time of the threads between two rounds, and the average delay between two outer tasks executed by a thread (in nanoseconds)
+ROUND_GAP = 100000
+THREAD_DELAY = 10000
+#The sampling periods of CS and CPU measurements (in nanoseconds)
+CS_PERIOD = 100000000
+CPU_PERIOD = 150000000
+#The average number of context switches per 100ms
+CS_RATE = 50
+#The timestamp of the beginning of the execution (tgp uses System.nanoTime, whose origin is arbitrary)
+START_TIME = 7000000000000000
+
+#The header of each trace
+TASK_HEADER = ["ID", "Class", "Outer Task ID", "Execution N.", "Creation thread ID", "Creation thread class", "Creation thread name", "Execution thread ID", "Execution thread class", "Execution thread name",
+               "Executor ID", "Executor class", "Entry execution time", "Exit execution time", "Granularity", "Is Thread", "Is Runnable", "Is Callable", "Is ForkJoinTask", "Is run() executed", "Is call() executed", "Is exec() executed"]
+CS_HEADER = ["Timestamp (ns)", "Context Switches"]
+CPU_HEADER = ["Timestamp (ns)", "CPU utilization (user)", "CPU utilization (kernel)"]
+
+#The thread creating outer tasks, the worker threads, and the executor
+MAIN_THREAD = (1, "java.lang.Thread", "main")
+WORKER_CLASS = "java.util.concurrent.ForkJoinWorkerThread"
+WORKER_NAME = "ForkJoinPool-1-worker-%d"
+FIRST_WORKER_ID = 10
+EXECUTOR = (1000, "java.util.concurrent.ForkJoinPool")
+
+#The generator of random numbers
+random = None
+
+#The end of the execution, i.e., the exit execution time of the last task
+end_time = START_TIME
+
+def class_medians():
+    '''
+    Returns the median granularity of each class, log-uniformly distributed between min_gran and max_gran.
+    '''
+    return numpy.exp(random.uniform(numpy.log(min_gran), numpy.log(max_gran), classes))
+
+def class_flags(task_class, executed):
+    '''
+    Returns the flags of a task of a class: tasks of each class are either Runnable, Callable, or ForkJoinTask, and their execution method is executed if the task is executed.
+    '''
+    kind = task_class % 3
+    flags = ["F", "T" if kind == 0 else "F", "T" if kind == 1 else "F", "T" if kind == 2 else "F"]
+    return ",".join(flags + [("T" if executed and kind == index else "F") for index in range(3)])
+
+def trees_per_round(remaining):
+    '''
+    Returns the number of outer tasks executed by each thread in a round, such that a round contains about ROUND_TASKS tasks on average, or about the remaining number of tasks if smaller.
+    '''
+    tree_size = sum([fan_out ** level for level in range(depth + 1)])
+    return max(min(ROUND_TASKS, remaining) // (threads * tree_size), 1)
+
+def generate_round(start, medians, remaining):
+    '''
+    Generates the task trees executed by the worker threads in a round starting at the input time (see trees_per_round).
+    Returns a dictionary associating each column ('parent', 'class', 'thread', 'entry', 'exit', 'granularity') with an array, where tasks are sorted by entry execution time and parents are indices in the same arrays (-1 for outer tasks).
+    '''
+    #Each thread executes the same number of outer tasks, one after the other
+    roots = threads * trees_per_round(remaining)
+    #Builds the trees level by level, each nested task following its siblings
+    parents = [numpy.full(roots, -1, dtype=numpy.int64)]
+    task_classes = [random.randint(0, classes, roots)]
+    for level in range(depth):
+        counts = random.randint(0, 2 * fan_out + 1, len(parents[-1]))
+        level_parents = numpy.repeat(numpy.arange(len(parents[-1])), counts)
+        inherited = numpy.repeat(task_classes[-1], counts)
+        task_classes.append(numpy.where(random.random_sample(len(level_parents)) < SAME_CLASS, inherited, random.randint(0, classes, len(level_parents))))
+        parents.append(level_parents)
+    grans = [numpy.maximum(numpy.round(random.lognormal(numpy.log(medians[level_classes]), GRAN_SIGMA)), 1).astype(numpy.int64) for level_classes in task_classes]
+    #The execution time of a task is its granularity plus the execution time of its nested tasks
+    durations = [gran.copy() for gran in grans]
+    for level in range(depth, 0, -1):
+        numpy.add.at(durations[level - 1], parents[level], durations[level])
+    #Outer tasks are assigned to threads round-robin, and each one starts after a short delay once the previous one of the same thread exits
+    delays = numpy.round(random.exponential(THREAD_DELAY, roots)).astype(numpy.int64).reshape(-1, threads)
+    busy = (delays + durations[0].reshape(-1, threads)).cumsum(axis=0)
+    entries = [(start + busy - durations[0].reshape(-1, threads)).reshape(-1)]
+    workers = [numpy.arange(roots) % threads]
+    for level in range(1, depth + 1):
+        level_parents = parents[level]
+        if len(level_parents) == 0:
+            entries.append(numpy.zeros(0, dtype=numpy.int64))
+            workers.append(numpy.zeros(0, dtype=numpy.int64))
+            continue
+        #The execution time of the previous siblings of each task
+        preceding = numpy.cumsum(durations[level]) - durations[level]
+        first = numpy.flatnonzero(numpy.r_[True, level_parents[1:] != level_parents[:-1]])
+        preceding -= numpy.repeat(preceding[first], numpy.diff(numpy.r_[first, len(level_parents)]))
+        entries.append(entries[level - 1][level_parents] + grans[level - 1][level_parents] + preceding)
+        workers.append(workers[level - 1][level_parents])
+    #Numbers all tasks of the round in level order, and sorts them by entry execution time
+    offsets = numpy.cumsum([0] + [len(level_parents) for level_parents in parents])
+    all_parents = numpy.concatenate([parents[0]] + [parents[level] + offsets[level - 1] for level in range(1, depth + 1)])
+    all_entries = numpy.concatenate(entries)
+    order = numpy.argsort(all_entries, kind='mergesort')
+    rank = numpy.empty(len(order), dtype=numpy.int64)
+    rank[order] = numpy.arange(len(order))
+    round_parents = all_parents[order]
+    return {"parent": numpy.where(round_parents >= 0, rank[numpy.maximum(round_parents, 0)], -1),
+            "class": numpy.concatenate(task_classes)[order],
+            "thread": numpy.concatenate(workers)[order],
+            "entry": all_entries[order],
+            "exit": (all_entries + numpy.concatenate(durations))[order],
+            "granularity": numpy.concatenate(grans)[order]}
+
+def task_rows(tasks, first_id, class_names):
+    '''
+    Formats the tasks generated in a round as rows of the task trace.
+    first_id: the ID of the first task of the round (tasks are numbered in order of entry execution time).
+    '''
+    rows = []
+    for index, (parent, task_class, thread, entry, exit_time, gran) in enumerate(zip(tasks["parent"].tolist(), tasks["class"].tolist(), tasks["thread"].tolist(),
+                                                                                     tasks["entry"].tolist(), tasks["exit"].tolist(), tasks["granularity"].tolist())):
+        worker = (FIRST_WORKER_ID + thread, WORKER_CLASS, WORKER_NAME % (thread + 1))
+        creator = MAIN_THREAD if parent < 0 else worker
+        rows.append("%d,%s,%d,1,%d,%s,%s,%d,%s,%s,%d,%s,%d,%d,%d,%s\n" % ((first_id + index, class_names[task_class], 0 if parent < 0 else first_id + parent) + creator + worker + EXECUTOR + (entry, exit_time, gran, class_flags(task_class, True))))
+    return rows
+
+def unexecuted_rows(count, first_id, class_names):
+    '''
+    Formats tasks which are created by the main thread but never executed as rows of the task trace.
+    '''
+    rows = []
+    for index, task_class in enumerate(random.randint(0, classes, count).tolist()):
+        rows.append("%d,%s,-1,0,%d,%s,%s,-1,null,null,-1,null,-1,-1,0,%s\n" % ((first_id + index, class_names[task_class]) + MAIN_THREAD + (class_flags(task_class, False),)))
+    return rows
+
+def write_tasks():
+    '''
+    Generates the task trace, round by round.
+    '''
+    global end_time
+    medians = class_medians()
+    class_names = ["synthetic.Task%d" % index for index in range(classes)]
+    generated = 0
+    start = START_TIME
+    with open_trace(trace_path("tasks.csv"), 'w') as csvfile:
+        csvfile.write(",".join(TASK_HEADER) + "\n")
+        while generated < tasks_number:
+            tasks = generate_round(start, medians, tasks_number - generated)
+            count = len(tasks["entry"])
+            csvfile.write("".join(task_rows(tasks, generated + 1, class_names)))
+            generated += count
+            unexecuted = random.binomial(count, unexecuted_fraction)
+            csvfile.write("".join(unexecuted_rows(unexecuted, generated + 1, class_names)))
+            generated += unexecuted
+            end_time = int(tasks["exit"].max())
+            start = end_time + int(random.exponential(ROUND_GAP))
+    print("Tasks: %s -> Execution time: %s s" % (str(generated), str((end_time - START_TIME) / 1000000000.0)))
+
+def write_samples():
+    '''
+    Generates the CS and the CPU traces, sampling the whole execution periodically.
+    '''
+    cs_times = numpy.arange(START_TIME + CS_PERIOD, end_time + CS_PERIOD, CS_PERIOD)
+    with open_trace(trace_path("cs.csv"), 'w') as csvfile:
+        csvfile.write(",".join(CS_HEADER) + "\n")
+        csvfile.write("".join(["%d,%d\n" % row for row in zip(cs_times.tolist(), random.poisson(CS_RATE, len(cs_times)).tolist())]))
+    cpu_times = numpy.arange(START_TIME + CPU_PERIOD, end_time + CPU_PERIOD, CPU_PERIOD)
+    user = numpy.round(random.uniform(0, 100, len(cpu_times)), 1)
+    system = numpy.round(random.uniform(0, 100, len(cpu_times)) * (100 - user) / 500, 1)
+    with open_trace(trace_path("cpu.csv"), 'w') as csvfile:
+        csvfile.write(",".join(CPU_HEADER) + "\n")
+        csvfile.write("".join(["%d,%.1f,%.1f\n" % row for row in zip(cpu_times.tolist(), user.tolist(), system.tolist())]))
+    print("CS measurements: %s -> CPU measurements: %s" % (str(len(cs_times)), str(len(cpu_times))))
+
+def write_gc():
+    '''
+    Generates the GC trace, where GC cycles start at exponentially distributed intervals. No trace is produced if no GC cycle occurs, as with tgp.
+    '''
+    cycles = 0
+    path = trace_path("gc.csv")
+    if os.path.isfile(path):
+        os.remove(path)
+    if gc_interval > 0:
+        rows = []
+        time = START_TIME
+        while True:
+            start = time + int(random.exponential(gc_interval * 1000000))
+            end = start + int(random.lognormal(numpy.log(gc_pause * 1000000), GRAN_SIGMA))
+            if end > end_time:
+                break
+            rows.append("Start GC,%d\nEnd GC,%d\n" % (start, end))
+            time = end
+        if len(rows) > 0:
+            with open_trace(path, 'w') as csvfile:
+                csvfile.write("".join(rows))
+        cycles = len(rows)
+    print("GC cycles: %s" % str(cycles))
+
+def trace_path(name):
+    '''
+    Returns the path to a trace in the output directory, with the extension of the compression format of the traces (if any).
+    '''
+    if compress is None:
+        return os.path.join(output_dir, name)
+    return os.path.join(output_dir, name + "." + compress)
+
+if __name__ == "__main__":
+    #Flags parser
+    parser = OptionParser(helper)
+    parser.add_option('-o', '--output', dest='output_dir', type='string', help="path to the directory where the traces will be produced. If none is provided, then the traces will be produced in './synthetic-traces'", metavar="OUTPUT_DIR")
+    parser.add_option('-n', '--tasks', dest='tasks_number', type='long', help="the number of tasks to generate (10^6 by default)", metavar="TASKS")
+    parser.add_option('-T', '--threads', dest='threads', type='int', help="the number of worker threads (8 by default)", metavar="THREADS")
+    parser.add_option('-d', '--depth', dest='depth', type='int', help="the maximum nesting depth of tasks (2 by default). If 0 is passed, then no task is nested", metavar="DEPTH")
+    parser.add_option('-f', '--fan-out', dest='fan_out', type='int', help="the average number of nested tasks executed by a task (4 by default)", metavar="FAN_OUT")
+    parser.add_option('-C', '--classes', dest='classes', type='int', help="the number of task classes (50 by default)", metavar="CLASSES")
+    parser.add_option('-g', '--min-granularity', dest='min_gran', type='float', help="sets MIN_GRAN, the smallest median granularity of a class (10^3 by default)", metavar="MIN_GRAN")
+    parser.add_option('-G', '--max-granularity', dest='max_gran', type='float', help="sets MAX_GRAN, the largest median granularity of a class (10^7 by default)", metavar="MAX_GRAN")
+    parser.add_option('--gc-interval', dest='gc_interval', type='float', help="the average interval between two GC cycles, in milliseconds (1000 by default). If 0 is passed, then no GC cycle occurs", metavar="INTERVAL")
+    parser.add_option('--gc-pause', dest='gc_pause', type='float', help="the median duration of a GC cycle, in milliseconds (20 by default)", metavar="PAUSE")
+    parser.add_option('--unexecuted', dest='unexecuted_fraction', type='float', help="the fraction of tasks which are created but not executed (0.01 by default)", metavar="FRACTION")
+    parser.add_option('-s', '--seed', dest='seed', type='int', help="the seed of the generator of random numbers (0 by default)", metavar="SEED")
+    parser.add_option('--compress', dest='compress', type='choice', choices=[extension[1:] for extension in EXTENSIONS], help="compress the traces with the given format, i.e., 'gz', 'bz2', 'xz', or 'zst' (e.g., producing 'tasks.csv.gz')", metavar="FORMAT")
+    (options, arguments) = parser.parse_args()
+    if (options.output_dir is None):
+        output_dir = DEFAULT_OUT_DIR
+    else:
+        output_dir = options.output_dir
+    if (options.tasks_number is None):
+        tasks_number = DEFAULT_TASKS
+    else:
+        tasks_number = options.tasks_number
+    if (options.threads is None):
+        threads = DEFAULT_THREADS
+    else:
+        threads = options.threads
+    if (options.depth is None):
+        depth = DEFAULT_DEPTH
+    else:
+        depth = options.depth
+    if (options.fan_out is None):
+        fan_out = DEFAULT_FAN_OUT
+    else:
+        fan_out = options.fan_out
+    if (options.classes is None):
+        classes = DEFAULT_CLASSES
+    else:
+        classes = options.classes
+    if (options.min_gran is None):
+        min_gran = DEFAULT_MIN_GRAN
+    else:
+        min_gran = options.min_gran
+    if (options.max_gran is None):
+        max_gran = DEFAULT_MAX_GRAN
+    else:
+        max_gran = options.max_gran
+    if (options.gc_interval is None):
+        gc_interval = DEFAULT_GC_INTERVAL
+    else:
+        gc_interval = options.gc_interval
+    if (options.gc_pause is None):
+        gc_pause = DEFAULT_GC_PAUSE
+    else:
+        gc_pause = options.gc_pause
+    if (options.unexecuted_fraction is None):
+        unexecuted_fraction = DEFAULT_UNEXECUTED
+    else:
+        unexecuted_fraction = options.unexecuted_fraction
+    if (options.seed is None):
+        seed = DEFAULT_SEED
+    else:
+        seed = options.seed
+    compress = options.compress
+    if threads < 1 or classes < 1 or depth < 0 or fan_out < 0 or min_gran < 1 or max_gran < min_gran:
+        print("Invalid parameters")
+        exit(-1)
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+    random = numpy.random.RandomState(seed)
+
+    print("")
+    print("Generating traces...")
+    write_tasks()
+    write_samples()
+    write_gc()
+    print("")
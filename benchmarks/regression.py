@@ -0,0 +1,237 @@
+#!/usr/bin/python
+
+from optparse import OptionParser
+import sys
+import os
+import csv
+import filecmp
+import shutil
+import subprocess
+import tarfile
+import tempfile
+
+helper = '''This script checks that the post-processing and characterization scripts produce the same results as a reference version of tgp (by default, the last git commit), e.g., before committing a change that should not alter any result.
+
+The test traces of the repository ('postprocessing/tests-aggregation', 'postprocessing/tests-gc-filtering', and 'characterization/tests') are copied to a temporary directory. Then aggregation.py, gc-filtering.py, diagnose.py, fine_grained.py, and coarse_grained.py are run on them (with their default options and with a few other thresholds) by both versions. The output traces, the standard output, and the exit code of each run must be byte-identical. Standard error is ignored, e.g., warnings of different versions of NumPy.
+
+The script also checks that the statistics of each class computed by diagnose.py with '--group-by class' are the same as those computed with '-s <class>', except for the last digits of the CS and CPU averages, as measurements are summed in a different order.
+
+The reference version is either a git revision of the repository containing this script (exported with 'git archive'), or another checkout of tgp (--reference). The script exits with a non-zero code if any check fails.
+
+Usage: ./regression.py [-r <git revision> --reference <path to tgp directory> -k]'''
+
+#Default reference revision
+DEFAULT_REVISION = "HEAD"
+
+#The directory containing this script
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+
+#The root directory of the checked version
+ROOT_DIR = os.path.dirname(BENCHMARK_DIR)
+
+#The directories of the test traces, relative to the root directory
+CHARACTERIZATION_TESTS = os.path.join("characterization", "tests")
+AGGREGATION_TESTS = os.path.join("postprocessing", "tests-aggregation")
+GC_FILTERING_TESTS = os.path.join("postprocessing", "tests-gc-filtering")
+TEST_DIRS = [CHARACTERIZATION_TESTS, AGGREGATION_TESTS, GC_FILTERING_TESTS]
+
+#The file containing the standard output of a run
+OUTPUT_FILE = "output.txt"
+
+#The statistics which --group-by computes by summing the measurements in a different order (see tgp.groups.group_diagnose), and the maximum relative difference allowed for them
+ROUNDED_STATISTICS = ["Average number of context switches", "Average CPU utilization", "STD CPU utilization"]
+TOLERANCE = 1e-9
+
+def characterization_traces(inputs, kinds):
+    '''
+    Returns the arguments passing the characterization test traces of the input kinds ("t", "c", or "p") to a script.
+    '''
+    names = {"t": "test-tasks.csv", "c": "test-cs.csv", "p": "test-cpu.csv"}
+    arguments = []
+    for kind in kinds:
+        arguments += ["-" + kind, os.path.join(inputs, CHARACTERIZATION_TESTS, names[kind])]
+    return arguments
+
+def test_cases():
+    '''
+    Returns the list of test cases: for each one, its name, the path of the script (relative to the root directory), and its arguments given the directory of the test traces. Output traces are written in the current directory.
+    '''
+    diagnose = os.path.join("characterization", "diagnose.py")
+    fine_grained = os.path.join("characterization", "fine_grained.py")
+    coarse_grained = os.path.join("characterization", "coarse_grained.py")
+    cases = []
+    for central in ["100000", "10", "34543"]:
+        cases.append(("diagnose-g%s" % central, diagnose, lambda inputs, central=central: characterization_traces(inputs, "tcp") + ["-g", central, "-o", "diagnostics.csv"]))
+    cases.append(("diagnose-class3", diagnose, lambda inputs: characterization_traces(inputs, "tcp") + ["-s", "class3", "-o", "diagnostics.csv"]))
+    cases.append(("fine_grained", fine_grained, lambda inputs: characterization_traces(inputs, "tc") + ["-o", "fine-grained.csv"]))
+    cases.append(("fine_grained-thresholds", fine_grained, lambda inputs: characterization_traces(inputs, "tc") + ["-G", "1000000", "-D", "500000", "-m", "2", "-o", "fine-grained.csv"]))
+    cases.append(("coarse_grained", coarse_grained, lambda inputs: characterization_traces(inputs, "tcp") + ["-o", "coarse-grained.csv"]))
+    cases.append(("coarse_grained-thresholds", coarse_grained, lambda inputs: characterization_traces(inputs, "tcp") + ["-g", "1000", "-G", "100000000", "-S", "10", "-o", "coarse-grained.csv"]))
+    for name in sorted(os.listdir(os.path.join(ROOT_DIR, AGGREGATION_TESTS))):
+        if name.endswith(".csv"):
+            cases.append(("aggregation-" + name[:-len(".csv")], os.path.join("postprocessing", "aggregation.py"), lambda inputs, name=name: ["-t", os.path.join(inputs, AGGREGATION_TESTS, name), "-o", "aggregated-tasks.csv"]))
+    for mode in ["in", "mix", "out"]:
+        cases.append(("gc-filtering-" + mode, os.path.join("postprocessing", "gc-filtering.py"), lambda inputs, mode=mode: ["-c", os.path.join(inputs, GC_FILTERING_TESTS, "cs.csv"), "-p", os.path.join(inputs, GC_FILTERING_TESTS, "cpu_%s_cs.csv" % mode), "-g", os.path.join(inputs, GC_FILTERING_TESTS, "gc_%s_cs.csv" % mode),
+                                                                                                        "--outcs", "filtered-cs.csv", "--outcpu", "filtered-cpu.csv"]))
+    return cases
+
+def copy_inputs(inputs):
+    '''
+    Copies the test traces into the input directory, replacing any previous copy (and the binary cache created next to it by previous runs).
+    '''
+    if os.path.isdir(inputs):
+        shutil.rmtree(inputs)
+    for directory in TEST_DIRS:
+        shutil.copytree(os.path.join(ROOT_DIR, directory), os.path.join(inputs, directory))
+
+def is_revision(revision):
+    '''
+    Returns true if the input is a git revision of the repository containing this script, false otherwise.
+    '''
+    with open(os.devnull, 'w') as devnull:
+        try:
+            return subprocess.call(["git", "rev-parse", "--verify", "--quiet", revision + "^{commit}"], cwd=ROOT_DIR, stdout=devnull, stderr=devnull) == 0
+        except OSError:
+            return False
+
+def export_revision(revision, path):
+    '''
+    Exports a git revision of the repository containing this script into a directory.
+    '''
+    with open(os.devnull, 'w') as devnull:
+        process = subprocess.Popen(["git", "archive", "--format=tar", revision], cwd=ROOT_DIR, stdout=subprocess.PIPE, stderr=devnull)
+        archive = tarfile.open(fileobj=process.stdout, mode='r|')
+        archive.extractall(path)
+        archive.close()
+        process.wait()
+
+def run_cases(root, inputs, output):
+    '''
+    Runs all test cases with the scripts of a version of tgp, each one in its own subdirectory of the output directory, where its standard output is written as well.
+    The test traces are copied again for each version, so that the binary cache created by a version is not read by the other one.
+    Returns the dictionary associating the name of each test case with its exit code.
+    '''
+    copy_inputs(inputs)
+    codes = {}
+    for name, path, arguments in test_cases():
+        directory = os.path.join(output, name)
+        os.makedirs(directory)
+        with open(os.path.join(directory, OUTPUT_FILE), 'w') as outfile:
+            with open(os.devnull, 'w') as devnull:
+                codes[name] = subprocess.call([sys.executable, os.path.join(root, path)] + arguments(inputs), cwd=directory, stdout=outfile, stderr=devnull)
+    return codes
+
+def compare_cases(codes, reference_codes, output, reference_output):
+    '''
+    Compares the results of each test case with those of the reference version, printing the result of each comparison.
+    Returns the number of test cases whose results differ.
+    '''
+    failures = 0
+    for name, path, arguments in test_cases():
+        directory = os.path.join(output, name)
+        reference_directory = os.path.join(reference_output, name)
+        files = sorted(set(os.listdir(directory)) | set(os.listdir(reference_directory)))
+        different = [filename for filename in files if not os.path.isfile(os.path.join(directory, filename)) or not os.path.isfile(os.path.join(reference_directory, filename)) or not filecmp.cmp(os.path.join(directory, filename), os.path.join(reference_directory, filename), shallow=False)]
+        if codes[name] != reference_codes[name]:
+            different.append("exit code %s instead of %s" % (str(codes[name]), str(reference_codes[name])))
+        if len(different) > 0:
+            failures += 1
+            print("Test: %s -> DIFFERENT: %s" % (name, ", ".join(different)))
+        else:
+            print("Test: %s -> ok" % name)
+    return failures
+
+def read_rows(path):
+    '''
+    Returns the rows of a csv file, as dictionaries.
+    '''
+    with open(path) as csvfile:
+        return list(csv.DictReader(csvfile))
+
+def same_statistic(name, value, reference):
+    '''
+    Returns true if the value of a statistic computed with --group-by is the same as the one computed with -s, false otherwise.
+    '''
+    if value == reference:
+        return True
+    if name not in ROUNDED_STATISTICS or reference is None:
+        return False
+    return abs(float(value) - float(reference)) <= TOLERANCE * max(abs(float(reference)), 1)
+
+def check_groups(inputs, output):
+    '''
+    Checks that the statistics of each class computed by diagnose.py with '--group-by class' are the same as those computed with '-s <class>' (except for the last digits of ROUNDED_STATISTICS), printing the result of each comparison.
+    Returns the number of classes whose statistics differ.
+    '''
+    script = os.path.join(ROOT_DIR, "characterization", "diagnose.py")
+    directory = os.path.join(output, "group-by-class")
+    os.makedirs(directory)
+    failures = 0
+    with open(os.devnull, 'w') as devnull:
+        if subprocess.call([sys.executable, script, "--group-by", "class", "-o", "groups.csv"] + characterization_traces(inputs, "tcp"), cwd=directory, stdout=devnull, stderr=devnull) != 0:
+            print("Test: group-by-class -> FAILED")
+            return 1
+        for group in read_rows(os.path.join(directory, "groups.csv")):
+            task_class = group["Class"]
+            class_file = "class-%s.csv" % task_class
+            if subprocess.call([sys.executable, script, "-s", task_class, "-o", class_file] + characterization_traces(inputs, "tcp"), cwd=directory, stdout=devnull, stderr=devnull) != 0:
+                failures += 1
+                print("Test: group-by-class -> Class: %s -> FAILED" % task_class)
+                continue
+            statistics = read_rows(os.path.join(directory, class_file))[0]
+            different = [name for name in group if name != "Class" and not same_statistic(name, group[name], statistics.get(name))]
+            if len(different) > 0:
+                failures += 1
+                print("Test: group-by-class -> Class: %s -> DIFFERENT: %s" % (task_class, ", ".join(different)))
+            else:
+                print("Test: group-by-class -> Class: %s -> ok" % task_class)
+    return failures
+
+if __name__ == "__main__":
+    #Flags parser
+    parser = OptionParser(helper)
+    parser.add_option('-r', '--revision', dest='revision', type='string', help="the git revision of the reference version ('HEAD' by default)", metavar="REVISION")
+    parser.add_option('--reference', dest='reference_dir', type='string', help="path to the root directory of the reference version of tgp, instead of a git revision", metavar="ROOT_DIR")
+    parser.add_option('-k', '--keep', dest='keep', action='store_true', default=False, help="keep the temporary directory containing the results of both versions, e.g., to inspect the differences")
+    (options, arguments) = parser.parse_args()
+    if options.revision is not None and options.reference_dir is not None:
+        print("-r cannot be combined with --reference")
+        exit(-1)
+    if (options.revision is None):
+        revision = DEFAULT_REVISION
+    else:
+        revision = options.revision
+    keep = options.keep
+    if options.reference_dir is None and not is_revision(revision):
+        print("Unknown git revision: %s" % revision)
+        exit(-1)
+    if options.reference_dir is not None and not os.path.isdir(options.reference_dir):
+        print("Missing reference directory: %s" % options.reference_dir)
+        exit(-1)
+
+    work_dir = tempfile.mkdtemp(prefix="tgp-regression-")
+    if (options.reference_dir is None):
+        reference_dir = os.path.join(work_dir, "reference")
+        export_revision(revision, reference_dir)
+        reference_label = revision
+    else:
+        reference_dir = os.path.abspath(options.reference_dir)
+        reference_label = reference_dir
+    inputs = os.path.join(work_dir, "inputs")
+
+    print("")
+    print("Comparing %s with %s..." % (ROOT_DIR, reference_label))
+    reference_codes = run_cases(reference_dir, inputs, os.path.join(work_dir, "reference-results"))
+    codes = run_cases(ROOT_DIR, inputs, os.path.join(work_dir, "results"))
+    failures = compare_cases(codes, reference_codes, os.path.join(work_dir, "results"), os.path.join(work_dir, "reference-results"))
+    failures += check_groups(inputs, os.path.join(work_dir, "results"))
+
+    print("")
+    if keep:
+        print("The results have been kept in %s" % work_dir)
+    else:
+        shutil.rmtree(work_dir)
+    if failures > 0:
+        print("%s checks failed" % str(failures))
+        exit(-1)
+    print("All checks passed")
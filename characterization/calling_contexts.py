@@ -0,0 +1,185 @@
+#!/usr/bin/python
+
+from __future__ import division
+from optparse import OptionParser
+import sys
+import os
+import csv
+
+#Makes the shared 'tgp' package (located in the parent directory) importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from tgp.compression import open_trace
+from tgp.contexts import CallingContextTree, FrameTable, GranularityIndex, CONTEXT_KINDS, iter_contexts
+from tgp.traces import load_tasks
+
+helper = '''This script builds the calling-context trees of the tasks profiled in the calling-context profiling mode, i.e., one tree for each kind of calling context (collected upon the creation, submission, and execution of a task). Each node of a tree stands for a method open on the call stack, and counts the tasks whose calling context ends at that method.
+
+The task trace can be either in CSV or in compact format (see postprocessing/cc-compaction.py), and is read as a stream: contexts sharing a prefix share the nodes of the prefix, so that traces with millions of long calling contexts can be analyzed without keeping them in memory.
+
+Optionally, the script joins the calling contexts with the task trace produced by a bytecode or reference-cycles profiling run of the same application (on task ID and execution number), computing the granularity of the tasks created, submitted, or executed under each node.
+
+The nodes of the trees are written in a new trace (named 'calling-contexts.csv' by default). Optionally, the trees are also exported as folded stacks (one file for each kind of calling context), which can be rendered as flame graphs (e.g., with flamegraph.pl). The weight of each stack is the total granularity of its tasks if a granularity trace is provided, or the number of its tasks otherwise.
+
+Note: Task IDs are hash codes, so the join is only meaningful if both traces were produced by runs creating the same tasks in the same order (e.g., with a deterministic application).
+
+Usage: ./calling_contexts.py -t <path to calling-context task trace> [-g <path to granularity task trace> -k <kind> -o <path to result trace (output)> -f <prefix of folded stacks (output)> -j <jobs> --no-cache]'''
+
+#Default name for the output csv file
+DEFAULT_OUT_FILE = "calling-contexts.csv"
+#Extension of the files containing folded stacks
+FOLDED_EXTENSION = ".folded"
+#By default, the granularity task trace is parsed by a single process
+DEFAULT_JOBS = 1
+
+#The FrameTable shared by all trees
+frames = FrameTable()
+
+#The dictionary associating each analyzed kind of calling context to its CallingContextTree
+trees = {}
+
+#The dictionary associating each analyzed kind of calling context to the number of tasks where it was not collected
+missing = {}
+
+#The GranularityIndex of the granularity task trace (None if not provided)
+granularities = None
+
+#The total number of tasks, and the number of tasks whose granularity is known
+total_tasks = 0
+measured_tasks = 0
+
+def read_granularity(inputfile):
+    '''
+    Reads the task trace produced in the bytecode or reference-cycles profiling mode, and initializes the granularity index.
+    inputfile: the task trace to read.
+    '''
+    global granularities
+    try:
+        trace = load_tasks(inputfile, ["id", "exec_n", "granularity"], cache, jobs)
+    except ValueError:
+        print("Wrong granularity task trace format")
+        exit(-1)
+    granularities = GranularityIndex(trace)
+
+def read_contexts(inputfile):
+    '''
+    Reads the task trace produced in the calling-context profiling mode, and adds the calling contexts of each task to the trees.
+    inputfile: the task trace to read.
+    '''
+    global total_tasks, measured_tasks
+    for kind in kinds:
+        trees[kind] = CallingContextTree(frames)
+        missing[kind] = 0
+    columns = [(CONTEXT_KINDS.index(kind), kind) for kind in kinds]
+    try:
+        for ids, exec_ns, contexts, dictionary in iter_contexts(inputfile):
+            if granularities is not None:
+                found, grans = granularities.lookup(ids, exec_ns)
+                grans = [gran if known else None for gran, known in zip(grans.tolist(), found.tolist())]
+                measured_tasks += int(found.sum())
+            else:
+                grans = [None] * len(contexts)
+            total_tasks += len(contexts)
+            for column, kind in columns:
+                tree = trees[kind]
+                for row, gran in zip(contexts, grans):
+                    context = row[column]
+                    if context is None:
+                        missing[kind] += 1
+                    else:
+                        tree.add(context, gran, dictionary)
+    except ValueError:
+        print("Wrong calling-context task trace format")
+        exit(-1)
+
+def print_summary():
+    '''
+    Prints the number of tasks and the size of each tree on standard output.
+    '''
+    print("")
+    print("Tasks: %s" % str(total_tasks))
+    if granularities is not None:
+        print("Tasks found in the granularity task trace: %s" % str(measured_tasks))
+    print("Distinct methods: %s" % str(len(frames.names)))
+    for kind in kinds:
+        tree = trees[kind]
+        print("Calling contexts (%s): %s -> Missing: %s -> Nodes: %s -> Maximum depth: %s" % (kind, str(total_tasks - missing[kind]), str(missing[kind]), str(len(tree) - 1), str(max(tree.depths))))
+    print("")
+
+def write_csv():
+    '''
+    Writes the nodes of all trees (except their roots) on a csv file.
+    For each node, the file reports the number of tasks whose calling context ends at the node ('Tasks') or passes through it ('Total tasks'), and, if a granularity trace is provided, their total granularity and the average granularity of the tasks passing through the node.
+    '''
+    fieldnames = ["Kind", "Node", "Parent", "Depth", "Method", "Tasks", "Total tasks"]
+    if granularities is not None:
+        fieldnames += ["Granularity", "Total granularity", "Average granularity"]
+    with open_trace(output_file, 'w') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(fieldnames)
+        for kind in kinds:
+            tree = trees[kind]
+            node_tasks = tree.totals(tree.tasks).tolist()
+            if granularities is not None:
+                total_measured = tree.totals(tree.measured).tolist()
+                total_grans = tree.totals(tree.granularity).tolist()
+            for node in range(1, len(tree)):
+                row = [kind, node, tree.parents[node], tree.depths[node], frames.names[tree.methods[node]], tree.tasks[node], node_tasks[node]]
+                if granularities is not None:
+                    avg_gran = str(total_grans[node] / total_measured[node]) if total_measured[node] > 0 else ""
+                    row += [tree.granularity[node], total_grans[node], avg_gran]
+                writer.writerow(row)
+
+def write_folded():
+    '''
+    Writes the folded stacks of each tree on a separate file, named after the prefix and the kind of calling context (e.g., '<prefix>-exec.folded').
+    '''
+    for kind in kinds:
+        tree = trees[kind]
+        weights = tree.granularity if granularities is not None else tree.tasks
+        with open_trace("%s-%s%s" % (folded_prefix, kind, FOLDED_EXTENSION), 'w') as foldedfile:
+            for line in tree.folded(weights):
+                foldedfile.write(line + "\n")
+
+if __name__ == "__main__":
+    #Flags parser
+    parser = OptionParser(helper)
+    parser.add_option('-t', '--task', dest='tasksfile', type='string', help="path to the task trace produced in the calling-context profiling mode", metavar="CC_TASK_TRACE")
+    parser.add_option('-g', '--granularity', dest='granfile', type='string', help="path to the task trace produced in the bytecode or reference-cycles profiling mode, from which the granularity of each task is taken", metavar="GRANULARITY_TASK_TRACE")
+    parser.add_option('-k', '--kind', dest='kinds', type='choice', choices=CONTEXT_KINDS, action='append', help="the kind of calling context to analyze, i.e., 'init', 'submit', or 'exec'. Can be passed several times. If none is provided, then all kinds are analyzed", metavar="KIND")
+    parser.add_option('-o', '--output', dest='output_file', type='string', help="the path to the output trace containing the nodes of the trees. If none is provided, then the output trace will be produced in './calling-contexts.csv'", metavar="RESULT_TRACE")
+    parser.add_option('-f', '--folded', dest='folded_prefix', type='string', help="also write the folded stacks of each tree in '<FOLDED_PREFIX>-<kind>.folded'", metavar="FOLDED_PREFIX")
+    parser.add_option('-j', '--jobs', dest='jobs', type='int', help="the number of processes parsing the granularity task trace in parallel (1 by default). If 0 is passed, then all CPUs are used", metavar="JOBS")
+    parser.add_option('--no-cache', dest='no_cache', action='store_true', default=False, help="do not read or write the binary cache of the granularity task trace. By default, the trace is parsed once and its content is cached next to it (e.g., in '<task trace>.cache'), so that later runs on the same trace load it faster")
+    (options, arguments) = parser.parse_args()
+    if (options.tasksfile is None):
+        print(parser.usage)
+        exit(0)
+    else:
+        tasksfile = options.tasksfile
+    granfile = options.granfile
+    if (options.kinds is None):
+        kinds = CONTEXT_KINDS
+    else:
+        kinds = [kind for kind in CONTEXT_KINDS if kind in options.kinds]
+    if (options.output_file is None):
+        output_file = DEFAULT_OUT_FILE
+    else:
+        output_file = options.output_file
+    folded_prefix = options.folded_prefix
+    cache = not options.no_cache
+    if (options.jobs is None):
+        jobs = DEFAULT_JOBS
+    else:
+        jobs = options.jobs
+
+    print("")
+    print("Starting analysis...")
+
+    if granfile is not None:
+        read_granularity(granfile)
+    read_contexts(tasksfile)
+
+    print_summary()
+    write_csv()
+    if folded_prefix is not None:
+        write_folded()
@@ -3,7 +3,15 @@
 from __future__ import division
 from optparse import OptionParser
 import sys
-import csv
+import os
+import time
+
+#Makes the shared 'tgp' package (located in the parent directory) importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from tgp.analysis import CHARACTERIZATION_COLUMNS, DEFAULT_COARSE_MAX_GRAN, DEFAULT_COARSE_MAX_TASKS, DEFAULT_COARSE_MIN_GRAN, DEFAULT_COARSE_MIN_TASKS, CoarseGrained, average_outside, coarse_grained, cpu_utilization, is_coarsegrained, load_samples, load_tasks
+from tgp.follow import TaskTail, SampleTail, ClassTotals
+from tgp.intervals import SampleIndex, IntervalUnion
+from tgp.profiling import Profiler, add_options
 
 helper = '''This script extracts useful information related to the execution of coarse-grained tasks. In particular, the script identifies classes spawning only coarse-grained tasks and, for each of them, computes the average task granularity, as well as the average amount of context switches and average CPU utilization experienced by the application during task execution. The script also computes the average amount of context switches occurred when no coarse-grained task was in execution.
 
@@ -14,250 +22,124 @@ A class is considered as "spawning only coarse-grained tasks" if ALL tasks of su
 
 The results are both printed to stardard output and written in a new trace (named 'coarse-grained.csv' by default).
 
+In follow mode (--follow), the script analyzes the traces while the profiled application is still running: the traces are tailed, and the results are refreshed every few seconds with the rows appended in the meantime, until the script is interrupted (e.g., with Ctrl+C).
+
 Note: All input traces should have been produced by tgp with a SINGLE profiling run, either in the bytecode profiling or reference-cycles profiling mode.
 
-Usage: ./coarse_grained.py -t <path to task trace> -c <path to CS trace> -p <path to CPU trace> [-g <MIN_GRAN> -G <MAX_GRAN> -s <MIN_TASK_SPAWNED> -S <MAX_TASK_SPAWNED> -o <path to result trace (output)>]'''
+Usage: ./coarse_grained.py -t <path to task trace> -c <path to CS trace> -p <path to CPU trace> [-g <MIN_GRAN> -G <MAX_GRAN> -s <MIN_TASK_SPAWNED> -S <MAX_TASK_SPAWNED> -o <path to result trace (output)> -j <jobs> --no-cache --follow -i <seconds> --profile]'''
 
 #Default name for the output csv file
 DEFAULT_OUT_FILE = "coarse-grained.csv"
-#Default minimum granularity
-DEFAULT_MIN_GRAN = 1000000000
-#Default maximum granularity
-DEFAULT_MAX_GRAN = 100000000000
-#Default minimum number of tasks
-DEFAULT_MIN_TASKS = 1
-#Default maximum number of tasks
-DEFAULT_MAX_TASKS = 100
-
-#Number of columns in the task trace
-FIELDS_TASK = 22
-#Number of columns in the CS trace
-FIELDS_CS = 2
-#Number of columns in the CPU trace
-FIELDS_CPU = 3
-
-#A dictionary associating a class name to a list of Task instances, which belong to such class
-classes = {}
-
-#A dictionary associating a class name to an array of Task instances. In this dictionary are stored only classes containing only coarse-grained tasks
-coarseclasses = {}
-
-#A dictionary associating a class name to an array of Task instance. This dictionary is used to compute the average number of context switches occurring when no coarse-grained task was in execution.
-notcoarseclasses = {}
-
-#A list containing ContextSwitch instances
-contextswitches = []
-
-#A list containing CPU instances
-cpus = []
-
-class Task:
-    '''
-    A class containing relevant data taken from the task trace.
-    '''
-    def __init__(self, this_id, this_class, this_entrytime, this_exittime, this_granularity):
-        self.this_id = this_id
-        self.this_class = this_class
-        self.this_entrytime = this_entrytime
-        self.this_exittime = this_exittime
-        self.this_granularity = this_granularity
-
-class ContextSwitch:
-    '''
-    A class containing data taken from the CS trace.
-    '''
-    def __init__(self, this_time, this_cs):
-        self.this_time = this_time
-        self.this_cs = this_cs
-
-class CPU:
-    '''
-    A class containing data taken from the CPU trace.
-    '''
-    def __init__(self, this_time, this_usr, this_sys):
-        self.this_time = this_time
-        self.this_usr = this_usr
-        self.this_sys = this_sys
-
-def contains_letters(string):
-    '''
-    Checks whether the input string contains letters.
-    string: the string on which to check the presence of letters.
-    Returns true if the string contains letters, false otherwise.
-    '''
-    for s in string:
-        if s.isalpha():
-            return True
-    return False
+#By default, the task trace is parsed by a single process
+DEFAULT_JOBS = 1
+#Default number of seconds between two refreshes in follow mode
+DEFAULT_INTERVAL = 10
 
 def read_tasks():
     '''
-    Reads the task trace and sets up the dictionary.
+    Reads the task trace.
+    Returns a TaskTrace.
     '''
-    linecounter = 0
-    with open (tasksfile) as csvfile:
-        csvreader = csv.reader(csvfile)
-        for row in csvreader:
-            if len(row) != FIELDS_TASK:
-                print("Wrong task trace format")
-                exit(-1)
-            if linecounter > 0:
-                if contains_letters(row[0]):
-                    continue
-                task_id = row[0]
-                task_class = row[1]
-                if contains_letters(row[12]):
-                    continue
-                task_entry = long(row[12])
-                if contains_letters(row[13]):
-                    continue
-                task_exit = long(row[13])
-                if contains_letters(row[14]):
-                    continue
-                task_gran = long(row[14])
-                if task_entry >= 0 and task_exit >= 0:
-                    if task_class not in classes:
-                        classes[task_class] = []
-                    classes[task_class].append(Task(task_id, task_class, task_entry, task_exit, task_gran))
-            linecounter += 1
+    try:
+        return load_tasks(tasksfile, CHARACTERIZATION_COLUMNS, cache, jobs)
+    except ValueError:
+        print("Wrong task trace format")
+        exit(-1)
 
 def read_cs():
     '''
-    Reads the CS trace and sets up the dictionary.
+    Reads the CS trace.
+    Returns a Trace.
     '''
-    with open (csfile) as csvfile:
-        csvreader = csv.reader(csvfile)
-        for row in csvreader:
-            if len(row) != FIELDS_CS:
-                print("Wrong CS trace format")
-                exit(-1)
-            if contains_letters(row[0]):
-                continue
-            this_time = float(row[0])
-            if contains_letters(row[1]):
-                continue
-            this_cs = float(row[1])
-            contextswitches.append(ContextSwitch(this_time, this_cs))
+    try:
+        return load_samples(csfile, "cs", cache)
+    except ValueError:
+        print("Wrong CS trace format")
+        exit(-1)
 
 def read_cpu():
     '''
-    Reads the CPU trace and sets up the dictionary.
+    Reads the CPU trace.
+    Returns a Trace.
     '''
-    with open (cpufile) as csvfile:
-        csvreader = csv.reader(csvfile)
-        for row in csvreader:
-            if len(row) != FIELDS_CPU:
-                print("Wrong CPU trace format")
-                exit(0)
-            if contains_letters(row[0]):
-                continue
-            this_time = long(row[0])
-            if contains_letters(row[1]):
-                continue
-            this_usr = float(row[1])
-            if contains_letters(row[2]):
-                continue
-            this_sys = float(row[2])
-            cpus.append(CPU(this_time, this_usr, this_sys))
-
-def coarsegrained():
-    '''
-    For each class in the classes dictionary, this function counts the number of coarse-grained tasks, which are used to set up the dictionary for the coarse-grained classes.
-    '''
-    for key in classes:
-        tasks = classes[key]
-        all_coarse = True
-        for task in tasks:
-            if task.this_granularity < min_granularity or task.this_granularity > max_granularity:
-                all_coarse = False
-                break
-        if all_coarse and len(tasks) >= min_tasks and len(tasks) <= max_tasks:
-            coarseclasses[key] = tasks
-
-def context_switches_not_in_coarsegrained():
-    '''
-    Returns the average number of context switches occurring when coarse-grained tasks are not in execution.
-    '''
-    cs_num = 0
-    cs_total = 0
-    avg_cs = 0
-    for cs in contextswitches:
-        is_outside = True
-        for key in coarseclasses:
-            tasks = coarseclasses[key]
-            for task in tasks:
-                if cs.this_time >= task.this_entrytime and cs.this_time <= task.this_exittime:
-                    is_outside = False
-                    break
-            if is_outside == False:
-                break
-        if is_outside == True:
-            cs_num += 1
-            cs_total += cs.this_cs
-    if cs_num > 0:
-        avg_cs = cs_total/cs_num
-    return avg_cs
+    try:
+        return load_samples(cpufile, "cpu", cache)
+    except ValueError:
+        print("Wrong CPU trace format")
+        exit(0)
 
-def class_analysis(tasks):
+def totals_analysis(totals):
     '''
-    Performs the analysis on coarse-grained tasks. More specifically, for each class, this function computes the total granularity, the number of context switches, and the average CPU utilization, returning them in a list.
+    Performs the analysis on coarse-grained tasks in follow mode, returning the average granularity, number of context switches, and CPU utilization of a class from its running totals.
+    totals: the ClassTotals of the class.
     '''
-    total_cs = 0
-    total_css = 0
-    total_cpu_util = 0
-    total_cpu = 0
-    total_gran = 0
-    total_tasks = 0
-    for task in tasks:
-        total_gran += task.this_granularity
-        total_tasks += 1
-        for cs in contextswitches:
-            if cs.this_time >= task.this_entrytime and cs.this_time <= task.this_exittime:
-                total_cs += cs.this_cs
-                total_css += 1
-        for cpu in cpus:
-            if cpu.this_time >= task.this_entrytime and cpu.this_time <= task.this_exittime:
-                total_cpu_util += cpu.this_usr + cpu.this_sys
-                total_cpu += 1
     avg_cpu = 0
     avg_cs = 0
     avg_gran = 0
-    if total_cpu > 0:
-        avg_cpu = total_cpu_util/total_cpu
-    if total_css > 0:
-        avg_cs = total_cs/total_css
-    if total_tasks > 0:
-        avg_gran = total_gran/total_tasks
+    if totals.sample_counts[1] > 0:
+        avg_cpu = totals.sample_totals[1]/totals.sample_counts[1]
+    if totals.sample_counts[0] > 0:
+        avg_cs = totals.sample_totals[0]/totals.sample_counts[0]
+    if totals.count > 0:
+        avg_gran = totals.total_gran/totals.count
     return [avg_gran, avg_cs, avg_cpu]
 
-def output_results():
-    '''
-    Writes results to a csv file and prints them to standard output.
-    '''
-    contents = []
-    print("")
-    avg_cs_out = context_switches_not_in_coarsegrained()
-    print("Average number of context switches experienced when coarse-grained tasks are not in execution: %scs/100ms" % str(avg_cs_out))
-    print("")
-    print("CLASSES CONTAINING COARSE-GRAINED TASKS:")
-    print("")
-    for key in coarseclasses:
-        content = {}
-        res = class_analysis(coarseclasses[key])
-        increase = 0
-        print("-> Class: %s \n   Average granularity: %s \n   Average number of context switches: %s \n   Average CPU utilization: %s" % (key, str(res[0]), str(res[1]) + "cs/100ms", str(res[2])))
-        content["Class"] = key
-        content["Average granularity"] = str(res[0])
-        content["Average number of context switches"] = str(res[1])
-        content["Average CPU utilization"] = str(res[2])
-        contents.append(content)
-    print("")
-    with open(output_file, 'w') as csvfile:
-        fieldnames = ["Class", "Average granularity", "Average number of context switches", "Average CPU utilization"]
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        for cont in contents:
-            writer.writerow(cont)
+def follow_traces():
+    '''
+    Follows the task, CS, and CPU traces while they are being written, refreshing the results every 'interval' seconds until interrupted (e.g., with Ctrl+C).
+    Each refresh parses only the rows appended since the previous one, and adds them to the running totals of each class (see ClassTotals). The execution intervals of a class are released as soon as its granularity falls outside [MIN_GRAN, MAX_GRAN] or it spawns more than MAX_TASK_SPAWNED tasks, as the class can no longer be coarse-grained.
+    '''
+    #The dictionary associating each class to the ClassTotals of its tasks and of the context switches and CPU utilization measurements taken during their execution
+    running = {}
+    #The measurements read so far
+    cs_index = SampleIndex([], [])
+    cpu_index = SampleIndex([], [])
+    task_tail = TaskTail(tasksfile, CHARACTERIZATION_COLUMNS)
+    cs_tail = SampleTail(csfile, "cs")
+    cpu_tail = SampleTail(cpufile, "cpu")
+    try:
+        while True:
+            try:
+                chunk = task_tail.poll()
+                cs_trace = cs_tail.poll()
+                cpu_trace = cpu_tail.poll()
+            except ValueError as error:
+                print(str(error))
+                exit(-1)
+            chunk = chunk.select(chunk.executed())
+            #New tasks are checked against the measurements read so far, and new measurements against all tasks read so far
+            for task_class, rows in chunk.group_by("class"):
+                if task_class not in running:
+                    running[task_class] = ClassTotals(2)
+                totals = running[task_class]
+                totals.add_tasks(chunk["entry"][rows], chunk["exit"][rows], chunk["granularity"][rows], [cs_index, cpu_index])
+                if totals.union is not None and (totals.min < min_granularity or totals.max > max_granularity or totals.count > max_tasks):
+                    totals.release()
+            cs_index.extend(cs_trace["timestamp"].tolist(), cs_trace["cs"].tolist())
+            cpu_index.extend(cpu_trace["timestamp"].tolist(), cpu_utilization(cpu_trace))
+            for totals in running.values():
+                totals.add_samples(0, cs_trace["timestamp"], cs_trace["cs"])
+                totals.add_samples(1, cpu_trace["timestamp"], cpu_trace["user"] + cpu_trace["system"])
+            if len(chunk) > 0 or len(cs_trace) > 0 or len(cpu_trace) > 0:
+                coarseclasses = {}
+                for key in running:
+                    totals = running[key]
+                    if is_coarsegrained(totals.min, totals.max, totals.count, min_granularity, max_granularity, min_tasks, max_tasks):
+                        coarseclasses[key] = totals_analysis(totals)
+                intervals = IntervalUnion((start, end) for key in coarseclasses for start, end in zip(running[key].union.starts, running[key].union.ends))
+                print("")
+                print("Report at %s" % time.strftime("%Y-%m-%d %H:%M:%S"))
+                output_results(CoarseGrained(coarseclasses, average_outside(intervals, cs_index.timestamps, cs_index.values)))
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print("")
+
+def output_results(result):
+    '''
+    Writes the results (a CoarseGrained) to a csv file and prints them to standard output.
+    '''
+    print(result.report())
+    result.write(output_file)
 
 if __name__ == "__main__":
     #Flags parser
@@ -270,9 +152,14 @@ if __name__ == "__main__":
     parser.add_option('-s', '--min-task-spawned', dest='min_tasks', type='long', help="sets MIN_TASK_SPAWNED (1 by default)", metavar="MIN_TASK_SPAWNED")
     parser.add_option('-S', '--max-task-spawned', dest='max_tasks', type='long', help="sets MAX_TASK_SPAWNED (100 by default)", metavar="MAX_TASK_SPAWNED")
     parser.add_option('-o', '--output', dest='output_file', type='string', help="the path to the output trace containing the results. If none is provided, then the output trace will be produced in './coarse-grained.csv'", metavar="RESULT_TRACE")
+    parser.add_option('-j', '--jobs', dest='jobs', type='int', help="the number of processes parsing the task trace in parallel (1 by default). If 0 is passed, then all CPUs are used", metavar="JOBS")
+    parser.add_option('--no-cache', dest='no_cache', action='store_true', default=False, help="do not read or write the binary cache of the input traces. By default, the traces are parsed once and their content is cached next to them (e.g., in '<task trace>.cache'), so that later runs on the same traces load them faster")
+    parser.add_option('--follow', dest='follow', action='store_true', default=False, help="follows the traces while they are being written (e.g., by a running profiling session), refreshing the results every INTERVAL seconds with the rows appended in the meantime, until interrupted. The traces are neither cached nor parsed in parallel")
+    parser.add_option('-i', '--interval', dest='interval', type='float', help="the number of seconds between two refreshes in follow mode (10 by default)", metavar="INTERVAL")
+    add_options(parser)
     (options, arguments) = parser.parse_args()
     if (options.tasksfile is None):
-        print parser.usage
+        print(parser.usage)
         exit(0)
     else:
         tasksfile = options.tasksfile
@@ -287,36 +174,64 @@ if __name__ == "__main__":
     else:
         cpufile = options.cpufile
     if (options.min_granularity is None):
-        min_granularity = DEFAULT_MIN_GRAN
+        min_granularity = DEFAULT_COARSE_MIN_GRAN
     else:
         min_granularity = options.min_granularity
     if (options.max_granularity is None):
-        max_granularity = DEFAULT_MAX_GRAN
+        max_granularity = DEFAULT_COARSE_MAX_GRAN
     else:
         max_granularity = options.max_granularity
     if (options.min_tasks is None):
-        min_tasks= DEFAULT_MIN_TASKS
+        min_tasks= DEFAULT_COARSE_MIN_TASKS
     else:
         min_tasks = options.min_tasks
     if (options.max_tasks is None):
-        max_tasks = DEFAULT_MAX_TASKS
+        max_tasks = DEFAULT_COARSE_MAX_TASKS
     else:
         max_tasks = options.max_tasks
     if (options.output_file is None):
         output_file = DEFAULT_OUT_FILE
     else:
         output_file = options.output_file
+    cache = not options.no_cache
+    profiler = Profiler("coarse_grained", options)
+    if (options.interval is None):
+        interval = DEFAULT_INTERVAL
+    else:
+        interval = options.interval
+    if (options.jobs is None):
+        jobs = DEFAULT_JOBS
+    else:
+        jobs = options.jobs
 
     print("")
     print("Starting analysis...")
 
-    read_tasks()
+    if options.follow:
+        print("Follow mode: refreshing the results every %s seconds (press Ctrl+C to stop)" % str(interval))
+        with profiler.phase("follow_traces"):
+            follow_traces()
+        profiler.finish()
+        exit(0)
+
+    with profiler.phase("read_tasks") as phase:
+        tasks = read_tasks()
+        phase.rows = len(tasks)
+
+    with profiler.phase("read_cs") as phase:
+        cs_trace = read_cs()
+        phase.rows = len(cs_trace)
 
-    coarsegrained()
+    with profiler.phase("read_cpu") as phase:
+        cpu_trace = read_cpu()
+        phase.rows = len(cpu_trace)
 
-    read_cs()
+    with profiler.phase("coarse_grained") as phase:
+        result = coarse_grained(tasks, cs_trace, cpu_trace, min_granularity, max_granularity, min_tasks, max_tasks)
+        phase.rows = len(tasks)
 
-    read_cpu()
+    with profiler.phase("output_results"):
+        output_results(result)
 
-    output_results()
+    profiler.finish()
 
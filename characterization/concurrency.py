@@ -0,0 +1,173 @@
+#!/usr/bin/python
+
+from __future__ import division
+from optparse import OptionParser
+import sys
+import os
+import csv
+import multiprocessing
+
+#Makes the shared 'tgp' package (located in the parent directory) importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from tgp.analysis import load_tasks
+from tgp.compression import open_trace
+from tgp.concurrency import class_concurrency, task_concurrency
+from tgp.profiling import Profiler, add_options
+
+helper = '''This script computes how many tasks were running in parallel over time, which shows whether tasks (e.g., coarse-grained ones) leave cores idle.
+
+The entry and exit execution times of all executed tasks are sorted once and swept, computing the number of running tasks after each event. The script produces:
+
+  (1) the concurrency curve, i.e., the number of running tasks from each timestamp at which it changes to the next one
+  (2) the time-weighted parallelism histogram, i.e., the fraction of time during which exactly k tasks were running
+  (3) the periods during which fewer than CORES tasks were running (CORES is the number of CPUs of this machine by default), optionally only those lasting at least MIN_PERIOD
+
+With --by-class, the curve and the histogram are also computed for the tasks of each class.
+
+The results are printed to standard output and written in three new traces (named 'concurrency.csv', 'parallelism.csv', and 'low-concurrency.csv' by default). In the first two traces, the rows related to all tasks have class 'null'.
+
+Note: Nested tasks are counted together with their outer tasks. To count only outer tasks, provide the aggregated task trace (see aggregation.py).
+
+Usage: ./concurrency.py -t <path to task trace> [-n <CORES> -m <MIN_PERIOD> --by-class -o <path to curve trace (output)> --histogram <path to histogram trace (output)> --periods <path to periods trace (output)> -j <jobs> --no-cache --profile]'''
+
+#Default names for the output csv files
+DEFAULT_OUT_FILE = "concurrency.csv"
+DEFAULT_HISTOGRAM_FILE = "parallelism.csv"
+DEFAULT_PERIODS_FILE = "low-concurrency.csv"
+#Default minimum duration of the reported periods of low concurrency, in nanoseconds
+DEFAULT_MIN_PERIOD = 0
+#By default, the task trace is parsed by a single process
+DEFAULT_JOBS = 1
+#The number of longest periods of low concurrency printed to standard output
+PRINTED_PERIODS = 10
+
+def read_tasks():
+    '''
+    Reads the task trace.
+    Returns a TaskTrace.
+    '''
+    columns = ["entry", "exit"]
+    if by_class:
+        columns.append("class")
+    try:
+        return load_tasks(tasks_file, columns, cache, jobs)
+    except ValueError:
+        print("Wrong task trace format")
+        exit(-1)
+
+def output_results(profiles, periods):
+    '''
+    Prints the results to standard output and writes them to csv files.
+    profiles: a list of (class, ConcurrencyProfile) pairs, where the profile of all tasks has class None.
+    periods: the periods of low concurrency of all tasks.
+    '''
+    profile = profiles[0][1]
+    histogram = profile.histogram().tolist()
+    duration = profile.duration()
+    print("")
+    print("Time between the first entry and the last exit: %sns" % str(duration))
+    print("Average number of running tasks: %s" % str(profile.average()))
+    print("Maximum number of running tasks: %s" % str(profile.maximum()))
+    print("")
+    print("PARALLELISM HISTOGRAM (FRACTION OF TIME WITH K RUNNING TASKS):")
+    print("")
+    for level in range(len(histogram)):
+        if histogram[level] > 0:
+            print("-> %s running tasks: %s%%" % (str(level), str(histogram[level]/duration*100)))
+    print("")
+    below = int(periods["duration"].sum())
+    print("Time with fewer than %s running tasks: %sns (%s%%) in %s periods" % (str(cores), str(below), str(below/duration*100 if duration > 0 else 0), str(len(periods))))
+    if len(periods) > 0:
+        print("")
+        print("LONGEST PERIODS WITH FEWER THAN %s RUNNING TASKS:" % str(cores))
+        print("")
+        rows = list(zip(periods["start"].tolist(), periods["end"].tolist(), periods["duration"].tolist(), periods["average"].tolist(), periods["minimum"].tolist()))
+        #The longest periods, in time order if they have the same duration
+        for start, end, period_duration, average, minimum in sorted(rows, key=lambda row: -row[2])[:PRINTED_PERIODS]:
+            print("-> From %sns to %sns (%sns): %s running tasks on average, %s at least" % (str(start), str(end), str(period_duration), str(average), str(minimum)))
+    print("")
+    with open_trace(output_file, 'w') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["Class", "Timestamp (ns)", "Running tasks"])
+        for task_class, class_profile in profiles:
+            name = "null" if task_class is None else task_class
+            writer.writerows(zip([name] * len(class_profile.times), class_profile.times.tolist(), class_profile.levels.tolist()))
+    with open_trace(histogram_file, 'w') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["Class", "Running tasks", "Time (ns)", "Fraction of time"])
+        for task_class, class_profile in profiles:
+            name = "null" if task_class is None else task_class
+            class_duration = class_profile.duration()
+            for level, time in enumerate(class_profile.histogram().tolist()):
+                if time > 0:
+                    writer.writerow([name, level, int(time), time/class_duration])
+    with open_trace(periods_file, 'w') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["Start (ns)", "End (ns)", "Duration (ns)", "Average running tasks", "Minimum running tasks"])
+        writer.writerows(zip(periods["start"].tolist(), periods["end"].tolist(), periods["duration"].tolist(), periods["average"].tolist(), periods["minimum"].tolist()))
+
+if __name__ == "__main__":
+    #Flags parser
+    parser = OptionParser(helper)
+    parser.add_option('-t', '--task', dest='tasks_file', type='string', help="path to the task trace containing data to be analyzed", metavar="TASK_TRACE")
+    parser.add_option('-n', '--cores', dest='cores', type='int', help="sets CORES, the threshold below which concurrency is considered as low (the number of CPUs of this machine by default)", metavar="CORES")
+    parser.add_option('-m', '--min-period', dest='min_period', type='long', help="sets MIN_PERIOD, the minimum duration of the reported periods of low concurrency, in nanoseconds (0 by default)", metavar="MIN_PERIOD")
+    parser.add_option('--by-class', dest='by_class', action='store_true', default=False, help="also compute the concurrency curve and the parallelism histogram of the tasks of each class")
+    parser.add_option('-o', '--output', dest='output_file', type='string', help="the path to the output trace containing the concurrency curve. If none is provided, then the output trace will be produced in './concurrency.csv'", metavar="CURVE_TRACE")
+    parser.add_option('--histogram', dest='histogram_file', type='string', help="the path to the output trace containing the parallelism histogram. If none is provided, then the output trace will be produced in './parallelism.csv'", metavar="HISTOGRAM_TRACE")
+    parser.add_option('--periods', dest='periods_file', type='string', help="the path to the output trace containing the periods of low concurrency. If none is provided, then the output trace will be produced in './low-concurrency.csv'", metavar="PERIODS_TRACE")
+    parser.add_option('-j', '--jobs', dest='jobs', type='int', help="the number of processes parsing the task trace in parallel (1 by default). If 0 is passed, then all CPUs are used", metavar="JOBS")
+    parser.add_option('--no-cache', dest='no_cache', action='store_true', default=False, help="do not read or write the binary cache of the input traces. By default, the traces are parsed once and their content is cached next to them (e.g., in '<task trace>.cache'), so that later runs on the same traces load them faster")
+    add_options(parser)
+    (options, arguments) = parser.parse_args()
+    if (options.tasks_file is None):
+        print(parser.usage)
+        exit(0)
+    else:
+        tasks_file = options.tasks_file
+    if (options.cores is None):
+        cores = multiprocessing.cpu_count()
+    else:
+        cores = options.cores
+    if (options.min_period is None):
+        min_period = DEFAULT_MIN_PERIOD
+    else:
+        min_period = options.min_period
+    by_class = options.by_class
+    if (options.output_file is None):
+        output_file = DEFAULT_OUT_FILE
+    else:
+        output_file = options.output_file
+    if (options.histogram_file is None):
+        histogram_file = DEFAULT_HISTOGRAM_FILE
+    else:
+        histogram_file = options.histogram_file
+    if (options.periods_file is None):
+        periods_file = DEFAULT_PERIODS_FILE
+    else:
+        periods_file = options.periods_file
+    if (options.jobs is None):
+        jobs = DEFAULT_JOBS
+    else:
+        jobs = options.jobs
+    cache = not options.no_cache
+    profiler = Profiler("concurrency", options)
+
+    print("")
+    print("Starting analysis...")
+
+    with profiler.phase("read_tasks") as phase:
+        tasks = read_tasks()
+        phase.rows = len(tasks)
+
+    with profiler.phase("sweep") as phase:
+        profiles = [(None, task_concurrency(tasks))]
+        if by_class:
+            profiles.extend(class_concurrency(tasks))
+        periods = profiles[0][1].periods_below(cores, min_period)
+        phase.rows = len(tasks)
+
+    with profiler.phase("output_results"):
+        output_results(profiles, periods)
+
+    profiler.finish()
@@ -3,361 +3,186 @@
 from __future__ import division
 from optparse import OptionParser
 import sys
-import csv
-import math
+import os
+import time
+import numpy
+
+#Makes the shared 'tgp' package (located in the parent directory) importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from tgp.analysis import CHARACTERIZATION_COLUMNS, DEFAULT_CENTRAL_GRAN, Diagnoser, cpu_utilization, diagnose, load_samples, load_tasks
+from tgp.follow import TaskTail, SampleTail
+from tgp.groups import GROUP_KEYS, group_diagnose
+from tgp.intervals import SampleIndex, IntervalUnion
+from tgp.histogram import LogLinearHistogram, SUB_BUCKET_BITS, class_histograms, save_histograms
+from tgp.profiling import Profiler, add_options
+from tgp.sketch import QuantileSketch, DEFAULT_K, k_for_error, rank_error
+from tgp.traces import iter_tasks
 
 helper = '''This script performs basic statistical analysis on task granularity, based on the input task, CS, and CPU traces. The analysis focuses on the average granularity of executed tasks, its distribution, and its closedness to a specific granularity value. The analysis also computes the average number of context switches and CPU utilization experienced during task execution.
         
 The results are both printed to stardard output and written in a new trace (named 'diagnostics.csv' by default).
+
+With --group-by, the statistics are computed for each group of tasks having the same values of the selected keys (e.g., '--group-by class,executor' computes them for each pair of class and executor class) in a single run, instead of running the script once per class with -s. The results of all groups are printed and written in a single trace (named 'group-diagnostics.csv' by default), sorted by group.
+
+In follow mode (--follow), the script analyzes the traces while the profiled application is still running: the traces are tailed, and the results are refreshed every few seconds with the rows appended in the meantime, until the script is interrupted (e.g., with Ctrl+C).
         
 Note: All input traces should have been produced by tgp with a SINGLE profiling run, either in the bytecode profiling or reference-cycles profiling mode.
 
-Usage: ./diagnose.py -t <path to task trace> -c <path to CS trace> -p <path to CPU trace> [-s <class name> -g <central granularity> -o <path to result trace (output)>]'''
+Usage: ./diagnose.py -t <path to task trace> -c <path to CS trace> -p <path to CPU trace> [-s <class name> --group-by <keys> -g <central granularity> -o <path to result trace (output)> -j <jobs> -e <rank error> --save-sketch <path to sketch (output)> --save-histograms <path to histograms (output)> --no-cache --stream --follow -i <seconds> --profile]'''
 
 
 
-#By default, the analysis does not focus on any class.
-DEFAULT_SPECIFIC_CLASS = "null"
-#Default central granularity
-DEFAULT_CENTRAL_GRAN = 100000
 #The default name of the output result file
 DEFAULT_OUT_FILE = "diagnostics.csv"
+#The default name of the output result file when tasks are grouped
+DEFAULT_GROUPS_FILE = "group-diagnostics.csv"
+#By default, the task trace is parsed by a single process
+DEFAULT_JOBS = 1
+#Default number of seconds between two refreshes in follow mode
+DEFAULT_INTERVAL = 10
 
-#Number of columns in the task trace
-FIELDS_TASKS = 22
-#Number of columns in the CS trace
-FIELDS_CS = 2
-#Number of columns in the CPU trace
-FIELDS_CPU = 3
-
-#The z-score corresponding to a confidence of 0.95. It is used to compute the confidence interval of the average CPU utilization
-Z_SCORE = 1.96
-
-#A list containing Task objects
-tasks = []
-
-#A list containing ContextSwitch objects
-contextswitches = []
-
-#A list containing CPU objects
-cpus = []
+#The histograms of the granularity of the tasks of each class, saved with --save-histograms
+histograms = {}
 
-#A list containing all granularity values
-grans = []
+#The rank error of the quantile sketch approximating percentiles. If None, percentiles are computed exactly (or approximated with a LogLinearHistogram in streaming mode)
+sketch_error = None
 
-#The total granularity of all executed (valid) tasks
-total_grans = 0
-
-#The number of total executed tasks
-exec_tasks = 0
-
-class Task:
-    '''
-    A class containing relevant data taken from the task trace.
-    '''
-    def __init__(self, this_id, this_class, this_entry, this_exit, this_gran):
-        self.this_id = this_id
-        self.this_class = this_class
-        self.this_entry = this_entry
-        self.this_exit = this_exit
-        self.this_gran = this_gran
-
-class ContextSwitch:
+def read_tasks():
     '''
-    A class containing data taken from the CS trace.
+    Reads the task trace (with the columns of the grouping keys, if any).
+    Returns a TaskTrace.
     '''
-    def __init__(self, this_time, this_cs):
-        self.this_time = this_time
-        self.this_cs = this_cs
+    columns = CHARACTERIZATION_COLUMNS + [GROUP_KEYS[key][0] for key in group_keys if GROUP_KEYS[key][0] not in CHARACTERIZATION_COLUMNS]
+    try:
+        return load_tasks(tasks_file, columns, cache, jobs)
+    except ValueError:
+        print("Wrong task trace format")
+        exit(-1)
 
-class CPU:
+def read_cs():
     '''
-    A class containing data taken from the CPU trace.
+    Reads the CS trace.
+    Returns a Trace.
     '''
-    def __init__(self, this_time, this_usr, this_sys):
-        self.this_time = this_time
-        self.this_usr = this_usr
-        self.this_sys = this_sys
+    try:
+        return load_samples(cs_file, "cs", cache)
+    except ValueError:
+        print("Wrong CS trace format")
+        exit(-1)
 
-def contains_letters(string):
+def read_cpu():
     '''
-    Checks whether the input string contains letters.
-    string: the string on which to check the presence of letters.
-    Returns true if the string contains letters, false otherwise.
+    Reads the CPU trace.
+    Returns a Trace.
     '''
-    for s in string:
-        if s.isalpha():
-            return True
-    return False
+    try:
+        return load_samples(cpu_file, "cpu", cache)
+    except ValueError:
+        print("Wrong CPU trace format")
+        exit(-1)
 
-def read_tasks():
+def new_diagnoser():
     '''
-    Reads the task trace. For each executed task, create a new instance of Task and inserts it into the task list.
-    Note that if the parameter 'specific_class' has a non-null value, then only tasks which have been executed and have class equal to 'specific_class' are considered.
+    Returns the Diagnoser used in streaming and follow mode, which keeps only a summary of task granularity: a QuantileSketch if a rank error is specified, a LogLinearHistogram otherwise.
     '''
-    linecounter = 0
-    with open(tasks_file) as csvfile:
-        csvreader = csv.reader(csvfile)
-        for row in csvreader:
-            if len(row) != FIELDS_TASKS:
-                print("Wrong task trace format")
-                exit(-1)
-            if linecounter > 0:
-                if contains_letters(row[0]):
-                    continue
-                this_id = row[0]
-                this_class = row[1]
-                if contains_letters(row[12]):
-                    continue
-                this_entry = long(row[12])
-                if contains_letters(row[13]):
-                    continue
-                this_exit = long(row[13])
-                if contains_letters(row[14]):
-                   continue
-                this_gran = long(row[14])
-                #Checks that task has been executed
-                if this_entry >= 0 and this_exit >= 0:
-                    global exec_tasks
-                    if specific_class != "null":
-                        if this_class == specific_class:
-                            tasks.append(Task(this_id, this_class, this_entry, this_exit, this_gran))
-                            global total_grans
-                            total_grans += this_gran
-                            grans.append(this_gran)
-                            exec_tasks += 1
-                    else:
-                        tasks.append(Task(this_id, this_class, this_entry, this_exit, this_gran))
-                        global total_grans
-                        total_grans += this_gran
-                        grans.append(this_gran)
-                        exec_tasks += 1
-            linecounter += 1
+    if sketch_error is not None:
+        summary = QuantileSketch(k_for_error(sketch_error))
+    else:
+        summary = LogLinearHistogram()
+    return Diagnoser(specific_class, gran_central, summary)
 
-def read_cs():
+def stream_traces():
     '''
-    Reads the CS trace. For each measurement which occurred during the execution of a task, create a new ContextSwitch instance and inserts it into the contextswitches list.
+    Reads the task trace one chunk at a time, in a single pass. Only a summary of the granularity of executed tasks and aggregate counters are kept, instead of all tasks.
+    The CS and CPU traces are read first. The intervals of the tasks of each chunk are added to a difference array over the measurements, from which the measurements which occurred during the execution of a task are found once, at the end.
+    Note that if the parameter 'specific_class' is set, then only tasks which have been executed and have class equal to 'specific_class' are considered.
+    If the histograms of task granularity are saved, then the histograms of all classes are computed chunk by chunk as well.
+    Returns the Diagnoser.
     '''
-    with open(cs_file) as csvfile:
-        csvreader = csv.reader(csvfile)
-        for row in csvreader:
-            if len(row) != FIELDS_CS:
-                print("Wrong CS trace format")
-                exit(-1)
-            if contains_letters(row[0]):
-                continue
-            this_time = float(row[0])
-            if contains_letters(row[1]):
-                continue
-            this_cs = float(row[1])
-            for task in tasks:
-                #Checks if the measurement has occurred during the execution of a task
-                if this_time >= task.this_entry and this_time <= task.this_exit:
-                    contextswitches.append(ContextSwitch(this_time, this_cs))
-                    break
-def read_cpu():
+    cs_trace = read_cs()
+    cpu_trace = read_cpu()
+    cs_values = cs_trace["cs"].tolist()
+    cpu_values = cpu_utilization(cpu_trace)
+    cs_index = SampleIndex(cs_trace["timestamp"].tolist(), cs_values)
+    cpu_index = SampleIndex(cpu_trace["timestamp"].tolist(), cpu_values)
+    cs_coverage = numpy.zeros(len(cs_values) + 1, dtype=numpy.int64)
+    cpu_coverage = numpy.zeros(len(cpu_values) + 1, dtype=numpy.int64)
+    diagnoser = new_diagnoser()
+    try:
+        for chunk in iter_tasks(tasks_file, ["class", "entry", "exit", "granularity"], cache=cache, processes=jobs):
+            if histograms_file is not None:
+                for name, histogram in class_histograms(chunk).items():
+                    histograms.setdefault(name, LogLinearHistogram()).merge(histogram)
+            chunk = diagnoser.record(chunk)
+            #Adds the execution of the tasks of the chunk to the coverage of the measurements
+            cs_coverage += cs_index.coverage(chunk["entry"], chunk["exit"])
+            cpu_coverage += cpu_index.coverage(chunk["entry"], chunk["exit"])
+    except ValueError:
+        print("Wrong task trace format")
+        exit(-1)
+    diagnoser.cs = cs_trace["cs"][cs_index.covered_by(cs_coverage)].tolist()
+    diagnoser.cpus = numpy.array(cpu_values, dtype=numpy.float64)[cpu_index.covered_by(cpu_coverage)].tolist()
+    return diagnoser
+
+def follow_traces():
     '''
-    Reads the CPU trace. For each measurement which occurred during the execution of a task, create a new CPU instance and inserts it into the cpus list.
+    Follows the task, CS, and CPU traces while they are being written, refreshing the statistics every 'interval' seconds until interrupted (e.g., with Ctrl+C).
+    As in streaming mode, only a summary of task granularity and aggregate counters are kept. Each refresh parses only the rows appended since the previous one: new tasks are added to the union of the execution intervals of all tasks read so far, and the measurements not yet found within the union are checked again against it.
+    Returns the Diagnoser.
     '''
-    with open(cpu_file) as csvfile:
-        csvreader = csv.reader(csvfile)
-        for row in csvreader:
-            if len(row) != FIELDS_CPU:
-                print("Wrong CPU trace format")
+    diagnoser = new_diagnoser()
+    task_tail = TaskTail(tasks_file, ["class", "entry", "exit", "granularity"])
+    cs_tail = SampleTail(cs_file, "cs")
+    cpu_tail = SampleTail(cpu_file, "cpu")
+    #The union of the execution intervals of the tasks read so far
+    executions = IntervalUnion([])
+    #The timestamps and values of the measurements not yet found within the execution of a task
+    pending_cs = []
+    pending_cpus = []
+    try:
+        while True:
+            try:
+                chunk = diagnoser.record(task_tail.poll())
+                cs_trace = cs_tail.poll()
+                cpu_trace = cpu_tail.poll()
+            except ValueError as error:
+                print(str(error))
                 exit(-1)
-            if contains_letters(row[0]):
-                continue
-            this_time = long(row[0])
-            if contains_letters(row[1]):
-                continue
-            this_usr = float(row[1])
-            if contains_letters(row[2]):
-                continue
-            this_sys = float(row[2])
-            for task in tasks:
-                #Checks if the measurement has occurred during the execution of a task
-                if this_time >= task.this_entry and this_time <= task.this_exit:
-                    cpus.append(CPU(this_time, this_usr, this_sys))
-                    break
-
-def gran_percentage_in_range(low_w, high_w):
+            executions.add(zip(chunk["entry"].tolist(), chunk["exit"].tolist()))
+            pending_cs.extend(zip(cs_trace["timestamp"].tolist(), cs_trace["cs"].tolist()))
+            pending_cpus.extend(zip(cpu_trace["timestamp"].tolist(), cpu_utilization(cpu_trace)))
+            outside = executions.outside([this_time for this_time, value in pending_cs])
+            diagnoser.cs.extend(value for (this_time, value), is_outside in zip(pending_cs, outside) if not is_outside)
+            pending_cs = [sample for sample, is_outside in zip(pending_cs, outside) if is_outside]
+            outside = executions.outside([this_time for this_time, value in pending_cpus])
+            diagnoser.cpus.extend(value for (this_time, value), is_outside in zip(pending_cpus, outside) if not is_outside)
+            pending_cpus = [sample for sample, is_outside in zip(pending_cpus, outside) if is_outside]
+            if len(chunk) > 0 or len(cs_trace) > 0 or len(cpu_trace) > 0:
+                print("")
+                print("Report at %s" % time.strftime("%Y-%m-%d %H:%M:%S"))
+                write_stats(diagnoser.statistics())
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print("")
+    return diagnoser
+
+def write_stats(diagnosis):
     '''
-    Computes the percentage of tasks having granularity within the specified range ([low_w, high_w]).
-    low_w: the lower bound of the range.
-    high_w: the upper bound of the range.
-    Returns the percentage.
+    Prints the statistics for tasks, context switches, and CPU utilization on standard output, and writes them on a csv file.
     '''
-    count = 0
-    for gran in grans:
-        if gran >= low_w and gran <= high_w:
-            count += 1
-    return ((count/len(grans))*100)
+    print(diagnosis.report())
+    diagnosis.write(output_file)
 
-def in_specified_range():
-    '''
-    Computes the number of tasks with granularity having the same order of magnitude as gran_central.
-    '''
-    count = 0
-    for task in tasks:
-        if gran_central > 0 and (abs(math.log(gran_central, 10) - math.log(task.this_gran, 10)) <= 1):
-            count += 1
-    return count
-
-def tasks_statistics():
-   '''
-   Computes basic statistics related to tasks.
-   Returns a dictionary containing such statistics.
-   '''
-   print("")
-   print("TASKS STATISTICS")
-   grans.sort()
-   m_index = 0
-   third_q = 0
-   first_q = 0
-   median = 0
-   inter_quartile = 0
-   low_w = 0
-   high_w = 0
-   percentage_range = 0
-   avg = 0
-   percentage = 0
-   if len(grans) != 0 and len(tasks) != 0:
-       m_index = int(len(grans)/2)
-       third_q = int((len(grans) - m_index)/2) + m_index
-       first_q = int(m_index/2)
-       median = grans[m_index]
-       one_percentile = grans[int(len(grans)*0.01)]
-       five_percentile = grans[int(len(grans)*0.05)]
-       ninetyfive_percentile = grans[int(len(grans)*0.9)]
-       ninetynine_percentile = grans[int(len(grans)*0.95)]
-       inter_quartile = grans[third_q] - grans[first_q]
-       low_w = grans[first_q] - 1.5 * inter_quartile
-       if low_w < 0:
-           low_w = 0
-       high_w = grans[third_q] + 1.5 * inter_quartile
-       if high_w > grans[len(grans) - 1]:
-           high_w = grans[len(grans) - 1]
-       percentage_range = gran_percentage_in_range(low_w, high_w)
-       avg = total_grans/len(tasks)
-       percentage = (in_specified_range()/len(tasks))*100
-   res = "-> Total number of tasks: " + str(exec_tasks) + " \n-> Average granularity: " + str(avg) + " \n-> 1st percentile - granularity: " + str(one_percentile) + " \n-> 5th percentile - granularity: " + str(five_percentile) + " \n-> 50th percentile (median) - granularity: " + str(median) + " \n-> 95th percentile - granularity: " + str(ninetyfive_percentile) + " \n-> 99th percentile - granularity: " + str(ninetynine_percentile) + " \n-> IQC - granularity: " + str(inter_quartile) + " \n-> Whiskers range - granularity: [" + str(low_w) + ", " + str(high_w) + "] \n-> Percentage of tasks having granularity within whiskers range: " + str(percentage_range) + "% \n-> Percentage of tasks with granularity around " + str(gran_central) + ": " + str(percentage) + "%"
-   print(res)
-   res_dict = {}
-   res_dict["Total number of tasks"] = str(exec_tasks)
-   res_dict["Average granularity"] = str(avg)
-   res_dict["1st percentile - granularity"] = str(one_percentile)
-   res_dict["5th percentile - granularity"] = str(five_percentile)
-   res_dict["50th percentile (median) - granularity"] = str(median)
-   res_dict["95th percentile - granularity"] = str(ninetyfive_percentile)
-   res_dict["99th percentile - granularity"] = str(ninetynine_percentile)
-   res_dict["IQC - granularity"] = str(inter_quartile)
-   res_dict["Lower whiskers range - granularity"] = str(low_w)
-   res_dict["Upper whiskers range - granularity"] = str(high_w)
-   res_dict["Percentage of tasks having granularity within whiskers range"] = str(percentage_range)
-   res_dict["Central granularity"] = str(gran_central)
-   res_dict["Percentage of tasks with granularity around central granularity"] = str(percentage)
-   return res_dict
-
-def cs_statistics():
+def write_group_stats(groups):
     '''
-    Computes statistics related to context-switches.
-    Returns a dictionary containing such statistics.
+    Prints the statistics of each group of tasks on standard output, and writes them on a csv file.
     '''
     print("")
-    print("CONTEXT-SWITCHES STATISTICS")
-    total_cs = 0
-    for cs in contextswitches:
-        total_cs += cs.this_cs
-    avg = 0
-    if len(contextswitches) > 0:
-        avg = total_cs/len(contextswitches)
-    res = "-> Average number of context switches: " + str(avg) + "cs/100ms"
-    print(res)
-    res_dict = {}
-    res_dict["Average number of context switches"] = str(avg)
-    return res_dict
-
-def cpu_mean():
-    '''
-    Computes the average CPU utilization.
-    '''
-    mean = 0
-    if len(cpus) == 0:
-        return mean
-    for cpu in cpus:
-        mean += cpu.this_usr + cpu.this_sys
-    mean /= len(cpus)
-    return mean
-
-def cpu_standard_deviation():
-    '''
-    Computes the standard deviation of the average CPU utilization.
-    '''
-    sd = 0
-    if len(cpus) == 0:
-        return sd
-    mean = cpu_mean()
-    for cpu in cpus:
-        sd += pow((cpu.this_usr + cpu.this_sys - mean), 2)
-    sd /= (len(cpus) - 1)
-    sd = math.sqrt(sd)
-    return sd
-
-def cpu_confidence_interval():
-    '''
-    Computes the confidence intervals of the average CPU utilization.
-    '''
-    mean = cpu_mean()
-    sd = cpu_standard_deviation()
-    if mean == 0 and sd == 0:
-        return 0
-    return (Z_SCORE * sd)/math.sqrt(len(cpus))
-
-def cpu_statistics():
-    '''
-    Computes statistics related to CPU utilization.
-    Returns a dictionary containing such statistics.
-    '''
+    print("STATISTICS BY %s" % ", ".join(GROUP_KEYS[key][1].upper() for key in group_keys))
     print("")
-    mean = cpu_mean()
-    interval = cpu_confidence_interval()
-    print("CPU STATISTICS")
-    res = "-> Average CPU utilization: " + str(mean) + "+-" + str(interval)
-    print(res)
+    print(groups.report())
     print("")
-    res_dict = {}
-    res_dict["Average CPU utilization"] = str(mean)
-    res_dict["STD CPU utilization"] = str(interval)
-    
-    return res_dict
-
-def write_stats():
-    '''
-    Writes statistics for tasks, context switches, and CPU utilization on a csv file.
-    '''
-    tasks_stats = tasks_statistics()
-    cs_stats = cs_statistics()
-    cpu_stats = cpu_statistics()
-    with open(output_file, 'w') as csvfile:
-        fieldnames = []
-        fieldnames.append("Selected class")
-        for key in tasks_stats:
-            fieldnames.append(key)
-        for key in cs_stats:
-            fieldnames.append(key)
-        for key in cpu_stats:
-            fieldnames.append(key)
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        content = {}
-        content["Selected class"] = specific_class
-        for key in tasks_stats:
-            content[key] = tasks_stats[key]
-        for key in cs_stats:
-            content[key] = cs_stats[key]
-        for key in cpu_stats:
-            content[key] = cpu_stats[key]
-        writer.writerow(content)
+    groups.write(output_file)
 
 if __name__ == "__main__":
     #Flags parser
@@ -366,8 +191,18 @@ if __name__ == "__main__":
     parser.add_option('-c', '--context-switches', dest='cs_file', type='string', help="path to the CS trace containing data to be analyzed", metavar="CS_TRACE")
     parser.add_option('-p', '--cpu', dest='cpu_file', type='string', help="path to the CPU trace containing data to be analyzed", metavar="CPU_TRACE")
     parser.add_option('-s', '--specific-class', dest='specific_class', type='string', help="a specific class on which to focus the analysis. For example, if '-s ExampleClass' is passed, then all statistics will refer only to tasks of class 'ExampleClass', ignoring all other tasks. If the script should analyze all tasks, then this option should not be set (or should be set to 'null', which is the default value)", metavar="CLASS")
+    parser.add_option('--group-by', dest='group_by', type='string', help="computes the statistics for each group of tasks having the same values of the input keys, a comma-separated list of %s (e.g., 'class,executor'), in a single run. It cannot be combined with -s, -e, --save-sketch, --stream, or --follow" % ", ".join("'%s'" % key for key in sorted(GROUP_KEYS)), metavar="KEYS")
     parser.add_option('-g','--central-granularity', dest='gran_central', type='long', help="specifies the 'central granularity'. The script computes the percentage of tasks whose granularity has the same order as the central granularity. Setting this parameter allows users to change the central granularity (which is 10^5 by default).", metavar="CENTRAL_GRAN")
     parser.add_option('-o', '--output', dest='output_file', type='string', help="the path to the output trace containing the results. If none is provided, then the output trace will be produced in './diagnostics.csv'", metavar="RESULT_TRACE")
+    parser.add_option('-j', '--jobs', dest='jobs', type='int', help="the number of processes parsing the task trace in parallel (1 by default). If 0 is passed, then all CPUs are used", metavar="JOBS")
+    parser.add_option('--no-cache', dest='no_cache', action='store_true', default=False, help="do not read or write the binary cache of the input traces. By default, the traces are parsed once and their content is cached next to them (e.g., in '<task trace>.cache'), so that later runs on the same traces load them faster")
+    parser.add_option('--stream', dest='stream', action='store_true', default=False, help="reads the task trace in a single pass, keeping only a histogram of task granularity instead of all tasks, so that memory usage does not depend on the size of the trace. Count, average granularity, and the percentage of tasks around the central granularity are exact, while percentiles and whiskers are approximated with a relative error of at most %s%%" % str(100.0/(1 << (SUB_BUCKET_BITS + 1))))
+    parser.add_option('-e', '--rank-error', dest='rank_error', type='float', help="approximates percentiles, quartiles, and whiskers with a (mergeable) quantile sketch, instead of sorting all granularity values. The rank of each reported percentile is within RANK_ERROR (e.g., 0.01 for 1%) times the number of tasks of the exact one, with a probability of 99%. In streaming mode, the sketch replaces the histogram of task granularity", metavar="RANK_ERROR")
+    parser.add_option('--save-sketch', dest='sketch_file', type='string', help="saves the quantile sketch of task granularity into a NumPy .npz file, so that the sketches of several runs can be merged (see tgp/sketch.py). If no rank error is specified, the sketch has a rank error of %s%%" % str(rank_error(DEFAULT_K)*100), metavar="SKETCH_FILE")
+    parser.add_option('--save-histograms', dest='histograms_file', type='string', help="saves the log-linear histograms of the granularity of all tasks and of the tasks of each class into a NumPy .npz file, from which percentiles, the percentage of tasks around any granularity, and the distribution of granularity can be computed without reading the task trace again, and which can be merged with the histograms of other runs (see histograms.py). It cannot be combined with --follow", metavar="HISTOGRAMS_FILE")
+    parser.add_option('--follow', dest='follow', action='store_true', default=False, help="follows the traces while they are being written (e.g., by a running profiling session), refreshing the results every INTERVAL seconds with the rows appended in the meantime, until interrupted. As in streaming mode, only a histogram of task granularity (or a quantile sketch, if a rank error is specified) is kept. The traces are neither cached nor parsed in parallel")
+    parser.add_option('-i', '--interval', dest='interval', type='float', help="the number of seconds between two refreshes in follow mode (10 by default)", metavar="INTERVAL")
+    add_options(parser)
     (options, arguments) = parser.parse_args()
     if (options.tasks_file is None):
         print(parser.usage)
@@ -384,33 +219,122 @@ if __name__ == "__main__":
         exit(0)
     else:
         cpu_file = options.cpu_file
-    if (options.specific_class is None):
-        specific_class = DEFAULT_SPECIFIC_CLASS
+    if (options.specific_class is None or options.specific_class == "null"):
+        specific_class = None
     else:
         specific_class = options.specific_class
     if (options.gran_central is None):
         gran_central = DEFAULT_CENTRAL_GRAN
     else:
         gran_central = options.gran_central
+    if (options.group_by is None):
+        group_keys = []
+    else:
+        group_keys = options.group_by.split(",")
+        for key in group_keys:
+            if key not in GROUP_KEYS:
+                print("Unknown grouping key: %s" % key)
+                exit(-1)
+        if specific_class is not None or options.rank_error is not None or options.sketch_file is not None or options.stream or options.follow:
+            print("--group-by cannot be combined with -s, -e, --save-sketch, --stream, or --follow")
+            exit(-1)
     if (options.output_file is None):
-        output_file = DEFAULT_OUT_FILE
+        output_file = DEFAULT_GROUPS_FILE if len(group_keys) > 0 else DEFAULT_OUT_FILE
     else:
         output_file = options.output_file
+    cache = not options.no_cache
+    profiler = Profiler("diagnose", options)
+    stream = options.stream
+    follow = options.follow
+    if (options.interval is None):
+        interval = DEFAULT_INTERVAL
+    else:
+        interval = options.interval
+    sketch_error = options.rank_error
+    sketch_file = options.sketch_file
+    histograms_file = options.histograms_file
+    if histograms_file is not None and follow:
+        print("--save-histograms cannot be combined with --follow")
+        exit(-1)
+    if sketch_file is not None and sketch_error is None:
+        sketch_error = rank_error(DEFAULT_K)
+    if sketch_error is not None and not 0 < sketch_error < 1:
+        print("The rank error must be between 0 and 1")
+        exit(-1)
+    if (options.jobs is None):
+        jobs = DEFAULT_JOBS
+    else:
+        jobs = options.jobs
 
     print("")
     print("Beginning diagnosis...")
     print("")
 
-    if (specific_class != "null") :
+    if (specific_class is not None) :
         print("Restricting analysis to tasks of class: " + specific_class)
         print ("")
 
-    read_tasks()
-
-    read_cs()
-
-    read_cpu()
-
-    write_stats()
+    if follow:
+        print("Follow mode: refreshing the results every %s seconds (press Ctrl+C to stop)" % str(interval))
+        with profiler.phase("follow_traces"):
+            summary = follow_traces().summary
+    elif stream:
+        if sketch_error is None:
+            print("Streaming mode: percentiles and whiskers are approximated with a relative error of at most %s%%" % str(100.0/(1 << (SUB_BUCKET_BITS + 1))))
+        else:
+            print("Streaming mode: percentiles and whiskers are approximated with a quantile sketch")
+        print("")
+        with profiler.phase("stream_traces") as phase:
+            diagnoser = stream_traces()
+            phase.rows = diagnoser.exec_tasks
+
+        with profiler.phase("statistics") as phase:
+            diagnosis = diagnoser.statistics()
+            phase.rows = diagnoser.exec_tasks
+
+        if histograms_file is not None:
+            with profiler.phase("save_histograms"):
+                save_histograms(histograms_file, histograms)
+    else:
+        with profiler.phase("read_tasks") as phase:
+            tasks = read_tasks()
+            phase.rows = len(tasks)
+
+        if histograms_file is not None:
+            with profiler.phase("save_histograms") as phase:
+                save_histograms(histograms_file, class_histograms(tasks))
+                phase.rows = len(tasks)
+
+        with profiler.phase("read_cs") as phase:
+            cs_trace = read_cs()
+            phase.rows = len(cs_trace)
+
+        with profiler.phase("read_cpu") as phase:
+            cpu_trace = read_cpu()
+            phase.rows = len(cpu_trace)
+
+        if len(group_keys) > 0:
+            with profiler.phase("group_diagnose") as phase:
+                groups = group_diagnose(tasks, cs_trace, cpu_trace, group_keys, gran_central)
+                phase.rows = len(tasks)
+
+            with profiler.phase("write_stats"):
+                write_group_stats(groups)
+            profiler.finish()
+            exit(0)
+
+        with profiler.phase("diagnose") as phase:
+            diagnosis = diagnose(tasks, cs_trace, cpu_trace, specific_class, gran_central, sketch_error)
+            phase.rows = len(tasks)
+
+    if not follow:
+        with profiler.phase("write_stats"):
+            write_stats(diagnosis)
+        summary = diagnosis.summary
+
+    if sketch_file is not None:
+        summary.save(sketch_file)
+
+    profiler.finish()
 
 
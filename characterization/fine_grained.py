@@ -3,7 +3,17 @@
 from __future__ import division
 from optparse import OptionParser
 import sys
+import os
 import csv
+import time
+
+#Makes the shared 'tgp' package (located in the parent directory) importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from tgp.analysis import CHARACTERIZATION_COLUMNS, DEFAULT_FINE_MAX_DIFF, DEFAULT_FINE_MAX_GRAN, DEFAULT_FINE_MIN_TASKS, FineGrained, average_outside, fine_grained, fine_grained_sweep, is_finegrained, load_samples, load_tasks
+from tgp.compression import open_trace
+from tgp.follow import TaskTail, SampleTail, ClassTotals
+from tgp.intervals import SampleIndex, IntervalUnion
+from tgp.profiling import Profiler, add_options
 
 helper = '''This script extracts useful information related to the execution of fine-grained tasks. In particular, the script identifies classes spawning only fine-grained tasks and, for each of them, computes the average task granularity and the average amount of context switches experienced by the application during task execution. The script also computes the average amount of context switches occurred when no fine-grained task was in execution.
         
@@ -13,222 +23,148 @@ A class is considered as "spawning only fine-grained tasks" if ALL tasks of such
   (3) the number of tasks spawned by the class is greater than or equal to MIN_TASKS_SPAWNED (user-customizable)
         
 The results are both printed to stardard output and written in a new trace (named 'fine-grained.csv' by default).
+
+In follow mode (--follow), the script analyzes the traces while the profiled application is still running: the traces are tailed, and the results are refreshed every few seconds with the rows appended in the meantime, until the script is interrupted (e.g., with Ctrl+C).
+
+In sweep mode (--sweep), -G, -D, and -m can be passed several times, and the analysis is performed for every combination of the passed values (i.e., for every point of the threshold grid) in a single run. The classes satisfying the conditions at each point, together with their average granularity and number of context switches, are written in a new trace (named 'fine-grained-sweep.csv' by default).
         
 Note: All input traces should have been produced by tgp with a SINGLE profiling run, either in the bytecode profiling or reference-cycles profiling mode.
 
-Usage: ./fine_grained.py -t <path to task trace> -c <path to CS trace> [-G <MAX_GRAN> -D <MAX_DIFF> -m <MIN_TASKS_SPAWNED> -o <path to result trace (output)>]'''
+Usage: ./fine_grained.py -t <path to task trace> -c <path to CS trace> [-G <MAX_GRAN> -D <MAX_DIFF> -m <MIN_TASKS_SPAWNED> -o <path to result trace (output)> -j <jobs> --no-cache --sweep --follow -i <seconds> --profile]'''
 
 #Default name for the output csv file
 DEFAULT_OUT_FILE = "fine-grained.csv"
-#Default maximum relative range
-DEFAULT_MAX_RANGE = 100000000
-#Default minimum number of tasks
-DEFAULT_MIN_TASKS = 0
-#Default maximum granularity
-DEFAULT_MAX_GRAN = 100000000
-
-#Number of columns in the task trace
-FIELDS_TASK = 22
-#Number of columns in the CS trace
-FIELDS_CS = 2
-
-#The alost containing context-switches data
-contextswitches = []
-
-#The dictionary associating each class to a list of Task instances
-classes = {}
-
-#The dictionary associating each class to the total number of context-switches occured while fine-grained tasks contained in such class were executing
-fineclasses = {}
-
-#The total number of tasks
-total_tasks = 0
-
-class Task:
-    '''
-    A class containing relevant data taken from the task trace.
-    '''
-    def __init__(self, this_id, this_class, this_entrytime, this_exittime, this_granularity):
-        self.this_id = this_id
-        self.this_class = this_class
-        self.this_entrytime = this_entrytime
-        self.this_exittime = this_exittime
-        self.this_granularity = this_granularity
+#Default name for the output csv file in sweep mode
+DEFAULT_SWEEP_OUT_FILE = "fine-grained-sweep.csv"
+#By default, the task trace is parsed by a single process
+DEFAULT_JOBS = 1
+#Default number of seconds between two refreshes in follow mode
+DEFAULT_INTERVAL = 10
 
-class ContextSwitch:
-    '''
-    A class containing data taken from the CS trace.
-    '''
-    def __init__(self, this_timestamp, this_contextswitches):
-        self.this_timestamp = this_timestamp
-        self.this_contextswitches = this_contextswitches
+#The values of MAX_GRAN, MAX_DIFF, and MIN_TASKS_SPAWNED evaluated in sweep mode
+gran_grid = []
+diff_grid = []
+min_tasks_grid = []
 
-def contains_letters(string):
+def read_tasks(inputfile):
     '''
-    Checks whether the input string contains letters.
-    string: the string on which to check the presence of letters.
-    Returns true if the string contains letters, false otherwise.
+    Reads the task trace.
+    inputfile: the task trace to read.
+    Returns a TaskTrace.
     '''
-    for s in string:
-        if s.isalpha():
-            return True
-    return False
+    try:
+        return load_tasks(inputfile, CHARACTERIZATION_COLUMNS, cache, jobs)
+    except ValueError:
+        print("Wrong task trace format")
+        exit(-1)
 
-def read_csv(inputfile, datatype):
+def read_csv(inputfile):
     '''
-        Reads the input csv file. Based on the file format (specified via 'datatype'), initializes the appropriate data structures.
+    Reads the CS trace.
     inputfile: the csv file to read.
-    datatype: the type of the file to read.
-    '''
-    linecounter = 0
-    with open (inputfile) as csvfile:
-        csvreader = csv.reader(csvfile, delimiter=',')
-        for row in csvreader:
-            #Reads tasks
-            if datatype == "TASK" and linecounter > 0:
-                if len(row) != FIELDS_TASK:
-                    print("Wrong task trace format")
-                    exit(-1)
-                if contains_letters(row[0]):
-                    continue
-                task_id = row[0]
-                task_class = row[1]
-                if contains_letters(row[12]):
-                    continue
-                task_entry = long(row[12])
-                if contains_letters(row[13]):
-                    continue
-                task_exit = long(row[13])
-                if contains_letters(row[14]):
-                    continue
-                task_gran = long(row[14])
-                #An instance of Task is created if the timestamp associated with its execution is non-negative
-                if task_entry >= 0 and task_exit >= 0:
-                    if task_class not in classes:
-                        classes[task_class] = []
-                    #Inserts the new Task instance into the corresponding class entry
-                    classes[task_class].append(Task(task_id, task_class, task_entry, task_exit, task_gran))
-                    global total_tasks
-                    total_tasks += 1
-            #Reads context-switches
-            elif datatype == "CS" and linecounter > 0:
-                if len(row) != FIELDS_CS:
-                    print("Wrong CS trace format")
-                    exit(-1)
-                cs_time = float(row[0])
-                cs_css = float(row[1])
-                contextswitches.append(ContextSwitch(cs_time, cs_css))
-            linecounter += 1
-
-def sort_tasks():
-    '''
-    Sorts in place each entry of the class dictionary based on task granularity.
-    This is done so that checking the granularities' range is faster.
-    '''
-    for key, value in classes.iteritems():
-        value.sort(key=lambda x:x.this_granularity, reverse=True)
-
-def are_finegrained(array):
-    '''
-    Checks whether all granularities in the input array satisfy the conditions to consider the class as fine-grained.
-    array: the array to perform the check on.
-    Returns true if all conditions are satisfied, false otherwise.
-    '''
-    all_grans_min = True
-    for arr in array:
-        if arr.this_granularity > max_granularity:
-            all_grans_min = False
-            break
-    if all_grans_min == False:
-        return False
-    condition = array[0].this_granularity - array[len(array) - 1].this_granularity <= margin and len(array) >= min_tasks_number
-    return condition
-
-def finegrained_contextswitches():
-    '''
-    For each class, this functions counts the total number of context switches occurred during task execution.
-    '''
-    for key in classes:
-        tasks = classes[key]
-        #Checks if the conditions for tasks to be considered fine-grained hold
-        if are_finegrained(tasks):
-            total_num_gran = 0
-            total_gran = 0
-            total_num_cs = 0
-            total_cs = 0
-            for task in tasks:
-                total_num_gran += 1
-                total_gran += task.this_granularity
-                for cs in contextswitches:
-                    #Checks whether the context-switch timestamp falls within the task execution
-                    if cs.this_timestamp >= task.this_entrytime and cs.this_timestamp <= task.this_exittime:
-                        total_cs += cs.this_contextswitches
-                        total_num_cs += 1
-            fineclasses[key] = [total_gran, total_cs, total_num_gran, total_num_cs]
-
-def context_switches_not_in_finegrained():
-    '''
-    Returns the average number of context switches occurred when fine-grained tasks are not in execution.
-    '''
-    cs_num = 0
-    cs_total = 0
-    avg_cs = 0
-    for cs in contextswitches:
-        is_outside = True
-        for key in fineclasses:
-            tasks = classes[key]
-            if is_outside == False:
-                break
-            for task in tasks:
-                if cs.this_timestamp >= task.this_entrytime and cs.this_timestamp <= task.this_exittime:
-                    is_outside = False
-                    break
-        if is_outside == True:
-            cs_num += 1
-            cs_total += cs.this_contextswitches
-    if cs_num > 0:
-        avg_cs = cs_total/cs_num
-    return avg_cs
-
-def output_results():
-    '''
-    Writes the result on a csv file and prints them on standard output.
-    '''
-    contents = []
-    avg_cs_out = context_switches_not_in_finegrained()
-    print("")
-    print("Average number of context switches experienced when fine-grained tasks are not in execution: %scs/100ms" % str(avg_cs_out))
+    Returns a Trace.
+    '''
+    try:
+        trace = load_samples(inputfile, "cs", cache)
+    except ValueError:
+        print("Wrong CS trace format")
+        exit(-1)
+    #Skips the header
+    return trace.select(trace["line"] > 0)
+
+def follow_traces():
+    '''
+    Follows the task and CS traces while they are being written, refreshing the results every 'interval' seconds until interrupted (e.g., with Ctrl+C).
+    Each refresh parses only the rows appended since the previous one, and adds them to the running totals of each class (see ClassTotals). The execution intervals of a class are released as soon as its maximum granularity or its granularity range exceed the thresholds, as the class can no longer be fine-grained.
+    '''
+    #The dictionary associating each class to the ClassTotals of its tasks and of the context switches occurred during their execution
+    running = {}
+    #The context switches read so far
+    index = SampleIndex([], [])
+    task_tail = TaskTail(tasksfile, CHARACTERIZATION_COLUMNS)
+    cs_tail = SampleTail(csfile, "cs")
+    try:
+        while True:
+            try:
+                chunk = task_tail.poll()
+                cs_trace = cs_tail.poll()
+            except ValueError as error:
+                print(str(error))
+                exit(-1)
+            chunk = chunk.select(chunk.executed())
+            #Skips the header
+            cs_trace = cs_trace.select(cs_trace["line"] > 0)
+            #New tasks are checked against the context switches read so far, and new context switches against all tasks read so far
+            for task_class, rows in chunk.group_by("class"):
+                if task_class not in running:
+                    running[task_class] = ClassTotals(1)
+                totals = running[task_class]
+                totals.add_tasks(chunk["entry"][rows], chunk["exit"][rows], chunk["granularity"][rows], [index])
+                if totals.union is not None and (totals.max > max_granularity or totals.max - totals.min > margin):
+                    totals.release()
+            index.extend(cs_trace["timestamp"].tolist(), cs_trace["cs"].tolist())
+            for totals in running.values():
+                totals.add_samples(0, cs_trace["timestamp"], cs_trace["cs"])
+            if len(chunk) > 0 or len(cs_trace) > 0:
+                fineclasses = {}
+                for key in running:
+                    totals = running[key]
+                    if is_finegrained(totals.min, totals.max, totals.count, max_granularity, margin, min_tasks_number):
+                        fineclasses[key] = [totals.total_gran, totals.sample_totals[0], totals.count, totals.sample_counts[0]]
+                intervals = IntervalUnion((start, end) for key in fineclasses for start, end in zip(running[key].union.starts, running[key].union.ends))
+                print("")
+                print("Report at %s" % time.strftime("%Y-%m-%d %H:%M:%S"))
+                output_results(FineGrained(fineclasses, average_outside(intervals, index.timestamps, index.values)))
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print("")
+
+def output_results(result):
+    '''
+    Writes the results (a FineGrained) on a csv file and prints them on standard output.
+    '''
+    print(result.report())
+    result.write(output_file)
+
+def output_sweep(points):
+    '''
+    Writes the classes which are fine-grained at each point of the threshold grid on a csv file, and prints them on standard output.
+    A point where no class is fine-grained is written as a single row without class.
+    points: the points of the grid, as returned by fine_grained_sweep.
+    '''
+    fieldnames = ["MAX_GRAN", "MAX_DIFF", "MIN_TASKS_SPAWNED", "Class", "Average granularity", "Average number of context switches"]
     print("")
-    for key in fineclasses:
-        content = {}
-        avg_gran = 0
-        avg_cs = 0
-        if fineclasses[key][2] > 0:
-            avg_gran = fineclasses[key][0]/fineclasses[key][2]
-        if fineclasses[key][3] > 0:
-            avg_cs = fineclasses[key][1]/fineclasses[key][3]
-        print("Class: %s -> Average granularity: %s -> Average number of context switches: %s" % (key, str(avg_gran), str(avg_cs) + "cs/100ms"))
-        content["Class"] = key
-        content["Average granularity"] = str(avg_gran)
-        content["Average number of context switches"] = str(avg_cs)
-        contents.append(content)
-    print("")
-    with open(output_file, 'w') as csvfile:
-        fieldnames = ["Class", "Average granularity", "Average number of context switches"]
+    with open_trace(output_file, 'w') as csvfile:
         writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
         writer.writeheader()
-        for cont in contents:
-            writer.writerow(cont)
+        for max_gran, max_diff, min_tasks, qualifying in points:
+            print("MAX_GRAN: %s -> MAX_DIFF: %s -> MIN_TASKS_SPAWNED: %s -> Fine-grained classes: %s" % (str(max_gran), str(max_diff), str(min_tasks), str(len(qualifying))))
+            point = {"MAX_GRAN": str(max_gran), "MAX_DIFF": str(max_diff), "MIN_TASKS_SPAWNED": str(min_tasks)}
+            if len(qualifying) == 0:
+                writer.writerow(point)
+            for key, avg_gran, avg_cs in qualifying:
+                content = dict(point)
+                content["Class"] = key
+                content["Average granularity"] = str(avg_gran)
+                content["Average number of context switches"] = str(avg_cs)
+                writer.writerow(content)
+    print("")
 
 if __name__ == "__main__":
     #Flags parser
     parser = OptionParser(helper)
     parser.add_option('-t', '--task', dest='tasksfile', type='string', help="path to the task trace containing data to be analyzed", metavar="TASK_TRACE")
     parser.add_option('-c', '--context-switches', dest='csfile', type='string', help="path to the CS trace containing data to be analyzed", metavar="CS_TRACE")
-    parser.add_option('-D', '--max-gran-diff', dest='margin', type='float', help="sets MAX_DIFF (10^8 by default)", metavar="MAX_DIFF")
-    parser.add_option('-m', '--min-task-spawned', dest='min_tasks_number', type='float', help="sets MIN_TASK_SPAWNED (0 by default)", metavar="MIN_TASK_SPAWNED")
-    parser.add_option('-G','--max-granularity', dest='max_granularity', type='long', help="sets MAX_GRAN (10^8 by default)", metavar="MAX_GRAN")
-    parser.add_option('-o', '--output', dest='output_file', type='string', help="the path to the output trace containing the results. If none is provided, then the output trace will be produced in './fine-grained.csv'", metavar="RESULT_TRACE")
+    parser.add_option('-D', '--max-gran-diff', dest='margin', type='float', action='append', help="sets MAX_DIFF (10^8 by default). In sweep mode, can be passed several times", metavar="MAX_DIFF")
+    parser.add_option('-m', '--min-task-spawned', dest='min_tasks_number', type='float', action='append', help="sets MIN_TASK_SPAWNED (0 by default). In sweep mode, can be passed several times", metavar="MIN_TASK_SPAWNED")
+    parser.add_option('-G','--max-granularity', dest='max_granularity', type='long', action='append', help="sets MAX_GRAN (10^8 by default). In sweep mode, can be passed several times", metavar="MAX_GRAN")
+    parser.add_option('-o', '--output', dest='output_file', type='string', help="the path to the output trace containing the results. If none is provided, then the output trace will be produced in './fine-grained.csv' (or in './fine-grained-sweep.csv' in sweep mode)", metavar="RESULT_TRACE")
+    parser.add_option('-j', '--jobs', dest='jobs', type='int', help="the number of processes parsing the task trace in parallel (1 by default). If 0 is passed, then all CPUs are used", metavar="JOBS")
+    parser.add_option('--no-cache', dest='no_cache', action='store_true', default=False, help="do not read or write the binary cache of the input traces. By default, the traces are parsed once and their content is cached next to them (e.g., in '<task trace>.cache'), so that later runs on the same traces load them faster")
+    parser.add_option('--sweep', dest='sweep', action='store_true', default=False, help="evaluate every combination of the values passed with -G, -D, and -m (i.e., every point of the threshold grid) in a single run, and write the classes which are fine-grained at each point")
+    parser.add_option('--follow', dest='follow', action='store_true', default=False, help="follows the traces while they are being written (e.g., by a running profiling session), refreshing the results every INTERVAL seconds with the rows appended in the meantime, until interrupted. The traces are neither cached nor parsed in parallel")
+    parser.add_option('-i', '--interval', dest='interval', type='float', help="the number of seconds between two refreshes in follow mode (10 by default)", metavar="INTERVAL")
+    add_options(parser)
     (options, arguments) = parser.parse_args()
     if (options.tasksfile is None):
         print(parser.usage)
@@ -241,30 +177,66 @@ if __name__ == "__main__":
     else:
         csfile = options.csfile
     if (options.margin is None):
-        margin = DEFAULT_MAX_RANGE
+        diff_grid = [DEFAULT_FINE_MAX_DIFF]
     else:
-        margin = options.margin
+        diff_grid = options.margin
     if (options.min_tasks_number is None):
-        min_tasks_number = DEFAULT_MIN_TASKS
+        min_tasks_grid = [DEFAULT_FINE_MIN_TASKS]
     else:
-        min_tasks_number = options.min_tasks_number
+        min_tasks_grid = options.min_tasks_number
     if (options.max_granularity is None):
-        max_granularity = DEFAULT_MAX_GRAN
+        gran_grid = [DEFAULT_FINE_MAX_GRAN]
     else:
-        max_granularity = options.max_granularity
+        gran_grid = options.max_granularity
+    #Outside sweep mode, the last value passed is used
+    margin = diff_grid[-1]
+    min_tasks_number = min_tasks_grid[-1]
+    max_granularity = gran_grid[-1]
     if (options.output_file is None):
-        output_file = DEFAULT_OUT_FILE
+        if options.sweep:
+            output_file = DEFAULT_SWEEP_OUT_FILE
+        else:
+            output_file = DEFAULT_OUT_FILE
     else:
         output_file = options.output_file
+    cache = not options.no_cache
+    profiler = Profiler("fine_grained", options)
+    if (options.interval is None):
+        interval = DEFAULT_INTERVAL
+    else:
+        interval = options.interval
+    if (options.jobs is None):
+        jobs = DEFAULT_JOBS
+    else:
+        jobs = options.jobs
 
     print("")
     print("Starting analysis...")
 
-    read_csv(tasksfile, "TASK")
-    read_csv(csfile, "CS")
+    if options.follow:
+        print("Follow mode: refreshing the results every %s seconds (press Ctrl+C to stop)" % str(interval))
+        with profiler.phase("follow_traces"):
+            follow_traces()
+        profiler.finish()
+        exit(0)
 
-    sort_tasks()
+    with profiler.phase("read_tasks") as phase:
+        tasks = read_tasks(tasksfile)
+        phase.rows = len(tasks)
+    with profiler.phase("read_cs") as phase:
+        cs_trace = read_csv(csfile)
+        phase.rows = len(cs_trace)
+
+    if options.sweep:
+        with profiler.phase("sweep") as phase:
+            output_sweep(fine_grained_sweep(tasks, cs_trace, gran_grid, diff_grid, min_tasks_grid))
+            phase.rows = len(tasks)
+    else:
+        with profiler.phase("fine_grained") as phase:
+            result = fine_grained(tasks, cs_trace, max_granularity, margin, min_tasks_number)
+            phase.rows = len(tasks)
 
-    finegrained_contextswitches()
+        with profiler.phase("output_results"):
+            output_results(result)
 
-    output_results()
+    profiler.finish()
@@ -0,0 +1,204 @@
+#!/usr/bin/python
+
+from __future__ import division
+from optparse import OptionParser
+import sys
+import os
+import csv
+
+#Makes the shared 'tgp' package (located in the parent directory) importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from tgp.analysis import DEFAULT_CENTRAL_GRAN, Diagnoser
+from tgp.compression import open_trace
+from tgp.histogram import SUB_BUCKET_BITS, load_histograms, merge_histograms, save_histograms
+from tgp.sketch import QuantileSketch, load_sketch
+from tgp.profiling import Profiler, add_options
+
+helper = '''This script analyzes the histograms of task granularity saved by diagnose.py (with --save-histograms), without reading the task traces again.
+
+The histograms of all input files (e.g., of several runs of the same application) are merged class by class. Then, the script computes the statistics of diagnose.py related to tasks (number of tasks, average granularity, percentiles, whiskers, and percentage of tasks around the central granularity) for all tasks or for the tasks of a specific class, and a summary of the same statistics for each class. The distribution of the granularity of all tasks and of each class is written in a new trace (named 'granularity-distribution.csv' by default), which can be used to plot it.
+
+Count and average granularity are exact, while percentiles, whiskers, and the percentage of tasks around the central granularity are approximated with a relative error of at most %s%% on granularity. The merged histograms can be saved (--save), e.g., to be merged with those of later runs.
+
+Alternatively, the script merges the quantile sketches saved by diagnose.py or batch.py (with --save-sketch), and computes the same statistics for the tasks recorded by all sketches, i.e., percentiles are computed over the tasks of all runs instead of being averaged across runs. Percentiles and whiskers are then approximated with the rank error of the least accurate sketch, and no distribution trace is written.
+
+Usage: ./histograms.py -H <path to histograms> [-H <path to histograms> ... -s <class name> -g <central granularity> -P <percentile> -b <bits> -o <path to distribution trace (output)> --save <path to merged histograms (output)> --profile]
+       ./histograms.py -S <path to sketch> [-S <path to sketch> ... -g <central granularity> -P <percentile> --profile]''' % str(100.0/(1 << (SUB_BUCKET_BITS + 1)))
+
+#The default name of the output distribution file
+DEFAULT_OUT_FILE = "granularity-distribution.csv"
+#By default, the distribution has 4 buckets for each power of two
+DEFAULT_BITS = 2
+
+def read_histograms():
+    '''
+    Reads and merges the histograms of all input files.
+    Returns a dictionary associating each class (None for all tasks) with its LogLinearHistogram.
+    '''
+    all_histograms = []
+    for path in histograms_files:
+        try:
+            all_histograms.append(load_histograms(path))
+        except (IOError, KeyError, ValueError) as error:
+            print("Wrong histograms file %s: %s" % (path, str(error)))
+            exit(-1)
+    return merge_histograms(all_histograms)
+
+def read_sketches():
+    '''
+    Reads and merges the quantile sketches of all input files.
+    Returns the merged QuantileSketch, whose parameter k is the smallest one of the input sketches.
+    '''
+    all_sketches = []
+    for path in sketch_files:
+        try:
+            all_sketches.append(load_sketch(path))
+        except (IOError, KeyError, ValueError) as error:
+            print("Wrong sketch file %s: %s" % (path, str(error)))
+            exit(-1)
+    merged = QuantileSketch(min(sketch.k for sketch in all_sketches))
+    for sketch in all_sketches:
+        merged.merge(sketch)
+    return merged
+
+def tasks_statistics(summary, task_class):
+    '''
+    Computes the statistics of diagnose.py related to tasks from a histogram or a sketch.
+    Returns a dictionary containing such statistics.
+    '''
+    diagnoser = Diagnoser(task_class, gran_central)
+    diagnoser.use_summary(summary)
+    return diagnoser.tasks_statistics()
+
+def print_statistics(summary):
+    '''
+    Prints the statistics of the tasks recorded by a histogram or a sketch on standard output.
+    '''
+    tasks_stats = tasks_statistics(summary, specific_class)
+    print("")
+    print("TASKS STATISTICS")
+    print("-> Total number of tasks: " + tasks_stats["Total number of tasks"])
+    print("-> Average granularity: " + tasks_stats["Average granularity"])
+    print("-> Minimum granularity: " + str(summary.min))
+    for name in ["1st percentile - granularity", "5th percentile - granularity", "50th percentile (median) - granularity", "95th percentile - granularity", "99th percentile - granularity"]:
+        print("-> %s: %s" % (name, tasks_stats[name]))
+    for percentile in percentiles:
+        print("-> Percentile %s - granularity: %s" % (str(percentile), str(summary.value_at(int(summary.count * percentile / 100)))))
+    print("-> Maximum granularity: " + str(summary.max))
+    print("-> IQC - granularity: " + tasks_stats["IQC - granularity"])
+    print("-> Whiskers range - granularity: [" + tasks_stats["Lower whiskers range - granularity"] + ", " + tasks_stats["Upper whiskers range - granularity"] + "]")
+    print("-> Percentage of tasks having granularity within whiskers range: " + tasks_stats["Percentage of tasks having granularity within whiskers range"] + "%")
+    print("-> Percentage of tasks with granularity around " + tasks_stats["Central granularity"] + ": " + tasks_stats["Percentage of tasks with granularity around central granularity"] + "%")
+    if "Percentile rank error" in tasks_stats:
+        print("-> Percentile rank error: +-%.3g%%" % (float(tasks_stats["Percentile rank error"])*100))
+    print("")
+
+def output_results(histograms):
+    '''
+    Prints the statistics on standard output, and writes the distribution of granularity on a csv file.
+    '''
+    print_statistics(histograms[specific_class])
+    names = [None] + sorted(name for name in histograms if name is not None)
+    if specific_class is None:
+        print("CLASSES")
+        for name in names[1:]:
+            class_stats = tasks_statistics(histograms[name], name)
+            print("-> %s: %s tasks, average granularity %s, median granularity %s, %s%% around %s" % (name, class_stats["Total number of tasks"], class_stats["Average granularity"], class_stats["50th percentile (median) - granularity"], class_stats["Percentage of tasks with granularity around central granularity"], class_stats["Central granularity"]))
+        print("")
+    with open_trace(output_file, 'w') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["Class", "Lowest granularity", "Highest granularity", "Tasks", "Cumulative percentage"])
+        for name in names:
+            seen = 0
+            for low, high, count in histograms[name].buckets(bits):
+                seen += count
+                writer.writerow(["null" if name is None else name, low, high, count, seen / histograms[name].count * 100])
+
+if __name__ == "__main__":
+    #Flags parser
+    parser = OptionParser(helper)
+    parser.add_option('-H', '--histograms', dest='histograms_files', action='append', type='string', help="path to a histograms file saved by diagnose.py (with --save-histograms). This option can be repeated to merge the histograms of several runs", metavar="HISTOGRAMS_FILE")
+    parser.add_option('-S', '--sketch', dest='sketch_files', action='append', type='string', help="path to a quantile sketch saved by diagnose.py or batch.py (with --save-sketch), instead of histograms. This option can be repeated to merge the sketches of several runs", metavar="SKETCH_FILE")
+    parser.add_option('-s', '--specific-class', dest='specific_class', type='string', help="a specific class on which to focus the analysis. If the script should analyze all tasks, then this option should not be set (or should be set to 'null', which is the default value)", metavar="CLASS")
+    parser.add_option('-g', '--central-granularity', dest='gran_central', type='long', help="specifies the 'central granularity'. The script computes the percentage of tasks whose granularity has the same order as the central granularity (10^5 by default)", metavar="CENTRAL_GRAN")
+    parser.add_option('-P', '--percentile', dest='percentiles', action='append', type='float', help="an additional percentile of task granularity to compute (e.g., 90). This option can be repeated", metavar="PERCENTILE")
+    parser.add_option('-b', '--bits', dest='bits', type='int', help="the precision of the buckets of the output distribution, i.e., each power of two is split into 2^BITS buckets (2 by default, at most %s)" % str(SUB_BUCKET_BITS), metavar="BITS")
+    parser.add_option('-o', '--output', dest='output_file', type='string', help="the path to the output trace containing the distribution of granularity. If none is provided, then the output trace will be produced in './granularity-distribution.csv'", metavar="DISTRIBUTION_TRACE")
+    parser.add_option('--save', dest='save_file', type='string', help="saves the merged histograms into a NumPy .npz file, which can be passed again to this script", metavar="HISTOGRAMS_FILE")
+    add_options(parser)
+    (options, arguments) = parser.parse_args()
+    if (options.histograms_files is None and options.sketch_files is None):
+        print(parser.usage)
+        exit(0)
+    histograms_files = options.histograms_files
+    sketch_files = options.sketch_files
+    if sketch_files is not None and (histograms_files is not None or options.specific_class is not None or options.bits is not None or options.output_file is not None or options.save_file is not None):
+        print("-S cannot be combined with -H, -s, -b, -o, or --save")
+        exit(-1)
+    if (options.specific_class is None or options.specific_class == "null"):
+        specific_class = None
+    else:
+        specific_class = options.specific_class
+    if (options.gran_central is None):
+        gran_central = DEFAULT_CENTRAL_GRAN
+    else:
+        gran_central = options.gran_central
+    if (options.percentiles is None):
+        percentiles = []
+    else:
+        percentiles = options.percentiles
+    for percentile in percentiles:
+        if not 0 <= percentile <= 100:
+            print("Percentiles must be between 0 and 100")
+            exit(-1)
+    if (options.bits is None):
+        bits = DEFAULT_BITS
+    else:
+        bits = options.bits
+    if not 0 <= bits <= SUB_BUCKET_BITS:
+        print("The precision of the buckets must be between 0 and %s bits" % str(SUB_BUCKET_BITS))
+        exit(-1)
+    if (options.output_file is None):
+        output_file = DEFAULT_OUT_FILE
+    else:
+        output_file = options.output_file
+    save_file = options.save_file
+    profiler = Profiler("histograms", options)
+
+    print("")
+    print("Starting analysis...")
+
+    if sketch_files is not None:
+        with profiler.phase("read_sketches"):
+            sketch = read_sketches()
+        if sketch.count == 0:
+            print("")
+            print("No executed task in the sketches")
+            exit(-1)
+        if len(sketch_files) > 1:
+            print("")
+            print("Merged the sketches of %s files" % str(len(sketch_files)))
+        with profiler.phase("output_results"):
+            print_statistics(sketch)
+        profiler.finish()
+        exit(0)
+
+    with profiler.phase("read_histograms"):
+        histograms = read_histograms()
+
+    if specific_class not in histograms or histograms[specific_class].count == 0:
+        print("")
+        print("No executed task%s in the histograms" % ("" if specific_class is None else " of class " + specific_class))
+        exit(-1)
+
+    if len(histograms_files) > 1:
+        print("")
+        print("Merged the histograms of %s files" % str(len(histograms_files)))
+
+    with profiler.phase("output_results"):
+        output_results(histograms)
+
+    if save_file is not None:
+        save_histograms(save_file, histograms)
+
+    profiler.finish()
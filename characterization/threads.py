@@ -0,0 +1,146 @@
+#!/usr/bin/python
+
+from __future__ import division
+from optparse import OptionParser
+import sys
+import os
+import csv
+
+#Makes the shared 'tgp' package (located in the parent directory) importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from tgp.analysis import load_tasks
+from tgp.compression import open_trace
+from tgp.profiling import Profiler, add_options
+from tgp.threads import IMBALANCE_KEYS, THREAD_COLUMNS, thread_activity
+
+helper = '''This script analyzes the activity of the threads executing tasks, which shows the scheduling overhead caused by tiny tasks and the starvation caused by oversized ones (e.g., in fork/join or thread-pool based applications).
+
+The executed tasks are grouped by execution thread, and the script computes:
+
+  (1) for each thread, the number and total granularity of its tasks, the time during which it was executing at least one task (busy time), and the time between its first and last task during which it was not (idle time). Nested tasks are merged with their outer tasks, hence they are not counted twice
+  (2) the distribution of idle gaps, i.e., of the time between the end of a task and the entry of the next task on the same thread
+  (3) the load imbalance among the threads of each executor (or of each thread class, with '-b class'), i.e., the ratio between the largest busy time of the threads of the group and their average busy time, minus 1. The coefficient of variation of the busy time is reported as well
+
+The results are printed to standard output and written in three new traces (named 'threads.csv', 'idle-gaps.csv', and 'imbalance.csv' by default).
+
+Usage: ./threads.py -t <path to task trace> [-b <executor|class> -o <path to thread trace (output)> --gaps <path to idle-gap trace (output)> --imbalance <path to imbalance trace (output)> -j <jobs> --no-cache --profile]'''
+
+#Default names for the output csv files
+DEFAULT_OUT_FILE = "threads.csv"
+DEFAULT_GAPS_FILE = "idle-gaps.csv"
+DEFAULT_IMBALANCE_FILE = "imbalance.csv"
+#By default, the threads of the same executor are compared
+DEFAULT_GROUP_BY = "executor"
+#By default, the task trace is parsed by a single process
+DEFAULT_JOBS = 1
+#The names of the percentiles of the idle gaps (see tgp.threads.GAP_PERCENTILES)
+PERCENTILE_NAMES = {1: "1st", 5: "5th", 50: "50th", 95: "95th", 99: "99th"}
+
+def read_tasks():
+    '''
+    Reads the task trace.
+    Returns a TaskTrace.
+    '''
+    try:
+        return load_tasks(tasks_file, THREAD_COLUMNS, cache, jobs)
+    except ValueError:
+        print("Wrong task trace format")
+        exit(-1)
+
+def output_results(activity):
+    '''
+    Prints the results (a ThreadActivity) to standard output and writes them to csv files.
+    '''
+    threads = activity.threads
+    utilization = activity.utilization().tolist()
+    imbalance = activity.imbalance(group_by)
+    busy = int(threads["busy"].sum())
+    idle = int(threads["idle"].sum())
+    print("")
+    print("Number of execution threads: %s" % str(len(threads)))
+    print("Total busy time: %sns" % str(busy))
+    print("Total idle time between the first and the last task of each thread: %sns" % str(idle))
+    print("")
+    print("IDLE GAPS BETWEEN CONSECUTIVE TASKS ON THE SAME THREAD:")
+    print("")
+    print("-> Number of idle gaps: %s" % str(len(activity.gaps)))
+    if len(activity.gaps) > 0:
+        print("-> Average idle gap: %sns" % str(float(activity.gaps.sum())/len(activity.gaps)))
+        for percentile, gap in activity.gap_percentiles():
+            print("-> %s percentile - idle gap: %sns" % (PERCENTILE_NAMES[percentile], str(gap)))
+        print("-> Longest idle gap: %sns" % str(int(activity.gaps.max())))
+    print("")
+    print("LOAD IMBALANCE AMONG THE THREADS OF EACH %s:" % ("EXECUTOR" if group_by == "executor" else "THREAD CLASS"))
+    print("")
+    for name, count, total, mean, low, high, group_imbalance, variation in imbalance:
+        print("-> %s: %s \n   Threads: %s \n   Average busy time: %sns \n   Busy time range: [%sns, %sns] \n   Imbalance: %s \n   Coefficient of variation: %s" % ("Executor" if group_by == "executor" else "Thread class", str(name), str(count), str(mean), str(low), str(high), str(group_imbalance), str(variation)))
+    print("")
+    with open_trace(output_file, 'w') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["Execution thread ID", "Execution thread class", "Execution thread name", "Executor ID", "Executor class", "Tasks", "Total granularity", "First entry time", "Last exit time", "Busy time", "Idle time", "Utilization", "Idle gaps", "Longest idle gap"])
+        writer.writerows(zip(threads["thread_id"].tolist(), threads["thread_class"].strings(), threads["thread_name"].strings(), threads["executor_id"].tolist(), threads["executor_class"].strings(), threads["tasks"].tolist(), threads["granularity"].tolist(),
+                             threads["first_entry"].tolist(), threads["last_exit"].tolist(), threads["busy"].tolist(), threads["idle"].tolist(), utilization, threads["gaps"].tolist(), threads["max_gap"].tolist()))
+    with open_trace(gaps_file, 'w') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["Lowest idle gap (ns)", "Highest idle gap (ns)", "Idle gaps"])
+        writer.writerows(activity.gap_histogram())
+    with open_trace(imbalance_file, 'w') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["Executor ID" if group_by == "executor" else "Execution thread class", "Threads", "Total busy time", "Average busy time", "Minimum busy time", "Maximum busy time", "Imbalance", "Coefficient of variation"])
+        writer.writerows(imbalance)
+
+if __name__ == "__main__":
+    #Flags parser
+    parser = OptionParser(helper)
+    parser.add_option('-t', '--task', dest='tasks_file', type='string', help="path to the task trace containing data to be analyzed", metavar="TASK_TRACE")
+    parser.add_option('-b', '--group-by', dest='group_by', type='choice', choices=sorted(IMBALANCE_KEYS), help="compare the threads of the same executor ('executor', by default) or of the same thread class ('class') to compute load imbalance", metavar="GROUP")
+    parser.add_option('-o', '--output', dest='output_file', type='string', help="the path to the output trace containing the activity of each thread. If none is provided, then the output trace will be produced in './threads.csv'", metavar="THREAD_TRACE")
+    parser.add_option('--gaps', dest='gaps_file', type='string', help="the path to the output trace containing the distribution of idle gaps. If none is provided, then the output trace will be produced in './idle-gaps.csv'", metavar="GAP_TRACE")
+    parser.add_option('--imbalance', dest='imbalance_file', type='string', help="the path to the output trace containing the load imbalance of each group of threads. If none is provided, then the output trace will be produced in './imbalance.csv'", metavar="IMBALANCE_TRACE")
+    parser.add_option('-j', '--jobs', dest='jobs', type='int', help="the number of processes parsing the task trace in parallel (1 by default). If 0 is passed, then all CPUs are used", metavar="JOBS")
+    parser.add_option('--no-cache', dest='no_cache', action='store_true', default=False, help="do not read or write the binary cache of the input traces. By default, the traces are parsed once and their content is cached next to them (e.g., in '<task trace>.cache'), so that later runs on the same traces load them faster")
+    add_options(parser)
+    (options, arguments) = parser.parse_args()
+    if (options.tasks_file is None):
+        print(parser.usage)
+        exit(0)
+    else:
+        tasks_file = options.tasks_file
+    if (options.group_by is None):
+        group_by = DEFAULT_GROUP_BY
+    else:
+        group_by = options.group_by
+    if (options.output_file is None):
+        output_file = DEFAULT_OUT_FILE
+    else:
+        output_file = options.output_file
+    if (options.gaps_file is None):
+        gaps_file = DEFAULT_GAPS_FILE
+    else:
+        gaps_file = options.gaps_file
+    if (options.imbalance_file is None):
+        imbalance_file = DEFAULT_IMBALANCE_FILE
+    else:
+        imbalance_file = options.imbalance_file
+    if (options.jobs is None):
+        jobs = DEFAULT_JOBS
+    else:
+        jobs = options.jobs
+    cache = not options.no_cache
+    profiler = Profiler("threads", options)
+
+    print("")
+    print("Starting analysis...")
+
+    with profiler.phase("read_tasks") as phase:
+        tasks = read_tasks()
+        phase.rows = len(tasks)
+
+    with profiler.phase("thread_activity") as phase:
+        activity = thread_activity(tasks)
+        phase.rows = len(tasks)
+
+    with profiler.phase("output_results"):
+        output_results(activity)
+
+    profiler.finish()
@@ -0,0 +1,123 @@
+#!/usr/bin/python
+
+from __future__ import division
+from optparse import OptionParser
+import sys
+import os
+
+#Makes the shared 'tgp' package (located in the parent directory) importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from tgp.analysis import load_samples, load_tasks
+from tgp.profiling import Profiler, add_options
+from tgp.timeline import resample, spanning_grid, write_timeline
+
+helper = '''This script projects the task, CS, CPU, and GC traces onto a common time grid, i.e., a sequence of consecutive bins of the same width (100ms by default), and produces a timeline containing one row per bin.
+
+For each bin, the timeline contains the average number of tasks in execution, the number and the total granularity of the tasks completed in the bin, the average number of context switches and the average user and system CPU utilization measured in the bin (empty if no measurement was taken), and the fraction of the bin spent in GC cycles.
+The grid spans all timestamps of the input traces. Each trace is projected onto the grid in a single pass, hence timelines can be produced (and plotted) cheaply even for long profiling runs.
+
+At least one trace must be provided, and only the columns related to the provided traces are produced. The timeline is written in a new trace (named 'timeline.csv' by default).
+
+Note: Nested tasks are counted together with their outer tasks. To count only outer tasks, provide the aggregated task trace (see aggregation.py).
+
+Usage: ./timeline.py [-t <path to task trace> -c <path to CS trace> -p <path to CPU trace> -g <path to GC trace> -w <bin width in ms> -o <path to result trace (output)> -j <jobs> --no-cache --profile]'''
+
+#Default name for the output csv file
+DEFAULT_OUT_FILE = "timeline.csv"
+#Default width of the bins, in milliseconds (the sampling period of context switches)
+DEFAULT_WIDTH = 100
+#By default, the task trace is parsed by a single process
+DEFAULT_JOBS = 1
+
+def read_tasks():
+    '''
+    Reads the task trace.
+    Returns a TaskTrace, or None if no task trace is provided.
+    '''
+    if tasks_file is None:
+        return None
+    try:
+        return load_tasks(tasks_file, ["entry", "exit", "granularity"], cache, jobs)
+    except ValueError:
+        print("Wrong task trace format")
+        exit(-1)
+
+def read_samples(path, kind, label):
+    '''
+    Reads a CS, CPU, or GC trace, skipping the measurements with a negative timestamp.
+    Returns a Trace, or None if the trace is not provided.
+    '''
+    if path is None:
+        return None
+    try:
+        trace = load_samples(path, kind, cache)
+    except ValueError:
+        print("Wrong %s trace format" % label)
+        exit(-1)
+    if kind == "gc":
+        return trace.select((trace["start"] >= 0) & (trace["end"] >= 0))
+    return trace.select(trace["timestamp"] >= 0)
+
+if __name__ == "__main__":
+    #Flags parser
+    parser = OptionParser(helper)
+    parser.add_option('-t', '--task', dest='tasks_file', type='string', help="path to the task trace", metavar="TASK_TRACE")
+    parser.add_option('-c', '--context-switches', dest='cs_file', type='string', help="path to the CS trace", metavar="CS_TRACE")
+    parser.add_option('-p', '--cpu', dest='cpu_file', type='string', help="path to the CPU trace", metavar="CPU_TRACE")
+    parser.add_option('-g', '--garbage-collector', dest='gc_file', type='string', help="path to the GC trace", metavar="GC_TRACE")
+    parser.add_option('-w', '--width', dest='width', type='float', help="the width of the bins of the grid, in milliseconds (100 by default)", metavar="WIDTH")
+    parser.add_option('-o', '--output', dest='output_file', type='string', help="the path to the output trace containing the timeline. If none is provided, then the output trace will be produced in './timeline.csv'", metavar="RESULT_TRACE")
+    parser.add_option('-j', '--jobs', dest='jobs', type='int', help="the number of processes parsing the task trace in parallel (1 by default). If 0 is passed, then all CPUs are used", metavar="JOBS")
+    parser.add_option('--no-cache', dest='no_cache', action='store_true', default=False, help="do not read or write the binary cache of the input traces. By default, the traces are parsed once and their content is cached next to them (e.g., in '<task trace>.cache'), so that later runs on the same traces load them faster")
+    add_options(parser)
+    (options, arguments) = parser.parse_args()
+    tasks_file = options.tasks_file
+    cs_file = options.cs_file
+    cpu_file = options.cpu_file
+    gc_file = options.gc_file
+    if tasks_file is None and cs_file is None and cpu_file is None and gc_file is None:
+        print(parser.usage)
+        exit(0)
+    if (options.width is None):
+        width = DEFAULT_WIDTH
+    else:
+        width = options.width
+    if width <= 0:
+        print("The width of the bins must be positive")
+        exit(-1)
+    if (options.output_file is None):
+        output_file = DEFAULT_OUT_FILE
+    else:
+        output_file = options.output_file
+    if (options.jobs is None):
+        jobs = DEFAULT_JOBS
+    else:
+        jobs = options.jobs
+    cache = not options.no_cache
+    profiler = Profiler("timeline", options)
+
+    print("")
+    print("Reading traces...")
+
+    with profiler.phase("read_traces") as phase:
+        tasks = read_tasks()
+        cs_trace = read_samples(cs_file, "cs", "CS")
+        cpu_trace = read_samples(cpu_file, "cpu", "CPU")
+        gc_trace = read_samples(gc_file, "gc", "GC")
+        phase.rows = sum(len(trace) for trace in [tasks, cs_trace, cpu_trace, gc_trace] if trace is not None)
+
+    with profiler.phase("resample") as phase:
+        #Timestamps are in nanoseconds
+        grid = spanning_grid(max(int(round(width * 1000000)), 1), tasks, cs_trace, cpu_trace, gc_trace)
+        timeline = resample(grid, tasks, cs_trace, cpu_trace, gc_trace)
+        phase.rows = grid.bins
+
+    print("Timeline of %s bins of %sms, from %sns to %sns" % (str(grid.bins), str(width), str(grid.start), str(grid.end())))
+
+    with profiler.phase("write_timeline") as phase:
+        write_timeline(timeline, output_file)
+        phase.rows = grid.bins
+
+    print("Timeline written in %s" % output_file)
+    print("")
+    profiler.finish()
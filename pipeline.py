@@ -0,0 +1,208 @@
+#!/usr/bin/python
+
+from optparse import OptionParser
+import sys
+import os
+import multiprocessing
+
+#Makes the shared 'tgp' package (located in the same directory) importable
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from tgp.analysis import aggregate, coarse_grained, diagnose, filter_gc, fine_grained, load_samples, load_tasks, valid_cpu, valid_cs, write_cpu, write_cs
+from tgp.compression import EXTENSIONS, find_trace
+
+helper = '''This script runs the whole post-processing and characterization pipeline on a directory of traces produced by tgp (such as 'traces/'), i.e., it performs task aggregation and GC filtering, and then runs the diagnosis and the analyses of fine- and coarse-grained tasks on the aggregated task trace and on the filtered CS and CPU traces.
+
+The four traces ('tasks.csv', 'cs.csv', 'cpu.csv', and 'gc.csv') are loaded concurrently (the task trace by the main process, the others by worker processes), and each stage receives the results of the previous ones in memory, without writing and reading back intermediate traces. The results are the same as running aggregation.py, gc-filtering.py, diagnose.py, fine_grained.py, and coarse_grained.py in sequence with their default options.
+
+The script produces the result traces of the three characterization scripts ('diagnostics.csv', 'fine-grained.csv', and 'coarse-grained.csv'). Optionally, it also produces the intermediate traces ('aggregated-tasks.csv', 'filtered-cs.csv', and 'filtered-cpu.csv').
+
+The traces can be compressed (e.g., 'tasks.csv.gz'), and the result traces can be compressed as well with the --compress option.
+
+Note: If the GC trace is missing (i.e., no stop-the-world collection occurred), GC filtering is skipped.
+
+Usage: ./pipeline.py -d <path to trace directory> [-o <path to output directory> --intermediate -j <jobs> --no-cache --compress <format>]'''
+
+#Default output directory
+DEFAULT_OUT_DIR = "."
+#By default, the task trace is parsed by a single process
+DEFAULT_JOBS = 1
+
+#The names of the traces in the trace directory
+TASKS_FILE = "tasks.csv"
+CS_FILE = "cs.csv"
+CPU_FILE = "cpu.csv"
+GC_FILE = "gc.csv"
+
+#The names of the result traces in the output directory
+AGGREGATED_FILE = "aggregated-tasks.csv"
+FILTERED_CS_FILE = "filtered-cs.csv"
+FILTERED_CPU_FILE = "filtered-cpu.csv"
+DIAGNOSTICS_FILE = "diagnostics.csv"
+FINE_GRAINED_FILE = "fine-grained.csv"
+COARSE_GRAINED_FILE = "coarse-grained.csv"
+
+def trace_path(name):
+    '''
+    Returns the path to a trace in the trace directory, which may be compressed (e.g., 'tasks.csv.gz' instead of 'tasks.csv'), or None if the trace is missing.
+    '''
+    return find_trace(trace_dir, name)
+
+def output_path(name):
+    '''
+    Returns the path to a result trace in the output directory, with the extension of the compression format of the results (if any).
+    '''
+    if compress is None:
+        return os.path.join(output_dir, name)
+    return os.path.join(output_dir, name + "." + compress)
+
+def start_loading(pool):
+    '''
+    Starts loading the CS, CPU, and GC traces in the worker processes of the pool.
+    Returns a dictionary associating the name of each trace with its pending result, or None if the trace is missing.
+    The task trace is not included, as it is loaded by the main process (see wait_trace): a trace loaded by a worker process is copied to the main process, including the columns mapped from the binary cache, which would double the memory used by the task trace.
+    '''
+    pending = {}
+    for kind, name in [("cs", CS_FILE), ("cpu", CPU_FILE), ("gc", GC_FILE)]:
+        path = trace_path(name)
+        if path is not None:
+            pending[kind] = pool.apply_async(load_samples, (path, kind, cache))
+        else:
+            pending[kind] = None
+    return pending
+
+def wait_trace(pending, kind, label):
+    '''
+    Waits until a trace has been loaded, and returns it.
+    The task trace is loaded by the main process at this point, while the worker processes load the other traces.
+    pending: the pending results returned by start_loading.
+    kind: the name of the trace.
+    label: the name of the trace in error messages.
+    '''
+    try:
+        if kind == "tasks":
+            return load_tasks(trace_path(TASKS_FILE), None, cache, jobs)
+        return pending[kind].get()
+    except ValueError:
+        print("Wrong %s trace format" % label)
+        exit(-1)
+
+def gc_filtering_stage(cs_trace, cpu_trace, gc_trace):
+    '''
+    Filters out the CS and CPU measurements obtained during GC cycles.
+    Returns the filtered CS and CPU traces.
+    '''
+    filtered_cs, filtered_cpu = filter_gc(cs_trace, cpu_trace, gc_trace)
+    print("Context switches measurements after filtering: %s out of %s" % (str(len(filtered_cs)), str(len(valid_cs(cs_trace)))))
+    print("CPU samplings after filtering: %s out of %s" % (str(len(filtered_cpu)), str(len(valid_cpu(cpu_trace)))))
+    if intermediate:
+        write_cs(filtered_cs, output_path(FILTERED_CS_FILE))
+        write_cpu(filtered_cpu, output_path(FILTERED_CPU_FILE))
+    return filtered_cs, filtered_cpu
+
+def aggregation_stage(tasks_trace):
+    '''
+    Aggregates nested tasks to their outer tasks.
+    Returns the aggregated task trace.
+    '''
+    try:
+        result = aggregate(tasks_trace)
+    except ValueError as error:
+        sys.exit(str(error))
+    if intermediate:
+        result.write(output_path(AGGREGATED_FILE))
+    print(result.report())
+    return result.tasks
+
+def diagnosis_stage(tasks_trace, cs_trace, cpu_trace):
+    '''
+    Runs the diagnosis on the aggregated task trace and on the filtered CS and CPU traces.
+    '''
+    diagnosis = diagnose(tasks_trace, cs_trace, cpu_trace)
+    print(diagnosis.report())
+    diagnosis.write(output_path(DIAGNOSTICS_FILE))
+
+def fine_grained_stage(tasks_trace, cs_trace):
+    '''
+    Runs the analysis of fine-grained tasks on the aggregated task trace and on the filtered CS trace.
+    '''
+    result = fine_grained(tasks_trace, cs_trace)
+    print(result.report())
+    result.write(output_path(FINE_GRAINED_FILE))
+
+def coarse_grained_stage(tasks_trace, cs_trace, cpu_trace):
+    '''
+    Runs the analysis of coarse-grained tasks on the aggregated task trace and on the filtered CS and CPU traces.
+    '''
+    result = coarse_grained(tasks_trace, cs_trace, cpu_trace)
+    print(result.report())
+    result.write(output_path(COARSE_GRAINED_FILE))
+
+if __name__ == "__main__":
+    #Flags parser
+    parser = OptionParser(helper)
+    parser.add_option('-d', '--traces', dest='trace_dir', type='string', help="path to the directory containing the traces produced by tgp (at least 'tasks.csv', 'cs.csv', and 'cpu.csv')", metavar="TRACE_DIR")
+    parser.add_option('-o', '--output', dest='output_dir', type='string', help="path to the directory where the result traces will be produced. If none is provided, then the result traces will be produced in the current directory", metavar="OUTPUT_DIR")
+    parser.add_option('--intermediate', dest='intermediate', action='store_true', default=False, help="also produce the intermediate traces, i.e., the aggregated task trace and the filtered CS and CPU traces")
+    parser.add_option('-j', '--jobs', dest='jobs', type='int', help="the number of processes parsing the task trace in parallel (1 by default). If 0 is passed, then all CPUs are used", metavar="JOBS")
+    parser.add_option('--no-cache', dest='no_cache', action='store_true', default=False, help="do not read or write the binary cache of the input traces. By default, the traces are parsed once and their content is cached next to them (e.g., in 'tasks.csv.cache'), so that later runs on the same traces load them faster")
+    parser.add_option('--compress', dest='compress', type='choice', choices=[extension[1:] for extension in EXTENSIONS], help="compress the result traces with the given format, i.e., 'gz', 'bz2', 'xz', or 'zst' (e.g., producing 'diagnostics.csv.gz')", metavar="FORMAT")
+    (options, arguments) = parser.parse_args()
+    if (options.trace_dir is None):
+        print(parser.usage)
+        exit(0)
+    else:
+        trace_dir = options.trace_dir
+    if (options.output_dir is None):
+        output_dir = DEFAULT_OUT_DIR
+    else:
+        output_dir = options.output_dir
+    intermediate = options.intermediate
+    compress = options.compress
+    cache = not options.no_cache
+    if (options.jobs is None):
+        jobs = DEFAULT_JOBS
+    else:
+        jobs = options.jobs
+    for name in [TASKS_FILE, CS_FILE, CPU_FILE]:
+        if trace_path(name) is None:
+            print("Missing trace: %s" % os.path.join(trace_dir, name))
+            exit(-1)
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+
+    print("")
+    print("Loading traces...")
+
+    pool = multiprocessing.Pool(3)
+    pending = start_loading(pool)
+    pool.close()
+
+    tasks_trace = wait_trace(pending, "tasks", "task")
+    cs_trace = wait_trace(pending, "cs", "CS")
+    cpu_trace = wait_trace(pending, "cpu", "CPU")
+    print("")
+    if pending["gc"] is not None:
+        print("Starting filtering...")
+        cs_trace, cpu_trace = gc_filtering_stage(cs_trace, cpu_trace, wait_trace(pending, "gc", "GC"))
+    else:
+        print("No GC trace found, skipping filtering.")
+
+    pool.join()
+    print("")
+    print("Starting task aggregation...")
+    tasks_trace = aggregation_stage(tasks_trace)
+
+    print("")
+    print("Beginning diagnosis...")
+    diagnosis_stage(tasks_trace, cs_trace, cpu_trace)
+
+    print("Starting analysis of fine-grained tasks...")
+    fine_grained_stage(tasks_trace, cs_trace)
+
+    print("")
+    print("Starting analysis of coarse-grained tasks...")
+    coarse_grained_stage(tasks_trace, cs_trace, cpu_trace)
+
+    print("")
+    print("Pipeline completed.")
+    print("")
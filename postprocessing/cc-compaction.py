@@ -0,0 +1,80 @@
+#!/usr/bin/python
+
+from optparse import OptionParser
+import sys
+import os
+
+#Makes the shared 'tgp' package (located in the parent directory) importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from tgp.contexts import compact_trace, expand_trace
+
+helper = '''This script converts the task trace produced in the calling-context profiling mode into a compact format, where each method and each distinct calling context is stored once, and each task row refers to its calling contexts by their IDs. The trace is converted as a stream, and can be converted back to the original trace without any loss (--expand).
+
+The script produces a new trace (named 'compact-tasks.csv' by default, or 'expanded-tasks.csv' with --expand). The compact trace can be passed to characterization/calling_contexts.py instead of the original one.
+
+Usage: ./cc-compaction.py -t <path to task trace> [-o <path to converted trace (output)> --expand]'''
+
+#Default name of the output compact trace
+DEFAULT_OUT_FILE = "compact-tasks.csv"
+#Default name of the output expanded trace
+DEFAULT_EXPANDED_OUT_FILE = "expanded-tasks.csv"
+
+def compact():
+    '''
+    Converts the input trace into compact format, and prints the size of both traces.
+    '''
+    try:
+        tasks, methods, contexts = compact_trace(tasksfile, output_file)
+    except ValueError:
+        print("Wrong task trace format")
+        exit(-1)
+    print("Tasks: %s -> Distinct methods: %s -> Distinct calling contexts (including prefixes): %s" % (str(tasks), str(methods), str(contexts)))
+    print_sizes()
+
+def expand():
+    '''
+    Converts the input trace from compact format back into the original format, and prints the size of both traces.
+    '''
+    try:
+        tasks = expand_trace(tasksfile, output_file)
+    except ValueError:
+        print("Wrong compact task trace format")
+        exit(-1)
+    print("Tasks: %s" % str(tasks))
+    print_sizes()
+
+def print_sizes():
+    '''
+    Prints the size of the input and of the output trace on standard output.
+    '''
+    input_size = os.path.getsize(tasksfile)
+    output_size = os.path.getsize(output_file)
+    print("Size of the input trace: %s bytes -> Size of the output trace: %s bytes (%s%%)" % (str(input_size), str(output_size), str(round(output_size * 100.0 / input_size, 2) if input_size > 0 else 0)))
+
+if __name__ == "__main__":
+    #Flags parser
+    parser = OptionParser(helper)
+    parser.add_option('-t', '--task', dest='tasksfile', type='string', help="path to the task trace to be converted (produced in the calling-context profiling mode, or in compact format with --expand)", metavar="TASK_TRACE")
+    parser.add_option('-o', '--output', dest='output_file', type='string', help="path to the converted trace. If none is provided, then the converted trace will be produced in './compact-tasks.csv' (or in './expanded-tasks.csv' with --expand)", metavar="CONVERTED_TRACE")
+    parser.add_option('--expand', dest='expand', action='store_true', default=False, help="convert a trace in compact format back into the original format")
+    (options, arguments) = parser.parse_args()
+    if (options.tasksfile is None):
+        print(parser.usage)
+        exit(0)
+    else:
+        tasksfile = options.tasksfile
+    if (options.output_file is None):
+        if options.expand:
+            output_file = DEFAULT_EXPANDED_OUT_FILE
+        else:
+            output_file = DEFAULT_OUT_FILE
+    else:
+        output_file = options.output_file
+
+    print("")
+    print("Starting conversion...")
+    if options.expand:
+        expand()
+    else:
+        compact()
+    print("")
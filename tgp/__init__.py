@@ -0,0 +1,3 @@
+'''
+Shared library used by the post-processing and characterization scripts of tgp.
+'''
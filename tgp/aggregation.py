@@ -0,0 +1,272 @@
+'''
+Array-based engine for task aggregation.
+
+Tasks are identified by their row index in the task trace. The nesting relation is stored as an array of parent (outer task) indices, and the children of each task are stored in CSR layout, i.e., in a single array where the children of task i are children[indptr[i]:indptr[i + 1]].
+All traversals are iterative and process a whole nesting level at a time, so that deep nesting chains do not hit the recursion limit.
+
+StreamingAggregation aggregates tasks as they are read instead, for task traces too large to be loaded in memory, from the number of nested tasks of each outer task (see NestingCounts).
+'''
+
+import numpy
+
+class NestingGraph:
+    '''
+    The directed graph where an edge connects a nested task to its outer task.
+    '''
+    def __init__(self, ids, outer_ids):
+        '''
+        Builds the graph and sorts it by nesting level.
+        If several rows share the same ID (i.e., the task has been executed more than once), nested tasks are attached to the last of them.
+        ids: the IDs of the tasks, one per row.
+        outer_ids: the IDs of the outer tasks, one per row.
+        Raises ValueError if the graph contains a cycle.
+        '''
+        ids = numpy.asarray(ids, dtype=numpy.int64)
+        outer_ids = numpy.asarray(outer_ids, dtype=numpy.int64)
+        self.size = len(ids)
+        #The index of the outer task of each task, or -1 if the outer task is not in the trace
+        self.parent = numpy.full(self.size, -1, dtype=numpy.int64)
+        if self.size > 0:
+            order = numpy.argsort(ids, kind='mergesort')
+            sorted_ids = ids[order]
+            #Marks the last row of each ID
+            last = numpy.append(sorted_ids[1:] != sorted_ids[:-1], True)
+            unique_ids = sorted_ids[last]
+            last_rows = order[last]
+            position = numpy.searchsorted(unique_ids, outer_ids)
+            position[position == len(unique_ids)] = 0
+            found = unique_ids[position] == outer_ids
+            self.parent[found] = last_rows[position[found]]
+        #The children of each task in CSR layout, in trace order
+        nested = numpy.flatnonzero(self.parent >= 0)
+        self.children = nested[numpy.argsort(self.parent[nested], kind='mergesort')]
+        self.indptr = numpy.zeros(self.size + 1, dtype=numpy.int64)
+        numpy.cumsum(numpy.bincount(self.parent[nested], minlength=self.size), out=self.indptr[1:])
+        self.levels = self.sort_levels()
+
+    def sort_levels(self):
+        '''
+        Groups the tasks by nesting level with a breadth-first visit starting from the tasks without outer task.
+        Returns a list of index arrays, where the i-th array contains the tasks at depth i.
+        Raises ValueError if some task cannot be reached, i.e., if the graph is not a DAG.
+        '''
+        frontier = numpy.flatnonzero(self.parent < 0)
+        levels = []
+        reached = 0
+        while len(frontier) > 0:
+            levels.append(frontier)
+            reached += len(frontier)
+            starts = self.indptr[frontier]
+            counts = self.indptr[frontier + 1] - starts
+            total = counts.sum()
+            if total == 0:
+                break
+            #Gathers the CSR segments of all tasks in the frontier
+            offsets = numpy.arange(total) + numpy.repeat(starts - (numpy.cumsum(counts) - counts), counts)
+            frontier = self.children[offsets]
+        if reached != self.size:
+            raise ValueError("Not a DAG")
+        return levels
+
+    def depth(self):
+        '''
+        Returns the nesting depth of each task (0 for tasks without outer task).
+        '''
+        depth = numpy.empty(self.size, dtype=numpy.int64)
+        for level, tasks in enumerate(self.levels):
+            depth[tasks] = level
+        return depth
+
+    def sorted_order(self):
+        '''
+        Topologically sorts the tasks, so that every task comes before its outer task.
+        The order is the same as the one produced by a depth-first visit of the tasks in trace order, where each task is prepended to the list after its outer task: tasks are discovered in the order of the first row of their subtree, and tasks discovered by the same row are discovered from the outer-most one.
+        Returns an array of task indices.
+        '''
+        first_row = numpy.arange(self.size, dtype=numpy.int64)
+        for tasks in reversed(self.levels[1:]):
+            numpy.minimum.at(first_row, self.parent[tasks], first_row[tasks])
+        discovery = numpy.lexsort((self.depth(), first_row))
+        return discovery[::-1]
+
+    def aggregate(self, granularity, rules):
+        '''
+        Sums the granularity of nested tasks up to their outer tasks, from the inner-most nesting level to the outer-most one.
+        A nested task is aggregated only if the aggregation rules hold for it; otherwise, it keeps its own (aggregated) granularity and is not summed to its outer task.
+        granularity: the granularity of each task.
+        rules: a boolean array stating, for each nested task, whether it can be aggregated to its outer task.
+        Returns the aggregated granularity of each task, and a boolean array stating which tasks have been aggregated.
+        '''
+        total = numpy.array(granularity, dtype=numpy.int64)
+        aggregated = numpy.zeros(self.size, dtype=bool)
+        for tasks in reversed(self.levels[1:]):
+            tasks = tasks[rules[tasks]]
+            numpy.add.at(total, self.parent[tasks], total[tasks])
+            aggregated[tasks] = True
+        return total, aggregated
+
+def aggregation_rules(graph, is_thread, is_exec_executed, create_thread_ids, exec_thread_ids):
+    '''
+    Applies the aggregation rules to all nested tasks: a nested task can be aggregated if its outer task is not a thread, or if the nested task has not been submitted and is created and executed by the same thread.
+    graph: the NestingGraph of the tasks.
+    is_thread: boolean array stating whether each task is a thread.
+    is_exec_executed: boolean array stating whether each task was executed by calling exec().
+    create_thread_ids: the ID of the thread which created each task.
+    exec_thread_ids: the ID of the thread which executed each task.
+    Returns a boolean array stating whether each task can be aggregated to its outer task (always false for tasks without outer task).
+    '''
+    nested = graph.parent >= 0
+    outer_is_thread = numpy.asarray(is_thread)[numpy.where(nested, graph.parent, 0)]
+    same_thread = numpy.asarray(create_thread_ids) == numpy.asarray(exec_thread_ids)
+    return nested & (~outer_is_thread | (~numpy.asarray(is_exec_executed) & same_thread))
+
+class NestingCounts:
+    '''
+    The links between nested and outer tasks needed by StreamingAggregation, collected by reading the task trace before aggregating it:
+      - first, the number of nested tasks of each outer task ID (see add_nested)
+      - then, the number of rows with each of these IDs, and whether the last of them is a thread (see add_tasks)
+    Only the IDs of outer tasks are kept, hence memory usage depends on the number of outer tasks rather than on the size of the trace.
+    '''
+    def __init__(self):
+        #The sorted IDs of the outer tasks, and the number of nested tasks of each of them
+        self.outer_ids = numpy.zeros(0, dtype=numpy.int64)
+        self.nested = numpy.zeros(0, dtype=numpy.int64)
+        #The number of rows with each outer task ID, and whether the last of them is a thread
+        self.rows = numpy.zeros(0, dtype=numpy.int64)
+        self.is_thread = numpy.zeros(0, dtype=bool)
+
+    def add_nested(self, outer_ids):
+        '''
+        Counts the nested tasks of a chunk of the task trace.
+        outer_ids: the IDs of the outer tasks of the chunk.
+        '''
+        ids, inverse = numpy.unique(numpy.concatenate((self.outer_ids, numpy.asarray(outer_ids, dtype=numpy.int64))), return_inverse=True)
+        weights = numpy.concatenate((self.nested, numpy.ones(len(outer_ids), dtype=numpy.int64)))
+        self.outer_ids = ids
+        self.nested = numpy.bincount(inverse, weights=weights, minlength=len(ids)).astype(numpy.int64)
+        self.rows = numpy.zeros(len(ids), dtype=numpy.int64)
+        self.is_thread = numpy.zeros(len(ids), dtype=bool)
+
+    def positions(self, ids):
+        '''
+        Returns the position of each input ID in the outer task IDs, or -1 if no task has it as outer task.
+        '''
+        ids = numpy.asarray(ids, dtype=numpy.int64)
+        position = numpy.searchsorted(self.outer_ids, ids)
+        position[position == len(self.outer_ids)] = 0
+        found = self.outer_ids[position] == ids if len(self.outer_ids) > 0 else numpy.zeros(len(ids), dtype=bool)
+        return numpy.where(found, position, -1)
+
+    def add_tasks(self, ids, is_thread):
+        '''
+        Counts the rows of a chunk of the task trace whose ID is the one of an outer task, once all nested tasks have been counted.
+        ids: the IDs of the tasks of the chunk.
+        is_thread: whether each task of the chunk is a thread.
+        '''
+        position = self.positions(ids)
+        found = position >= 0
+        position = position[found]
+        numpy.add.at(self.rows, position, 1)
+        #The last row of each ID in the chunk
+        last_position, last = numpy.unique(position[::-1], return_index=True)
+        self.is_thread[last_position] = numpy.asarray(is_thread)[found][::-1][last]
+
+class StreamingAggregation:
+    '''
+    Aggregates tasks read one chunk at a time in any order, keeping in memory only the tasks which may still be aggregated.
+
+    The number of nested tasks of each outer task is known in advance (see NestingCounts), hence an outer task is complete as soon as all its nested tasks have been read and completed: it is then aggregated to its own outer task, or written. Nested tasks completed before their outer task is read are kept as the sum of their aggregated granularity. The number of pending tasks depends on the number of outer tasks whose nested tasks have not all been read yet, rather than on the number of tasks in the trace.
+
+    As with NestingGraph, tasks are attached to the last row with the ID of their outer task, hence the aggregated tasks and their granularity are the same as the ones of NestingGraph (in order of completion instead of in topological order).
+    '''
+    def __init__(self, counts):
+        '''
+        counts: the NestingCounts of the whole task trace.
+        '''
+        self.counts = counts
+        #The number of rows read with each outer task ID
+        self.seen = numpy.zeros(len(counts.outer_ids), dtype=numpy.int64)
+        #The outer tasks read whose nested tasks have not all been completed, by position in counts, as [remaining nested tasks, aggregated granularity, row, position of the outer task, mergeable] lists
+        self.pending = {}
+        #The nested tasks completed before their outer task has been read, by position of the outer task in counts, as [aggregated granularity, number of nested tasks] lists
+        self.early = {}
+        #The tasks which have not been aggregated, as (row, aggregated granularity) pairs, in order of completion
+        self.finished = []
+        self.total_tasks = 0
+        self.written_tasks = 0
+
+    def add_tasks(self, ids, outer_ids, granularity, is_thread, is_exec_executed, create_thread_ids, exec_thread_ids, rows):
+        '''
+        Reads a chunk of tasks, completing the tasks which cannot be aggregated anymore.
+        The arguments are arrays with one value per task, as in aggregation_rules.
+        rows: the rows of the tasks, which are returned by pop_finished (with the aggregated granularity) if the tasks are not aggregated.
+        '''
+        counts = self.counts
+        positions = counts.positions(ids).tolist()
+        outer_positions = counts.positions(outer_ids).tolist()
+        mergeable = (~numpy.asarray(is_exec_executed) & (numpy.asarray(create_thread_ids) == numpy.asarray(exec_thread_ids))).tolist()
+        for position, outer_position, total, task_mergeable, row in zip(positions, outer_positions, numpy.asarray(granularity).tolist(), mergeable, rows):
+            self.total_tasks += 1
+            remaining = 0
+            if position >= 0:
+                self.seen[position] += 1
+                #Nested tasks are attached to the last row with the ID of their outer task
+                if self.seen[position] == counts.rows[position]:
+                    early_total, early_nested = self.early.pop(position, (0, 0))
+                    total += early_total
+                    remaining = int(counts.nested[position]) - early_nested
+            if remaining > 0:
+                self.pending[position] = [remaining, total, row, outer_position, task_mergeable]
+            else:
+                self.complete(total, row, outer_position, task_mergeable)
+
+    def complete(self, total, row, outer_position, mergeable):
+        '''
+        Aggregates a complete task to its outer task if the aggregation rules hold (see aggregation_rules), or adds it to the finished tasks otherwise.
+        If the outer task becomes complete as well, it is completed in turn.
+        '''
+        counts = self.counts
+        while True:
+            if outer_position < 0 or counts.rows[outer_position] == 0:
+                #The outer task is not in the trace
+                self.finish_task(row, total)
+                return
+            aggregated = mergeable or not counts.is_thread[outer_position]
+            if not aggregated:
+                self.finish_task(row, total)
+                total = 0
+            outer = self.pending.get(outer_position)
+            if outer is None:
+                early = self.early.setdefault(outer_position, [0, 0])
+                early[0] += total
+                early[1] += 1
+                return
+            outer[0] -= 1
+            outer[1] += total
+            if outer[0] > 0:
+                return
+            del self.pending[outer_position]
+            remaining, total, row, outer_position, mergeable = outer
+
+    def finish_task(self, row, total):
+        '''
+        Adds a task which is not aggregated to the finished tasks.
+        '''
+        self.finished.append((row, total))
+        self.written_tasks += 1
+
+    def finish(self):
+        '''
+        Checks that all tasks have been completed, once the whole trace has been read.
+        Raises ValueError if some tasks cannot be completed, i.e., if the nesting relation contains a cycle.
+        '''
+        if len(self.pending) > 0 or len(self.early) > 0:
+            raise ValueError("Not a DAG")
+
+    def pop_finished(self):
+        '''
+        Returns the tasks completed since the previous call which have not been aggregated, as (row, aggregated granularity) pairs.
+        '''
+        finished = self.finished
+        self.finished = []
+        return finished
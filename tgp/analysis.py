@@ -0,0 +1,836 @@
+'''
+Library API of the post-processing and characterization scripts.
+
+The functions of this module take and return traces in memory (see tgp.traces), so that a single Python process (e.g., a notebook) can load the traces once and chain several analyses on them, without running the scripts as separate processes and writing intermediate traces. For example:
+
+    from tgp.analysis import load_tasks, load_samples, aggregate, filter_gc, diagnose, fine_grained, coarse_grained
+    tasks = aggregate(load_tasks("traces/tasks.csv")).tasks
+    cs, cpu = filter_gc(load_samples("traces/cs.csv", "cs"), load_samples("traces/cpu.csv", "cpu"), load_samples("traces/gc.csv", "gc"))
+    print(diagnose(tasks, cs, cpu).report())
+    fine = fine_grained(tasks, cs)
+    coarse = coarse_grained(tasks, cs, cpu, min_gran=1000000)
+
+The results are the same as those of the scripts with the same options. The analyses return objects holding their results, which can be printed as the scripts do (report) and written as the result traces of the scripts (write).
+'''
+
+from __future__ import division
+import csv
+import math
+import numpy
+
+from tgp.aggregation import NestingGraph, aggregation_rules
+from tgp.compression import open_trace
+from tgp.histogram import around
+from tgp.intervals import SampleIndex, IntervalUnion
+from tgp.sketch import QuantileSketch, k_for_error
+from tgp.traces import Trace, TASK_COLUMNS, TEXT, FLAG, exact_sum, load_samples, load_tasks
+
+#The columns of the task trace used by the characterization analyses (diagnose, fine_grained, and coarse_grained)
+CHARACTERIZATION_COLUMNS = ["id", "class", "entry", "exit", "granularity"]
+
+#Default central granularity of the diagnosis
+DEFAULT_CENTRAL_GRAN = 100000
+
+#Default thresholds of the analysis of fine-grained tasks (MAX_GRAN, MAX_DIFF, and MIN_TASKS_SPAWNED)
+DEFAULT_FINE_MAX_GRAN = 100000000
+DEFAULT_FINE_MAX_DIFF = 100000000
+DEFAULT_FINE_MIN_TASKS = 0
+
+#Default thresholds of the analysis of coarse-grained tasks (MIN_GRAN, MAX_GRAN, MIN_TASK_SPAWNED, and MAX_TASK_SPAWNED)
+DEFAULT_COARSE_MIN_GRAN = 1000000000
+DEFAULT_COARSE_MAX_GRAN = 100000000000
+DEFAULT_COARSE_MIN_TASKS = 1
+DEFAULT_COARSE_MAX_TASKS = 100
+
+#The z-score corresponding to a confidence of 0.95. It is used to compute the confidence interval of the average CPU utilization
+Z_SCORE = 1.96
+
+#The quantiles of the Student's t-distribution corresponding to a confidence of 0.95 (t_0.975), for 1 to 30 degrees of freedom. They are used to compute the confidence interval of the statistics merged across a few runs (see mean_confidence_interval), while Z_SCORE is used for more than 30 degrees of freedom
+T_SCORES = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+            2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+            2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042]
+
+#The header of a task trace (e.g., of the aggregated task trace)
+TASK_FIELDNAMES = ['ID',
+                   'Class',
+                   'Outer Task ID',
+                   'Execution N.',
+                   'Creation thread ID',
+                   'Creation thread class',
+                   'Creation thread name',
+                   'Execution thread ID',
+                   'Execution thread class',
+                   'Execution thread name',
+                   'Executor ID',
+                   'Executor class',
+                   'Entry execution time',
+                   'Exit execution time',
+                   'Granularity',
+                   'Is Thread',
+                   'Is Runnable',
+                   'Is Callable',
+                   'Is ForkJoinTask',
+                   'Is run() executed',
+                   'Is call() executed',
+                   'Is exec() executed']
+
+def task_rows(trace):
+    '''
+    Converts a TaskTrace (with all columns) into the rows of a task trace, i.e., a list of tuples containing one value for each column.
+    '''
+    out_columns = []
+    for name, kind in TASK_COLUMNS:
+        if kind == TEXT:
+            values = trace[name].strings().tolist()
+        elif kind == FLAG:
+            values = numpy.where(trace[name], "T", "F").tolist()
+        else:
+            values = trace[name].tolist()
+        out_columns.append(values)
+    return list(zip(*out_columns))
+
+def write_tasks(trace, path):
+    '''
+    Writes a TaskTrace (with all columns) as a task trace.
+    '''
+    with open_trace(path, 'w') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(TASK_FIELDNAMES)
+        writer.writerows(task_rows(trace))
+
+def write_cs(trace, path):
+    '''
+    Writes a CS Trace (e.g., returned by filter_gc) as a CS trace.
+    '''
+    with open_trace(path, 'w') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(['Timestamp (ns)', 'Context Switches'])
+        writer.writerows(zip(trace["timestamp"].tolist(), trace["cs"].tolist()))
+
+def write_cpu(trace, path):
+    '''
+    Writes a CPU Trace (e.g., returned by filter_gc) as a CPU trace.
+    '''
+    with open_trace(path, 'w') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(['Timestamp (ns)', 'CPU utilization (user)', 'CPU utilization (system)'])
+        writer.writerows(zip(trace["timestamp"].tolist(), trace["user"].tolist(), trace["system"].tolist()))
+
+def cpu_utilization(trace):
+    '''
+    Returns the CPU utilization (user and system) of each measurement of a CPU Trace, as a list.
+    '''
+    return [user + system for user, system in zip(trace["user"].tolist(), trace["system"].tolist())]
+
+def group_classes(tasks):
+    '''
+    Returns a dictionary associating each class to the array of indices of its tasks in the TaskTrace.
+    '''
+    classes = {}
+    for task_class, rows in tasks.group_by("class"):
+        classes[task_class] = rows
+    return classes
+
+def samples_during(tasks, rows, index):
+    '''
+    Returns the total value and the number of the samples taken during the execution of the input tasks. A sample is counted once for each task whose execution contains it.
+    tasks: the TaskTrace.
+    rows: the indices of the tasks.
+    index: the SampleIndex of the samples.
+    '''
+    total = 0
+    count = 0
+    for entry_time, exit_time in zip(tasks["entry"][rows].tolist(), tasks["exit"][rows].tolist()):
+        total += index.total(entry_time, exit_time)
+        count += index.count(entry_time, exit_time)
+    return total, count
+
+def average_outside(intervals, timestamps, values):
+    '''
+    Returns the average value of the samples taken outside all input intervals (0 if there is none).
+    The samples (sorted by timestamp) are walked against the IntervalUnion in a single merge pass.
+    intervals: the IntervalUnion.
+    timestamps: the timestamps of the samples.
+    values: the values of the samples, in the same order as the timestamps.
+    '''
+    num = 0
+    total = 0
+    avg = 0
+    for value, is_outside in zip(values, intervals.outside(timestamps)):
+        if is_outside:
+            num += 1
+            total += value
+    if num > 0:
+        avg = total/num
+    return avg
+
+class Aggregation:
+    '''
+    The result of task aggregation.
+    '''
+    def __init__(self, tasks, total_tasks):
+        '''
+        tasks: the TaskTrace of the aggregated task trace, i.e., the tasks which have not been aggregated, in topological order and with their aggregated granularity.
+        total_tasks: the number of executed tasks before aggregation.
+        '''
+        self.tasks = tasks
+        self.total_tasks = total_tasks
+
+    def report(self):
+        '''
+        Returns the number of aggregated tasks, as printed by aggregation.py.
+        '''
+        return "%s tasks out of %s have been aggregated" % (str(self.total_tasks - len(self.tasks)), str(self.total_tasks))
+
+    def write(self, path):
+        '''
+        Writes the aggregated task trace.
+        '''
+        write_tasks(self.tasks, path)
+
+def aggregate(tasks):
+    '''
+    Aggregates the executed tasks (i.e., those whose outer task ID is not -1), summing the granularity of nested tasks up to their outer tasks (starting from the inner-most ones) whenever the aggregation rules hold.
+    tasks: the TaskTrace, with all columns.
+    Returns an Aggregation.
+    Raises ValueError if the nesting graph contains a cycle.
+    '''
+    tasks = tasks.select(tasks["outer_id"] != -1)
+    graph = NestingGraph(tasks["id"], tasks["outer_id"])
+    sorted_tasks = graph.sorted_order()
+    rules = aggregation_rules(graph, tasks["is_thread"], tasks["is_exec_executed"], tasks["create_thread_id"], tasks["exec_thread_id"])
+    granularities, aggregated = graph.aggregate(tasks["granularity"], rules)
+    out_tasks = sorted_tasks[~aggregated[sorted_tasks]]
+    trace = tasks.select(out_tasks)
+    trace.columns["granularity"] = granularities[out_tasks]
+    return Aggregation(trace, len(tasks))
+
+def valid_cs(trace):
+    '''
+    Returns the measurements of a CS Trace considered by GC filtering, skipping the negative ones and the first two lines of the trace.
+    '''
+    return trace.select((trace["line"] > 1) & ~numpy.signbit(trace["timestamp"]) & ~numpy.signbit(trace["cs"]))
+
+def valid_cpu(trace):
+    '''
+    Returns the measurements of a CPU Trace considered by GC filtering, skipping the negative ones and the first line of the trace.
+    '''
+    return trace.select((trace["line"] > 0) & (trace["timestamp"] >= 0) & ~numpy.signbit(trace["user"]) & ~numpy.signbit(trace["system"]))
+
+def filter_gc(cs, cpu, gc):
+    '''
+    Filters out the CS and CPU measurements taken during GC cycles (after skipping the measurements which are not valid, see valid_cs and valid_cpu).
+    The measurements (sorted by timestamp) and the union of the GC cycles are walked in a single merge pass.
+    cs: the CS Trace, as returned by load_samples.
+    cpu: the CPU Trace, as returned by load_samples.
+    gc: the GC Trace, as returned by load_samples.
+    Returns the filtered CS and CPU Traces, i.e., the content of the filtered CS and CPU traces.
+    '''
+    cycles = IntervalUnion(zip(gc["start"].tolist(), gc["end"].tolist()))
+    cs = valid_cs(cs)
+    cs = cs.select(numpy.array(cycles.outside(cs["timestamp"].tolist()), dtype=bool))
+    cpu = valid_cpu(cpu)
+    cpu = cpu.select(numpy.array(cycles.outside(cpu["timestamp"].tolist()), dtype=bool))
+    return Trace({"timestamp": cs["timestamp"], "cs": cs["cs"]}), Trace({"timestamp": cpu["timestamp"], "user": cpu["user"], "system": cpu["system"]})
+
+class Diagnoser:
+    '''
+    Collects the granularity of the executed tasks (of a class, if selected), and the CS and CPU measurements taken during their execution, from which the statistics of the diagnosis are computed.
+    Either all granularity values are kept (see use_tasks), or only a summary of them (a LogLinearHistogram or a QuantileSketch) and aggregate counters, so that tasks can be added one chunk at a time (see record).
+    '''
+    def __init__(self, specific_class=None, central_gran=DEFAULT_CENTRAL_GRAN, summary=None):
+        '''
+        specific_class: the class of the tasks to consider (all tasks if None).
+        central_gran: the central granularity.
+        summary: the LogLinearHistogram or QuantileSketch approximating percentiles, or None to compute them exactly from all granularity values.
+        '''
+        self.specific_class = specific_class
+        self.central_gran = central_gran
+        self.summary = summary
+        #An array containing all granularity values (None if only the summary is kept)
+        self.grans = None
+        #The total granularity and the number of executed tasks
+        self.total_grans = 0
+        self.exec_tasks = 0
+        #The number of tasks with granularity having the same order of magnitude as central_gran (only counted by record)
+        self.central_tasks = 0
+        #The number of context switches and the CPU utilization of each measurement taken during the execution of a task
+        self.cs = []
+        self.cpus = []
+
+    def select(self, trace):
+        '''
+        Returns the executed tasks (of class 'specific_class', if set) of a TaskTrace.
+        '''
+        selected = trace.executed()
+        if self.specific_class is not None:
+            selected &= trace["class"].equals(self.specific_class)
+        return trace.select(selected)
+
+    def use_tasks(self, trace):
+        '''
+        Keeps all granularity values of the executed tasks (of class 'specific_class', if set) of a TaskTrace.
+        Returns the selected tasks.
+        '''
+        tasks = self.select(trace)
+        self.grans = tasks["granularity"]
+        self.total_grans = exact_sum(self.grans)
+        self.exec_tasks = len(tasks)
+        if self.summary is not None:
+            self.summary.record(self.grans)
+        return tasks
+
+    def record(self, chunk):
+        '''
+        Adds the executed tasks (of class 'specific_class', if set) of a chunk of the task trace to the summary of task granularity and to the aggregate counters.
+        Returns the selected tasks.
+        '''
+        chunk = self.select(chunk)
+        chunk_grans = chunk["granularity"]
+        self.summary.record(chunk_grans)
+        self.total_grans += exact_sum(chunk_grans)
+        self.exec_tasks += len(chunk)
+        self.central_tasks += self.in_specified_range(chunk_grans)
+        return chunk
+
+    def in_specified_range(self, values):
+        '''
+        Computes the number of tasks with granularity having the same order of magnitude as central_gran.
+        values: the granularity of the tasks.
+        '''
+        return int(numpy.count_nonzero(around(values, self.central_gran)))
+
+    def use_summary(self, summary):
+        '''
+        Uses a LogLinearHistogram (e.g., loaded with tgp.histogram.load_histograms) or a QuantileSketch (e.g., loaded with tgp.sketch.load_sketch) of the granularity of the executed tasks as the summary of task granularity, so that the statistics of the tasks are computed from the summary only.
+        The percentage of tasks around the central granularity is approximated from the summary.
+        '''
+        self.summary = summary
+        self.total_grans = summary.total
+        self.exec_tasks = summary.count
+        self.central_tasks = summary.count_around(self.central_gran)
+
+    def granularity_at(self, index):
+        '''
+        Returns the granularity at the input position in the sorted granularity values (approximated if a summary is used).
+        '''
+        if self.summary is not None:
+            return self.summary.value_at(index)
+        return int(self.grans[index])
+
+    def gran_percentage_in_range(self, low_w, high_w):
+        '''
+        Computes the percentage of tasks having granularity within the specified range ([low_w, high_w]).
+        The percentage is exact if all granularity values are kept, even if percentiles are approximated with a summary.
+        '''
+        if self.grans is not None:
+            count = int(numpy.count_nonzero((self.grans >= low_w) & (self.grans <= high_w)))
+        else:
+            count = self.summary.count_between(low_w, high_w)
+        return ((count/self.exec_tasks)*100)
+
+    def tasks_statistics(self):
+        '''
+        Computes basic statistics related to tasks.
+        Returns a dictionary containing such statistics.
+        '''
+        if self.summary is None:
+            self.grans.sort()
+        exec_tasks = self.exec_tasks
+        third_q = 0
+        first_q = 0
+        median = 0
+        inter_quartile = 0
+        low_w = 0
+        high_w = 0
+        percentage_range = 0
+        avg = 0
+        percentage = 0
+        one_percentile = 0
+        five_percentile = 0
+        ninetyfive_percentile = 0
+        ninetynine_percentile = 0
+        if exec_tasks != 0:
+            m_index = int(exec_tasks/2)
+            third_q = int((exec_tasks - m_index)/2) + m_index
+            first_q = int(m_index/2)
+            median = self.granularity_at(m_index)
+            one_percentile = self.granularity_at(int(exec_tasks*0.01))
+            five_percentile = self.granularity_at(int(exec_tasks*0.05))
+            ninetyfive_percentile = self.granularity_at(int(exec_tasks*0.9))
+            ninetynine_percentile = self.granularity_at(int(exec_tasks*0.95))
+            inter_quartile = self.granularity_at(third_q) - self.granularity_at(first_q)
+            low_w = self.granularity_at(first_q) - 1.5 * inter_quartile
+            if low_w < 0:
+                low_w = 0
+            high_w = self.granularity_at(third_q) + 1.5 * inter_quartile
+            if high_w > self.granularity_at(exec_tasks - 1):
+                high_w = self.granularity_at(exec_tasks - 1)
+            percentage_range = self.gran_percentage_in_range(low_w, high_w)
+            avg = self.total_grans/exec_tasks
+            if self.grans is not None:
+                percentage = (self.in_specified_range(self.grans)/exec_tasks)*100
+            else:
+                percentage = (self.central_tasks/exec_tasks)*100
+        res_dict = {}
+        res_dict["Total number of tasks"] = str(exec_tasks)
+        res_dict["Average granularity"] = str(avg)
+        res_dict["1st percentile - granularity"] = str(one_percentile)
+        res_dict["5th percentile - granularity"] = str(five_percentile)
+        res_dict["50th percentile (median) - granularity"] = str(median)
+        res_dict["95th percentile - granularity"] = str(ninetyfive_percentile)
+        res_dict["99th percentile - granularity"] = str(ninetynine_percentile)
+        res_dict["IQC - granularity"] = str(inter_quartile)
+        res_dict["Lower whiskers range - granularity"] = str(low_w)
+        res_dict["Upper whiskers range - granularity"] = str(high_w)
+        res_dict["Percentage of tasks having granularity within whiskers range"] = str(percentage_range)
+        if isinstance(self.summary, QuantileSketch):
+            res_dict["Percentile rank error"] = str(self.summary.error())
+        res_dict["Central granularity"] = str(self.central_gran)
+        res_dict["Percentage of tasks with granularity around central granularity"] = str(percentage)
+        return res_dict
+
+    def cs_statistics(self):
+        '''
+        Computes statistics related to context-switches.
+        Returns a dictionary containing such statistics.
+        '''
+        total_cs = 0
+        for cs in self.cs:
+            total_cs += cs
+        avg = 0
+        if len(self.cs) > 0:
+            avg = total_cs/len(self.cs)
+        res_dict = {}
+        res_dict["Average number of context switches"] = str(avg)
+        return res_dict
+
+    def cpu_mean(self):
+        '''
+        Computes the average CPU utilization.
+        '''
+        mean = 0
+        if len(self.cpus) == 0:
+            return mean
+        for cpu in self.cpus:
+            mean += cpu
+        mean /= len(self.cpus)
+        return mean
+
+    def cpu_standard_deviation(self):
+        '''
+        Computes the standard deviation of the average CPU utilization.
+        '''
+        sd = 0
+        if len(self.cpus) < 2:
+            return sd
+        mean = self.cpu_mean()
+        for cpu in self.cpus:
+            sd += pow((cpu - mean), 2)
+        sd /= (len(self.cpus) - 1)
+        sd = math.sqrt(sd)
+        return sd
+
+    def cpu_confidence_interval(self):
+        '''
+        Computes the confidence intervals of the average CPU utilization.
+        '''
+        mean = self.cpu_mean()
+        sd = self.cpu_standard_deviation()
+        if mean == 0 and sd == 0:
+            return 0
+        return (Z_SCORE * sd)/math.sqrt(len(self.cpus))
+
+    def cpu_statistics(self):
+        '''
+        Computes statistics related to CPU utilization.
+        Returns a dictionary containing such statistics.
+        '''
+        res_dict = {}
+        res_dict["Average CPU utilization"] = str(self.cpu_mean())
+        res_dict["STD CPU utilization"] = str(self.cpu_confidence_interval())
+        return res_dict
+
+    def statistics(self):
+        '''
+        Computes the statistics of the tasks and of the measurements collected so far.
+        Returns a Diagnosis.
+        '''
+        return Diagnosis(self.specific_class, self.tasks_statistics(), self.cs_statistics(), self.cpu_statistics(), self.summary)
+
+class Diagnosis:
+    '''
+    The statistics computed by the diagnosis, as dictionaries associating the name of each statistic with its value (as a string).
+    '''
+    def __init__(self, specific_class, tasks_stats, cs_stats, cpu_stats, summary=None):
+        '''
+        specific_class: the class of the analyzed tasks (all tasks if None).
+        tasks_stats: the statistics related to tasks.
+        cs_stats: the statistics related to context switches.
+        cpu_stats: the statistics related to CPU utilization.
+        summary: the summary of task granularity (a LogLinearHistogram or a QuantileSketch) from which percentiles have been approximated, if any. A QuantileSketch can be saved and merged with those of other runs (see tgp.sketch).
+        '''
+        self.specific_class = specific_class
+        self.tasks_stats = tasks_stats
+        self.cs_stats = cs_stats
+        self.cpu_stats = cpu_stats
+        self.summary = summary
+
+    def value(self, name):
+        '''
+        Returns the value (as a string) of the statistic with the input name.
+        '''
+        for stats in [self.tasks_stats, self.cs_stats, self.cpu_stats]:
+            if name in stats:
+                return stats[name]
+        raise KeyError(name)
+
+    def report(self):
+        '''
+        Returns the statistics, as printed by diagnose.py.
+        '''
+        tasks_stats = self.tasks_stats
+        #The error guarantee of percentiles approximated with a quantile sketch
+        note = ""
+        if isinstance(self.summary, QuantileSketch):
+            note = " (rank error: +-%.3g%%)" % (self.summary.error()*100)
+        tasks_res = "-> Total number of tasks: " + tasks_stats["Total number of tasks"] + " \n-> Average granularity: " + tasks_stats["Average granularity"] + " \n-> 1st percentile - granularity: " + tasks_stats["1st percentile - granularity"] + note + " \n-> 5th percentile - granularity: " + tasks_stats["5th percentile - granularity"] + note + " \n-> 50th percentile (median) - granularity: " + tasks_stats["50th percentile (median) - granularity"] + note + " \n-> 95th percentile - granularity: " + tasks_stats["95th percentile - granularity"] + note + " \n-> 99th percentile - granularity: " + tasks_stats["99th percentile - granularity"] + note + " \n-> IQC - granularity: " + tasks_stats["IQC - granularity"] + " \n-> Whiskers range - granularity: [" + tasks_stats["Lower whiskers range - granularity"] + ", " + tasks_stats["Upper whiskers range - granularity"] + "] \n-> Percentage of tasks having granularity within whiskers range: " + tasks_stats["Percentage of tasks having granularity within whiskers range"] + "% \n-> Percentage of tasks with granularity around " + tasks_stats["Central granularity"] + ": " + tasks_stats["Percentage of tasks with granularity around central granularity"] + "%"
+        cs_res = "-> Average number of context switches: " + self.cs_stats["Average number of context switches"] + "cs/100ms"
+        cpu_res = "-> Average CPU utilization: " + self.cpu_stats["Average CPU utilization"] + "+-" + self.cpu_stats["STD CPU utilization"]
+        return "\n".join(["", "TASKS STATISTICS", tasks_res, "", "CONTEXT-SWITCHES STATISTICS", cs_res, "", "CPU STATISTICS", cpu_res, ""])
+
+    def write(self, path):
+        '''
+        Writes the statistics on a csv file.
+        '''
+        with open_trace(path, 'w') as csvfile:
+            fieldnames = []
+            fieldnames.append("Selected class")
+            for stats in [self.tasks_stats, self.cs_stats, self.cpu_stats]:
+                for key in stats:
+                    fieldnames.append(key)
+            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+            writer.writeheader()
+            content = {}
+            content["Selected class"] = "null" if self.specific_class is None else self.specific_class
+            for stats in [self.tasks_stats, self.cs_stats, self.cpu_stats]:
+                for key in stats:
+                    content[key] = stats[key]
+            writer.writerow(content)
+
+def diagnose(tasks, cs, cpu, specific_class=None, central_gran=DEFAULT_CENTRAL_GRAN, rank_error=None):
+    '''
+    Computes the statistics of the granularity of the executed tasks (of a class, if selected), and of the CS and CPU measurements taken during their execution.
+    tasks: the TaskTrace (see CHARACTERIZATION_COLUMNS).
+    cs: the CS Trace.
+    cpu: the CPU Trace.
+    specific_class: the class on which to focus the analysis (all tasks if None).
+    central_gran: the central granularity.
+    rank_error: if set, percentiles are approximated with a QuantileSketch with this rank error, instead of being computed exactly.
+    Returns a Diagnosis.
+    '''
+    summary = None
+    if rank_error is not None:
+        summary = QuantileSketch(k_for_error(rank_error))
+    diagnoser = Diagnoser(specific_class, central_gran, summary)
+    tasks = diagnoser.use_tasks(tasks)
+    #Checks which measurements have occurred during the execution of a task
+    cs_values = cs["cs"].tolist()
+    in_task = SampleIndex(cs["timestamp"].tolist(), cs_values).covered(tasks["entry"], tasks["exit"])
+    diagnoser.cs = cs["cs"][in_task].tolist()
+    cpu_values = cpu_utilization(cpu)
+    in_task = SampleIndex(cpu["timestamp"].tolist(), cpu_values).covered(tasks["entry"], tasks["exit"])
+    diagnoser.cpus = numpy.array(cpu_values, dtype=numpy.float64)[in_task].tolist()
+    return diagnoser.statistics()
+
+#The statistics of the diagnosis which are merged across runs (see merge_diagnoses)
+MERGED_STATISTICS = ["Total number of tasks",
+                     "Average granularity",
+                     "1st percentile - granularity",
+                     "5th percentile - granularity",
+                     "50th percentile (median) - granularity",
+                     "95th percentile - granularity",
+                     "99th percentile - granularity",
+                     "IQC - granularity",
+                     "Lower whiskers range - granularity",
+                     "Upper whiskers range - granularity",
+                     "Percentage of tasks having granularity within whiskers range",
+                     "Percentage of tasks with granularity around central granularity",
+                     "Average number of context switches",
+                     "Average CPU utilization"]
+
+def t_score(freedom):
+    '''
+    Returns the quantile of the Student's t-distribution corresponding to a confidence of 0.95, for the input degrees of freedom (approximated by Z_SCORE above 30).
+    '''
+    if freedom <= len(T_SCORES):
+        return T_SCORES[freedom - 1]
+    return Z_SCORE
+
+def mean_confidence_interval(values):
+    '''
+    Returns the mean of the input values and the half-width of its confidence interval (0 if there are less than two values).
+    Since the values usually come from a few runs, the interval is computed with the Student's t-distribution (see t_score).
+    '''
+    mean = math.fsum(values)/len(values)
+    if len(values) < 2:
+        return mean, 0
+    sd = math.sqrt(math.fsum([pow((value - mean), 2) for value in values])/(len(values) - 1))
+    return mean, (t_score(len(values) - 1) * sd)/math.sqrt(len(values))
+
+class MergedDiagnosis:
+    '''
+    The statistics of the diagnosis of several runs (e.g., several profiling sessions of the same application), merged across runs.
+    '''
+    def __init__(self, specific_class, runs, stats):
+        '''
+        specific_class: the class of the analyzed tasks (all tasks if None).
+        runs: the list of the names of the runs (e.g., their trace directories), and of their Diagnosis.
+        stats: a list associating the name of each statistic of MERGED_STATISTICS with its mean across runs and the half-width of its confidence interval.
+        '''
+        self.specific_class = specific_class
+        self.runs = runs
+        self.stats = stats
+
+    def report(self):
+        '''
+        Returns the merged statistics, as printed by batch.py.
+        '''
+        lines = ["", "STATISTICS ACROSS %s RUNS (MEAN +- 95%% CONFIDENCE INTERVAL)" % str(len(self.runs))]
+        if self.specific_class is not None:
+            lines.append("-> Selected class: %s" % self.specific_class)
+        for name, mean, interval in self.stats:
+            lines.append("-> %s: %s+-%s" % (name, str(mean), str(interval)))
+        lines.append("")
+        return "\n".join(lines)
+
+    def write(self, path):
+        '''
+        Writes the merged statistics on a csv file, one statistic per row.
+        '''
+        with open_trace(path, 'w') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(["Selected class", "Statistic", "Runs", "Mean", "Confidence interval"])
+            for name, mean, interval in self.stats:
+                writer.writerow(["null" if self.specific_class is None else self.specific_class, name, len(self.runs), str(mean), str(interval)])
+
+    def write_runs(self, path):
+        '''
+        Writes the statistics of each run on a csv file, one run per row.
+        '''
+        with open_trace(path, 'w') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(["Run"] + MERGED_STATISTICS)
+            for name, diagnosis in self.runs:
+                writer.writerow([name] + [diagnosis.value(statistic) for statistic in MERGED_STATISTICS])
+
+def merge_diagnoses(runs):
+    '''
+    Merges the statistics of the diagnosis of several runs, computing the mean of each statistic of MERGED_STATISTICS across runs and its confidence interval (with a confidence of 0.95).
+    runs: a non-empty list of the names of the runs and of their Diagnosis (of the same class).
+    Returns a MergedDiagnosis.
+    '''
+    stats = []
+    for name in MERGED_STATISTICS:
+        mean, interval = mean_confidence_interval([float(diagnosis.value(name)) for run, diagnosis in runs])
+        stats.append((name, mean, interval))
+    return MergedDiagnosis(runs[0][1].specific_class, runs, stats)
+
+def is_finegrained(min_gran, max_gran, count, max_granularity=DEFAULT_FINE_MAX_GRAN, max_diff=DEFAULT_FINE_MAX_DIFF, min_tasks=DEFAULT_FINE_MIN_TASKS):
+    '''
+    Checks whether a class satisfies the conditions to be considered as fine-grained.
+    min_gran: the minimum granularity of the tasks of the class.
+    max_gran: the maximum granularity of the tasks of the class.
+    count: the number of tasks of the class.
+    max_granularity, max_diff, min_tasks: the thresholds MAX_GRAN, MAX_DIFF, and MIN_TASKS_SPAWNED.
+    Returns true if all conditions are satisfied, false otherwise.
+    '''
+    if max_gran > max_granularity:
+        return False
+    return max_gran - min_gran <= max_diff and count >= min_tasks
+
+class FineGrained:
+    '''
+    The classes spawning only fine-grained tasks, with the context switches occurred during the execution of their tasks.
+    '''
+    def __init__(self, classes, outside_cs):
+        '''
+        classes: the dictionary associating each fine-grained class to a list containing the total granularity of its tasks, the total number of context switches, the number of tasks, and the number of CS measurements.
+        outside_cs: the average number of context switches occurred when fine-grained tasks are not in execution.
+        '''
+        self.classes = classes
+        self.outside_cs = outside_cs
+
+    def averages(self, key):
+        '''
+        Returns the average granularity and the average number of context switches of a fine-grained class.
+        '''
+        totals = self.classes[key]
+        avg_gran = 0
+        avg_cs = 0
+        if totals[2] > 0:
+            avg_gran = totals[0]/totals[2]
+        if totals[3] > 0:
+            avg_cs = totals[1]/totals[3]
+        return avg_gran, avg_cs
+
+    def report(self):
+        '''
+        Returns the results, as printed by fine_grained.py.
+        '''
+        lines = ["", "Average number of context switches experienced when fine-grained tasks are not in execution: %scs/100ms" % str(self.outside_cs), ""]
+        for key in self.classes:
+            avg_gran, avg_cs = self.averages(key)
+            lines.append("Class: %s -> Average granularity: %s -> Average number of context switches: %s" % (key, str(avg_gran), str(avg_cs) + "cs/100ms"))
+        lines.append("")
+        return "\n".join(lines)
+
+    def write(self, path):
+        '''
+        Writes the results on a csv file.
+        '''
+        with open_trace(path, 'w') as csvfile:
+            fieldnames = ["Class", "Average granularity", "Average number of context switches"]
+            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+            writer.writeheader()
+            for key in self.classes:
+                avg_gran, avg_cs = self.averages(key)
+                writer.writerow({"Class": key, "Average granularity": str(avg_gran), "Average number of context switches": str(avg_cs)})
+
+def fine_grained(tasks, cs, max_gran=DEFAULT_FINE_MAX_GRAN, max_diff=DEFAULT_FINE_MAX_DIFF, min_tasks=DEFAULT_FINE_MIN_TASKS):
+    '''
+    Identifies the classes spawning only fine-grained tasks, i.e., the classes whose tasks have granularity at most MAX_GRAN, whose granularity range is at most MAX_DIFF, and which spawn at least MIN_TASKS_SPAWNED tasks. For each of them, counts the context switches occurred during the execution of its tasks.
+    tasks: the TaskTrace (see CHARACTERIZATION_COLUMNS).
+    cs: the CS Trace.
+    max_gran, max_diff, min_tasks: the thresholds MAX_GRAN, MAX_DIFF, and MIN_TASKS_SPAWNED.
+    Returns a FineGrained.
+    '''
+    tasks = tasks.select(tasks.executed())
+    classes = group_classes(tasks)
+    timestamps = cs["timestamp"].tolist()
+    values = cs["cs"].tolist()
+    index = SampleIndex(timestamps, values)
+    fineclasses = {}
+    for key in classes:
+        rows = classes[key]
+        grans = tasks["granularity"][rows]
+        if is_finegrained(int(grans.min()), int(grans.max()), len(rows), max_gran, max_diff, min_tasks):
+            total_cs, num_cs = samples_during(tasks, rows, index)
+            fineclasses[key] = [exact_sum(grans), total_cs, len(rows), num_cs]
+    intervals = IntervalUnion((entry_time, exit_time) for key in fineclasses for entry_time, exit_time in zip(tasks["entry"][classes[key]].tolist(), tasks["exit"][classes[key]].tolist()))
+    return FineGrained(fineclasses, average_outside(intervals, timestamps, values))
+
+def fine_grained_sweep(tasks, cs, gran_grid, diff_grid, min_tasks_grid):
+    '''
+    Checks which classes are fine-grained for every combination of the values of MAX_GRAN, MAX_DIFF, and MIN_TASKS_SPAWNED.
+    The minimum and maximum granularity and the number of tasks of each class are computed once, so that each point of the grid is evaluated without scanning the tasks. The context switches are then counted once for each class which is fine-grained at some point.
+    tasks: the TaskTrace (see CHARACTERIZATION_COLUMNS).
+    cs: the CS Trace.
+    gran_grid, diff_grid, min_tasks_grid: the values of MAX_GRAN, MAX_DIFF, and MIN_TASKS_SPAWNED.
+    Returns a list of (MAX_GRAN, MAX_DIFF, MIN_TASKS_SPAWNED, classes) tuples, one for each point of the grid, where classes is a list of (class, average granularity, average number of context switches) tuples.
+    '''
+    tasks = tasks.select(tasks.executed())
+    classes = group_classes(tasks)
+    bounds = {}
+    for key in classes:
+        grans = tasks["granularity"][classes[key]]
+        bounds[key] = (int(grans.min()), int(grans.max()), len(classes[key]))
+    points = []
+    for max_gran in gran_grid:
+        for max_diff in diff_grid:
+            for min_tasks in min_tasks_grid:
+                qualifying = [key for key in classes if is_finegrained(bounds[key][0], bounds[key][1], bounds[key][2], max_gran, max_diff, min_tasks)]
+                points.append((max_gran, max_diff, min_tasks, qualifying))
+    index = SampleIndex(cs["timestamp"].tolist(), cs["cs"].tolist())
+    fineclasses = {}
+    for point in points:
+        for key in point[3]:
+            if key not in fineclasses:
+                total_cs, num_cs = samples_during(tasks, classes[key], index)
+                fineclasses[key] = [exact_sum(tasks["granularity"][classes[key]]), total_cs, len(classes[key]), num_cs]
+    result = FineGrained(fineclasses, None)
+    return [(max_gran, max_diff, min_tasks, [(key,) + result.averages(key) for key in qualifying]) for max_gran, max_diff, min_tasks, qualifying in points]
+
+def is_coarsegrained(min_gran, max_gran, count, min_granularity=DEFAULT_COARSE_MIN_GRAN, max_granularity=DEFAULT_COARSE_MAX_GRAN, min_tasks=DEFAULT_COARSE_MIN_TASKS, max_tasks=DEFAULT_COARSE_MAX_TASKS):
+    '''
+    Checks whether a class satisfies the conditions to be considered as coarse-grained.
+    min_gran: the minimum granularity of the tasks of the class.
+    max_gran: the maximum granularity of the tasks of the class.
+    count: the number of tasks of the class.
+    min_granularity, max_granularity, min_tasks, max_tasks: the thresholds MIN_GRAN, MAX_GRAN, MIN_TASK_SPAWNED, and MAX_TASK_SPAWNED.
+    '''
+    all_coarse = min_gran >= min_granularity and max_gran <= max_granularity
+    return all_coarse and count >= min_tasks and count <= max_tasks
+
+class CoarseGrained:
+    '''
+    The classes spawning only coarse-grained tasks, with the context switches and the CPU utilization measured during the execution of their tasks.
+    '''
+    def __init__(self, classes, outside_cs):
+        '''
+        classes: the dictionary associating each coarse-grained class to a list containing the average granularity of its tasks, the average number of context switches, and the average CPU utilization.
+        outside_cs: the average number of context switches occurred when coarse-grained tasks are not in execution.
+        '''
+        self.classes = classes
+        self.outside_cs = outside_cs
+
+    def report(self):
+        '''
+        Returns the results, as printed by coarse_grained.py.
+        '''
+        lines = ["", "Average number of context switches experienced when coarse-grained tasks are not in execution: %scs/100ms" % str(self.outside_cs), "", "CLASSES CONTAINING COARSE-GRAINED TASKS:", ""]
+        for key in self.classes:
+            res = self.classes[key]
+            lines.append("-> Class: %s \n   Average granularity: %s \n   Average number of context switches: %s \n   Average CPU utilization: %s" % (key, str(res[0]), str(res[1]) + "cs/100ms", str(res[2])))
+        lines.append("")
+        return "\n".join(lines)
+
+    def write(self, path):
+        '''
+        Writes the results on a csv file.
+        '''
+        with open_trace(path, 'w') as csvfile:
+            fieldnames = ["Class", "Average granularity", "Average number of context switches", "Average CPU utilization"]
+            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+            writer.writeheader()
+            for key in self.classes:
+                res = self.classes[key]
+                writer.writerow({"Class": key, "Average granularity": str(res[0]), "Average number of context switches": str(res[1]), "Average CPU utilization": str(res[2])})
+
+def coarse_grained(tasks, cs, cpu, min_gran=DEFAULT_COARSE_MIN_GRAN, max_gran=DEFAULT_COARSE_MAX_GRAN, min_tasks=DEFAULT_COARSE_MIN_TASKS, max_tasks=DEFAULT_COARSE_MAX_TASKS):
+    '''
+    Identifies the classes spawning only coarse-grained tasks, i.e., the classes whose tasks have granularity within [MIN_GRAN, MAX_GRAN], and which spawn between MIN_TASK_SPAWNED and MAX_TASK_SPAWNED tasks. For each of them, computes the average granularity, number of context switches, and CPU utilization during the execution of its tasks.
+    tasks: the TaskTrace (see CHARACTERIZATION_COLUMNS).
+    cs: the CS Trace.
+    cpu: the CPU Trace.
+    min_gran, max_gran, min_tasks, max_tasks: the thresholds MIN_GRAN, MAX_GRAN, MIN_TASK_SPAWNED, and MAX_TASK_SPAWNED.
+    Returns a CoarseGrained.
+    '''
+    tasks = tasks.select(tasks.executed())
+    classes = group_classes(tasks)
+    timestamps = cs["timestamp"].tolist()
+    values = cs["cs"].tolist()
+    #Sorts the measurements by timestamp, so that those taken during a task execution are found by binary search
+    cs_index = SampleIndex(timestamps, values)
+    cpu_index = SampleIndex(cpu["timestamp"].tolist(), cpu_utilization(cpu))
+    coarseclasses = {}
+    for key in classes:
+        rows = classes[key]
+        grans = tasks["granularity"][rows]
+        if not is_coarsegrained(int(grans.min()), int(grans.max()), len(rows), min_gran, max_gran, min_tasks, max_tasks):
+            continue
+        total_gran = exact_sum(grans)
+        total_cs, num_cs = samples_during(tasks, rows, cs_index)
+        total_cpu, num_cpu = samples_during(tasks, rows, cpu_index)
+        avg_cpu = 0
+        avg_cs = 0
+        avg_gran = 0
+        if num_cpu > 0:
+            avg_cpu = total_cpu/num_cpu
+        if num_cs > 0:
+            avg_cs = total_cs/num_cs
+        if len(rows) > 0:
+            avg_gran = total_gran/len(rows)
+        coarseclasses[key] = [avg_gran, avg_cs, avg_cpu]
+    intervals = IntervalUnion((entry_time, exit_time) for key in coarseclasses for entry_time, exit_time in zip(tasks["entry"][classes[key]].tolist(), tasks["exit"][classes[key]].tolist()))
+    return CoarseGrained(coarseclasses, average_outside(intervals, timestamps, values))
@@ -0,0 +1,196 @@
+'''
+Binary sidecar cache of parsed traces.
+
+The first time a trace is parsed, its columns are written next to it, in a directory named after the trace (e.g., 'traces/tasks.csv.cache/'):
+  - meta.json, describing the cached columns and the size and modification time of the trace they were parsed from
+  - one raw binary file per column ('<column>.bin'), which is memory-mapped (copy-on-write) when the cache is opened, so that columns are not copied into memory and changes to them never reach the cache
+  - one file per text column ('<column>.categories.npy'), containing its distinct strings
+The cache is used only if the size and modification time of the trace did not change since the cache was written.
+A cache may hold only some columns of a trace: the columns parsed later are added to it (see CacheWriter), without writing the cached ones again.
+'''
+
+import json
+import os
+import shutil
+import numpy
+
+#The suffix of the directory containing the cache of a trace
+CACHE_SUFFIX = ".cache"
+
+#The version of the cache format. Caches with a different version are ignored
+CACHE_VERSION = 1
+
+def cache_directory(path):
+    '''
+    Returns the path to the cache directory of the input trace.
+    '''
+    return path + CACHE_SUFFIX
+
+def source_key(path):
+    '''
+    Returns the size and modification time of the input trace, which identify the content the cache was parsed from.
+    '''
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime}
+
+def to_bytes(strings):
+    '''
+    Converts a list of strings into a NumPy array of bytes.
+    '''
+    if str is bytes:
+        return numpy.array(strings, dtype=bytes)
+    return numpy.array([string.encode("utf-8", "surrogateescape") for string in strings], dtype=bytes)
+
+def from_bytes(array):
+    '''
+    Converts a NumPy array of bytes back into a list of strings.
+    '''
+    if str is bytes:
+        return array.tolist()
+    return [string.decode("utf-8", "surrogateescape") for string in array.tolist()]
+
+class CachedTrace:
+    '''
+    A trace opened from its cache.
+    '''
+    def __init__(self, directory, meta):
+        self.directory = directory
+        self.rows = meta["rows"]
+        #Associates the name of each cached column with its NumPy type
+        self.dtypes = dict((str(name), dtype) for name, dtype in meta["columns"].items())
+        #Associates the name of each cached column with its (memory-mapped) array
+        self.arrays = {}
+        for name, dtype in meta["columns"].items():
+            name = str(name)
+            if self.rows == 0:
+                self.arrays[name] = numpy.zeros(0, dtype=dtype)
+            else:
+                self.arrays[name] = numpy.memmap(os.path.join(directory, name + ".bin"), dtype=dtype, mode="c", shape=(self.rows,))
+        #Associates the name of each text column with its categories
+        self.categories = {}
+        for name in meta["categories"]:
+            name = str(name)
+            self.categories[name] = from_bytes(numpy.load(os.path.join(directory, name + ".categories.npy")))
+
+def open_cache(path, kind):
+    '''
+    Opens the cache of the input trace.
+    path: the path to the trace.
+    kind: the kind of trace (e.g., "tasks", "cs", "cpu", "gc"), which must match the one of the cache.
+    Returns a CachedTrace, or None if the cache does not exist or is outdated.
+    '''
+    directory = cache_directory(path)
+    try:
+        with open(os.path.join(directory, "meta.json")) as metafile:
+            meta = json.load(metafile)
+        key = source_key(path)
+        if meta["version"] != CACHE_VERSION or meta["kind"] != kind or meta["size"] != key["size"] or meta["mtime"] != key["mtime"]:
+            return None
+        return CachedTrace(directory, meta)
+    except (IOError, OSError, ValueError, KeyError):
+        return None
+
+def link_file(source, target):
+    '''
+    Hard-links a file into another directory, or copies it if hard links are not supported.
+    '''
+    try:
+        os.link(source, target)
+    except (OSError, AttributeError):
+        shutil.copyfile(source, target)
+
+class CacheWriter:
+    '''
+    Writes the cache of a trace, one chunk of rows at a time.
+    The cache is written in a temporary directory, which replaces the cache directory only when the whole trace has been written.
+    If the cache cannot be written (e.g., the directory of the trace is read-only), the writer silently does nothing.
+    '''
+    def __init__(self, path, kind, dtypes, base=None):
+        '''
+        path: the path to the trace.
+        kind: the kind of trace.
+        dtypes: a dictionary associating the name of each column to cache with its NumPy type.
+        base: the CachedTrace of the trace to which the columns are added (None to cache only the input columns). Its columns which are not written again are linked into the new cache.
+        '''
+        self.path = path
+        self.kind = kind
+        self.dtypes = dict((name, numpy.dtype(dtype).str) for name, dtype in dtypes.items())
+        self.base = base
+        self.rows = 0
+        self.files = {}
+        try:
+            self.key = source_key(path)
+            self.directory = cache_directory(path) + ".tmp%d" % os.getpid()
+            if os.path.isdir(self.directory):
+                shutil.rmtree(self.directory)
+            os.mkdir(self.directory)
+            for name in self.dtypes:
+                self.files[name] = open(os.path.join(self.directory, name + ".bin"), "wb")
+        except (IOError, OSError):
+            self.abort()
+
+    def append(self, arrays):
+        '''
+        Appends a chunk of rows to the cache.
+        arrays: a dictionary associating the name of each column with the values of the rows.
+        '''
+        if self.directory is None:
+            return
+        try:
+            for name, array in arrays.items():
+                numpy.ascontiguousarray(array, dtype=self.dtypes[name]).tofile(self.files[name])
+            self.rows += len(array)
+        except (IOError, OSError):
+            self.abort()
+
+    def commit(self, categories):
+        '''
+        Completes the cache, which replaces any existing cache of the trace.
+        categories: a dictionary associating the name of each text column with its categories.
+        '''
+        if self.directory is None:
+            return
+        try:
+            for cachefile in self.files.values():
+                cachefile.close()
+            for name, strings in categories.items():
+                numpy.save(os.path.join(self.directory, name + ".categories.npy"), to_bytes(strings))
+            columns = dict(self.dtypes)
+            categories = list(categories)
+            if self.base is not None:
+                if self.base.rows != self.rows:
+                    self.abort()
+                    return
+                for name, dtype in self.base.dtypes.items():
+                    if name not in columns:
+                        link_file(os.path.join(self.base.directory, name + ".bin"), os.path.join(self.directory, name + ".bin"))
+                        columns[name] = dtype
+                        if name in self.base.categories:
+                            link_file(os.path.join(self.base.directory, name + ".categories.npy"), os.path.join(self.directory, name + ".categories.npy"))
+                            categories.append(name)
+            meta = {"version": CACHE_VERSION, "kind": self.kind, "size": self.key["size"], "mtime": self.key["mtime"], "rows": self.rows, "columns": columns, "categories": categories}
+            with open(os.path.join(self.directory, "meta.json"), "w") as metafile:
+                json.dump(meta, metafile)
+            #Checks that the trace has not been modified while it was parsed
+            if source_key(self.path) != self.key:
+                self.abort()
+                return
+            target = cache_directory(self.path)
+            if os.path.isdir(target):
+                shutil.rmtree(target)
+            os.rename(self.directory, target)
+            self.directory = None
+        except (IOError, OSError):
+            self.abort()
+
+    def abort(self):
+        '''
+        Discards the partially written cache.
+        '''
+        for cachefile in self.files.values():
+            cachefile.close()
+        self.files = {}
+        directory = getattr(self, "directory", None)
+        self.directory = None
+        if directory is not None and os.path.isdir(directory):
+            shutil.rmtree(directory, ignore_errors=True)
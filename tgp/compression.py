@@ -0,0 +1,147 @@
+'''
+Transparent (de)compression of traces and result files, based on their extension: '.gz' (gzip), '.bz2' (bzip2), '.xz' (xz), and '.zst' (Zstandard).
+
+Files are compressed and decompressed on the fly while they are written or read, without temporary files.
+gzip and bzip2 are always supported. xz is supported through the lzma module (Python 3, or backports.lzma in Python 2) and Zstandard through the zstandard module, if installed; otherwise, the 'xz' and 'zstd' commands are used, if available.
+'''
+
+import bz2
+import gzip
+import io
+import os
+import subprocess
+
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+#The supported extensions, and the command used for each of them if no module is available
+EXTENSIONS = [".gz", ".bz2", ".xz", ".zst"]
+COMMANDS = {".xz": ["xz"], ".zst": ["zstd", "-q"]}
+
+def compression(path):
+    '''
+    Returns the extension of the compression format of a file, or None if the file is not compressed.
+    '''
+    extension = os.path.splitext(path)[1].lower()
+    if extension in EXTENSIONS:
+        return extension
+    return None
+
+def find_trace(directory, name):
+    '''
+    Returns the path to a trace in a directory, which may be compressed (e.g., 'tasks.csv.gz' instead of 'tasks.csv'), or None if the trace is missing.
+    '''
+    for extension in [""] + EXTENSIONS:
+        path = os.path.join(directory, name + extension)
+        if os.path.isfile(path):
+            return path
+    return None
+
+def find_command(name):
+    '''
+    Returns true if the input command is in the PATH, false otherwise.
+    '''
+    for directory in os.environ.get("PATH", "").split(os.pathsep):
+        if os.access(os.path.join(directory, name), os.X_OK):
+            return True
+    return False
+
+def open_trace(path, mode='r'):
+    '''
+    Opens a file for reading ('r') or writing ('w'), decompressing or compressing it on the fly if it is compressed (see compression).
+    The file is opened in text mode, and can be passed to csv.reader or csv.writer.
+    Raises IOError if the compression format of the file is not supported.
+    '''
+    extension = compression(path)
+    if extension is None:
+        return open(path, mode)
+    #Python 2 reads and writes csv files as byte strings
+    text = str is not bytes
+    file_mode = mode + ("t" if text else "b")
+    if extension == ".gz":
+        gzfile = gzip.open(path, file_mode)
+        #GzipFile reads lines slowly in Python 2, hence its content is read through a buffer
+        if not text and mode == 'r':
+            return io.BufferedReader(gzfile)
+        return gzfile
+    if extension == ".bz2":
+        if text:
+            return bz2.open(path, file_mode)
+        return bz2.BZ2File(path, file_mode)
+    if extension == ".xz" and lzma is not None:
+        return lzma.open(path, file_mode)
+    if extension == ".zst" and zstandard is not None and hasattr(zstandard, "open"):
+        return zstandard.open(path, file_mode)
+    command = COMMANDS[extension]
+    if not find_command(command[0]):
+        raise IOError("Cannot open %s: neither the Python module nor the '%s' command supporting '%s' files are available" % (path, command[0], extension))
+    return CommandFile(command, path, mode)
+
+class CommandFile:
+    '''
+    A file decompressed (or compressed) by an external command, which writes (or reads) the content of the file through a pipe.
+    '''
+    def __init__(self, command, path, mode):
+        '''
+        command: the command and its options, to which '-dc <path>' is added to decompress the file, or '-c' to compress it.
+        path: the path to the file.
+        mode: either 'r' or 'w'.
+        '''
+        self.path = path
+        self.command = command[0]
+        if mode == 'r':
+            self.process = subprocess.Popen(command + ["-dc", path], stdout=subprocess.PIPE)
+            self.output = None
+            pipe = self.process.stdout
+        else:
+            self.output = open(path, 'wb')
+            self.process = subprocess.Popen(command + ["-c"], stdin=subprocess.PIPE, stdout=self.output)
+            pipe = self.process.stdin
+        if str is not bytes:
+            pipe = io.TextIOWrapper(pipe)
+        self.pipe = pipe
+
+    def __iter__(self):
+        return iter(self.pipe)
+
+    def __next__(self):
+        return next(self.pipe)
+
+    next = __next__
+
+    def read(self, *arguments):
+        return self.pipe.read(*arguments)
+
+    def readline(self, *arguments):
+        return self.pipe.readline(*arguments)
+
+    def write(self, data):
+        return self.pipe.write(data)
+
+    def close(self):
+        '''
+        Closes the pipe and waits for the command to terminate.
+        Raises IOError if the command failed. A command killed by a signal is not considered as failed when reading, as this happens when the file is closed before being read entirely.
+        '''
+        self.pipe.close()
+        code = self.process.wait()
+        if self.output is not None:
+            self.output.close()
+        if code > 0 or (code < 0 and self.output is not None):
+            raise IOError("Cannot process %s: '%s' failed" % (self.path, self.command))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
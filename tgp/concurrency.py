@@ -0,0 +1,119 @@
+'''
+Concurrency profile of task execution, i.e., the number of tasks in execution over time.
+
+The entry and exit of each executed task are sorted once as a sequence of events, which is then swept computing the number of running tasks after each event (with a cumulative sum), in O(n log n) time for n tasks.
+The resulting step curve gives the time-weighted parallelism histogram (how long exactly k tasks were running) and the periods during which fewer tasks than a threshold (e.g., the number of cores) were running.
+'''
+
+from __future__ import division
+import numpy
+
+from tgp.traces import Trace
+
+class ConcurrencyProfile:
+    '''
+    The number of running tasks over time, as a step curve: levels[i] tasks are running from times[i] (included) to times[i + 1] (excluded). The last level is always 0.
+    '''
+    def __init__(self, times, levels):
+        self.times = times
+        self.levels = levels
+
+    def durations(self):
+        '''
+        Returns the duration of each step, except the last one (which has no end).
+        '''
+        return numpy.diff(self.times)
+
+    def duration(self):
+        '''
+        Returns the time between the first entry and the last exit (0 if no task has been executed).
+        '''
+        if len(self.times) == 0:
+            return 0
+        return int(self.times[-1] - self.times[0])
+
+    def maximum(self):
+        '''
+        Returns the maximum number of tasks running at the same time.
+        '''
+        if len(self.levels) == 0:
+            return 0
+        return int(self.levels.max())
+
+    def average(self):
+        '''
+        Returns the time-weighted average number of running tasks between the first entry and the last exit.
+        '''
+        if self.duration() == 0:
+            return 0
+        return float(numpy.dot(self.levels[:-1].astype(numpy.float64), self.durations())) / self.duration()
+
+    def histogram(self):
+        '''
+        Returns the time-weighted parallelism histogram, i.e., an array whose k-th element is the time during which exactly k tasks were running.
+        '''
+        if len(self.levels) < 2:
+            return numpy.zeros(1)
+        return numpy.bincount(self.levels[:-1], weights=self.durations())
+
+    def periods_below(self, threshold, min_duration=0):
+        '''
+        Finds the periods (between the first entry and the last exit) during which fewer than 'threshold' tasks were running, e.g., because coarse-grained tasks left some cores idle.
+        Consecutive steps below the threshold are merged into a single period.
+        min_duration: the minimum duration of the periods to report.
+        Returns a Trace containing the start, end, duration, time-weighted average number of running tasks ('average'), and minimum number of running tasks ('minimum') of each period, in time order.
+        '''
+        below = self.levels[:-1] < threshold
+        bounds = numpy.diff(numpy.concatenate([[0], below.astype(numpy.int8), [0]]))
+        #A period spans the steps [first, last)
+        first = numpy.flatnonzero(bounds == 1)
+        last = numpy.flatnonzero(bounds == -1)
+        starts = self.times[first]
+        ends = self.times[last]
+        #Prefix sums of the number of running tasks weighted by the duration of each step
+        weighted = numpy.concatenate([[0.0], numpy.cumsum(self.levels[:-1] * self.durations().astype(numpy.float64))])
+        durations = ends - starts
+        averages = numpy.zeros(len(first))
+        minimums = numpy.zeros(len(first), dtype=numpy.int64)
+        if len(first) > 0:
+            with numpy.errstate(divide='ignore', invalid='ignore'):
+                averages = numpy.where(durations > 0, (weighted[last] - weighted[first]) / numpy.maximum(durations, 1), self.levels[first])
+            minimums = numpy.minimum.reduceat(self.levels[:-1], first)
+        kept = (durations > 0) & (durations >= min_duration)
+        return Trace({"start": starts[kept], "end": ends[kept], "duration": durations[kept], "average": averages[kept], "minimum": minimums[kept]})
+
+def concurrency_profile(entries, exits):
+    '''
+    Computes the concurrency profile of a set of task executions.
+    At the same timestamp, exits are processed before entries, so that a task starting exactly when another one ends is not considered as running in parallel with it.
+    entries: the entry execution time of each task.
+    exits: the exit execution time of each task, in the same order as the entries. Tasks whose exit precedes their entry are skipped.
+    Returns a ConcurrencyProfile.
+    '''
+    entries = numpy.asarray(entries, dtype=numpy.int64)
+    exits = numpy.asarray(exits, dtype=numpy.int64)
+    valid = entries <= exits
+    times = numpy.concatenate([entries[valid], exits[valid]])
+    deltas = numpy.concatenate([numpy.ones(numpy.count_nonzero(valid), dtype=numpy.int64), -numpy.ones(numpy.count_nonzero(valid), dtype=numpy.int64)])
+    #Sorts the events by timestamp, and then exits (-1) before entries (+1)
+    order = numpy.lexsort((deltas, times))
+    times = times[order]
+    levels = numpy.cumsum(deltas[order])
+    #Keeps the number of running tasks after the last event at each timestamp
+    last = numpy.concatenate([times[1:] != times[:-1], [True]]) if len(times) > 0 else numpy.zeros(0, dtype=bool)
+    return ConcurrencyProfile(times[last], levels[last])
+
+def task_concurrency(tasks):
+    '''
+    Computes the concurrency profile of the executed tasks of a TaskTrace.
+    '''
+    executed = tasks.select(tasks.executed())
+    return concurrency_profile(executed["entry"], executed["exit"])
+
+def class_concurrency(tasks):
+    '''
+    Computes the concurrency profile of the executed tasks of each class of a TaskTrace.
+    Returns a list of (class, ConcurrencyProfile) pairs, where classes are sorted by their first appearance in the trace.
+    '''
+    executed = tasks.select(tasks.executed())
+    return [(task_class, concurrency_profile(executed["entry"][rows], executed["exit"][rows])) for task_class, rows in executed.group_by("class")]
@@ -0,0 +1,487 @@
+'''
+Calling-context trees built from the task trace produced by tgp in the calling-context profiling mode.
+
+Each calling context is a string of the methods open on the call stack, from the outermost to the innermost, separated by '!'. Instead of storing such strings, a calling-context tree stores each distinct context as a path from the root: contexts sharing a prefix share the nodes of that prefix, and each method name is interned once for all trees (see FrameTable).
+Nodes are numbered in creation order, hence a node is always numbered after its parent. The structure of the tree and the counters of each node are stored in flat integer arrays.
+'''
+
+import array
+import csv
+import itertools
+import numpy
+
+from tgp.compression import open_trace
+from tgp.traces import CHUNK_SIZE
+
+#Number of columns in the task trace produced in the calling-context profiling mode
+FIELDS_CC_TASKS = 6
+
+#The kinds of calling contexts, in trace order
+CONTEXT_KINDS = ["init", "submit", "exec"]
+
+#The separator between the methods of a calling context
+METHOD_SEPARATOR = "!"
+
+#The value of a calling context which was not collected (e.g., the submission context of a task which was not submitted)
+MISSING_CONTEXT = "null"
+
+#The first line of a trace in compact format (see compact_trace)
+COMPACT_MAGIC = "#tgp compact calling-context trace,1"
+
+#The tags of the records of a trace in compact format
+HEADER_RECORD = "H,"
+METHOD_RECORD = "M,"
+CONTEXT_RECORD = "C,"
+TASK_RECORD = "T,"
+
+#The IDs of a calling context which was not collected, and of an empty calling context, in compact format
+MISSING_ID = -1
+EMPTY_ID = -2
+
+#The separator between the methods of a folded stack, and the character replacing it in method names
+FOLDED_SEPARATOR = ";"
+FOLDED_REPLACEMENT = ","
+
+#The node standing for the bottom of the call stack, which has no method
+ROOT = 0
+
+#The node of a context of a trace in compact format which has not been resolved yet
+UNRESOLVED = -1
+
+#The number of bits of the key of a child (see CallingContextTree.child) holding the method
+FRAME_BITS = 32
+
+class FrameTable:
+    '''
+    The interned method names, shared by several calling-context trees.
+    '''
+    def __init__(self):
+        self.names = []
+        self.codes = {}
+
+    def intern(self, name):
+        '''
+        Returns the code of a method name, adding it to the table if it is new.
+        '''
+        code = self.codes.get(name)
+        if code is None:
+            code = len(self.names)
+            self.codes[name] = code
+            self.names.append(name)
+        return code
+
+class CallingContextTree:
+    '''
+    A calling-context tree, counting the tasks whose context ends at each node, and optionally their granularity.
+    '''
+    def __init__(self, frames):
+        '''
+        frames: the FrameTable interning the method names.
+        '''
+        self.frames = frames
+        #The parent, the method (code), and the depth of each node
+        self.parents = array.array('l', [ROOT])
+        self.methods = array.array('l', [-1])
+        self.depths = array.array('l', [0])
+        #The node of each (parent, method) pair, keyed by (parent << FRAME_BITS) | method
+        self.children = {}
+        #The number of tasks whose context ends at each node, and the number and total granularity of those whose granularity is known
+        self.tasks = array.array('l', [0])
+        self.measured = array.array('l', [0])
+        self.granularity = array.array('l', [0])
+        #The last context added, its methods, and the nodes from the root to its node, as consecutive tasks often share the same context or a prefix of it
+        self.last_context = None
+        self.last_names = []
+        self.last_path = [ROOT]
+        self.last_node = ROOT
+        #The node of each context ID of a trace in compact format (UNRESOLVED if not resolved yet)
+        self.encoded_nodes = array.array('l')
+
+    def __len__(self):
+        return len(self.parents)
+
+    def child(self, parent, method):
+        '''
+        Returns the child of a node corresponding to a method, creating it if it does not exist.
+        '''
+        key = (parent << FRAME_BITS) | method
+        node = self.children.get(key)
+        if node is None:
+            node = len(self.parents)
+            self.children[key] = node
+            self.parents.append(parent)
+            self.methods.append(method)
+            self.depths.append(self.depths[parent] + 1)
+            self.tasks.append(0)
+            self.measured.append(0)
+            self.granularity.append(0)
+        return node
+
+    def node(self, context):
+        '''
+        Returns the node of a calling context, creating the nodes of its methods which are not in the tree yet.
+        The methods shared with the previous context (i.e., its longest common prefix) are not looked up again.
+        '''
+        if context == self.last_context:
+            return self.last_node
+        #Contexts end with a separator
+        names = [name for name in context.split(METHOD_SEPARATOR) if name]
+        last_names = self.last_names
+        path = self.last_path
+        depth = 0
+        shared = min(len(names), len(last_names))
+        while depth < shared and names[depth] == last_names[depth]:
+            depth += 1
+        del path[depth + 1:]
+        node = path[depth]
+        codes = self.frames.codes
+        children = self.children
+        for name in names[depth:]:
+            method = codes.get(name)
+            if method is None:
+                method = self.frames.intern(name)
+            child = children.get((node << FRAME_BITS) | method)
+            if child is None:
+                child = self.child(node, method)
+            node = child
+            path.append(node)
+        self.last_context = context
+        self.last_names = names
+        self.last_node = node
+        return node
+
+    def encoded_node(self, dictionary, context):
+        '''
+        Returns the node of a calling context of a trace in compact format, creating the nodes of its methods which are not in the tree yet.
+        The node of each context ID is kept, so that each context is resolved only once, from the node of its parent context.
+        dictionary: the ContextDictionary of the trace.
+        context: the ID of the context in the dictionary.
+        '''
+        nodes = self.encoded_nodes
+        if context >= len(nodes):
+            nodes.extend([UNRESOLVED] * (len(dictionary.parents) - len(nodes)))
+        pending = []
+        while context >= 0 and nodes[context] == UNRESOLVED:
+            pending.append(context)
+            context = dictionary.parents[context]
+        node = ROOT if context < 0 else nodes[context]
+        for context in reversed(pending):
+            name = dictionary.names[dictionary.methods[context]]
+            #Contexts end with an empty name, after the final separator
+            if name:
+                node = self.child(node, self.frames.intern(name))
+            nodes[context] = node
+        return node
+
+    def add(self, context, granularity=None, dictionary=None):
+        '''
+        Counts a task whose calling context is the input string.
+        granularity: the granularity of the task, or None if unknown.
+        dictionary: the ContextDictionary of a trace in compact format, if the context is an ID in such dictionary instead of a string.
+        '''
+        if dictionary is None:
+            node = self.node(context)
+        else:
+            node = self.encoded_node(dictionary, context)
+        self.tasks[node] += 1
+        if granularity is not None:
+            self.measured[node] += 1
+            self.granularity[node] += granularity
+
+    def totals(self, values):
+        '''
+        Returns an int64 array containing, for each node, the sum of the input per-node values over the subtree rooted at the node.
+        values: an array of per-node values (e.g., self.tasks).
+        '''
+        total = numpy.array(values, dtype=numpy.int64)
+        parents = numpy.array(self.parents, dtype=numpy.int64)
+        depths = numpy.array(self.depths, dtype=numpy.int64)
+        #Adds each level to the one above it, from the deepest level to the root
+        order = numpy.argsort(-depths, kind='mergesort')
+        bounds = numpy.flatnonzero(numpy.diff(depths[order])) + 1
+        for level in numpy.split(order, bounds):
+            if depths[level[0]] > 0:
+                numpy.add.at(total, parents[level], total[level])
+        return total
+
+    def walk(self):
+        '''
+        Visits the tree depth-first, children in creation order.
+        Yields each node (except the root) with the list of the codes of the methods from the root to the node. The list is reused across nodes, and must not be modified.
+        '''
+        children = [[] for node in range(len(self.parents))]
+        for node in range(len(self.parents) - 1, 0, -1):
+            children[self.parents[node]].append(node)
+        path = []
+        pending = list(children[ROOT])
+        while pending:
+            node = pending.pop()
+            del path[self.depths[node] - 1:]
+            path.append(self.methods[node])
+            yield node, path
+            pending.extend(children[node])
+
+    def folded(self, weights):
+        '''
+        Yields the folded stack of each node which ends at least one context, i.e., its methods separated by ';' followed by its weight, as read by flame graph tools (e.g., flamegraph.pl).
+        Semicolons in method names (e.g., in 'Ljava/lang/String;') are replaced by commas.
+        weights: the weight of each node (e.g., self.tasks).
+        '''
+        names = [name.replace(FOLDED_SEPARATOR, FOLDED_REPLACEMENT) for name in self.frames.names]
+        for node, path in self.walk():
+            if self.tasks[node] > 0:
+                yield "%s %d" % (FOLDED_SEPARATOR.join([names[method] for method in path]), weights[node])
+
+class GranularityIndex:
+    '''
+    The granularity of each task execution of a task trace produced in the bytecode or reference-cycles profiling mode, looked up by task ID and execution number.
+    '''
+    def __init__(self, trace):
+        '''
+        trace: a TaskTrace containing columns 'id', 'exec_n', and 'granularity'.
+        '''
+        keys = execution_keys(trace["id"], trace["exec_n"])
+        order = numpy.argsort(keys, kind='mergesort')
+        self.keys = keys[order]
+        self.granularity = trace["granularity"][order]
+
+    def lookup(self, ids, exec_ns):
+        '''
+        Returns a boolean array stating which of the input task executions appear in the trace, and an array containing their granularity (0 for those which do not appear).
+        If a task execution appears several times (e.g., because of a collision between IDs), the first one in trace order is used.
+        '''
+        keys = execution_keys(ids, exec_ns)
+        if len(self.keys) == 0:
+            return numpy.zeros(len(keys), dtype=bool), numpy.zeros(len(keys), dtype=numpy.int64)
+        positions = numpy.minimum(numpy.searchsorted(self.keys, keys), len(self.keys) - 1)
+        found = self.keys[positions] == keys
+        return found, numpy.where(found, self.granularity[positions], 0)
+
+def execution_keys(ids, exec_ns):
+    '''
+    Combines task IDs (32-bit hash codes) and execution numbers into a single int64 key per task execution.
+    '''
+    return (numpy.asarray(ids, dtype=numpy.int64) << FRAME_BITS) + (numpy.asarray(exec_ns, dtype=numpy.int64) & 0xFFFFFFFF)
+
+def iter_contexts(path, chunk_size=CHUNK_SIZE):
+    '''
+    Reads a task trace produced in the calling-context profiling mode in chunks, without keeping the whole trace in memory. The trace can be either in CSV or in compact format (see compact_trace).
+    The header is skipped, as well as all rows whose ID or execution number is not an integer.
+    Yields, for each chunk, an int64 array of task IDs, an int64 array of execution numbers, the list of the calling contexts of each row (init, submit, exec), and the ContextDictionary of the trace.
+    In CSV format, calling contexts are strings and the dictionary is None. In compact format, calling contexts are IDs in the dictionary, which contains (at least) all contexts of the chunk. Contexts which were not collected are None in both formats.
+    Raises ValueError if a row does not have the expected number of columns.
+    '''
+    with open_trace(path, 'r') as csvfile:
+        first = csvfile.readline()
+        if first.rstrip("\r\n") == COMPACT_MAGIC:
+            dictionary = ContextDictionary()
+            rows = dictionary.iter_tasks(csvfile)
+        else:
+            dictionary = None
+            rows = iter_csv_tasks(itertools.chain([first], csvfile))
+        ids = []
+        exec_ns = []
+        contexts = []
+        for task_id, exec_n, row in rows:
+            try:
+                task_id = int(task_id)
+                exec_n = int(exec_n)
+            except ValueError:
+                continue
+            ids.append(task_id)
+            exec_ns.append(exec_n)
+            contexts.append(row)
+            if len(contexts) == chunk_size:
+                yield numpy.array(ids, dtype=numpy.int64), numpy.array(exec_ns, dtype=numpy.int64), contexts, dictionary
+                ids = []
+                exec_ns = []
+                contexts = []
+        if len(contexts) > 0:
+            yield numpy.array(ids, dtype=numpy.int64), numpy.array(exec_ns, dtype=numpy.int64), contexts, dictionary
+
+def iter_csv_tasks(lines):
+    '''
+    Parses the lines of a task trace in CSV format, skipping the header.
+    Yields the ID, the execution number (both as strings), and the calling contexts of each row (None for contexts which were not collected).
+    Raises ValueError if a row does not have the expected number of columns.
+    '''
+    reader = csv.reader(lines)
+    header = next(reader, None)
+    if header is None:
+        return
+    if len(header) != FIELDS_CC_TASKS:
+        raise ValueError("Wrong calling-context trace format")
+    for row in reader:
+        if len(row) != FIELDS_CC_TASKS:
+            raise ValueError("Wrong calling-context trace format")
+        yield row[0], row[2], [None if context == MISSING_CONTEXT or context == "" else context for context in row[3:]]
+
+class ContextDictionary:
+    '''
+    The method names and the calling contexts defined so far by a trace in compact format.
+    Calling contexts form a tree: each context is defined by its parent context (the context without its innermost method, or -1) and its innermost method, and is numbered in definition order.
+    '''
+    def __init__(self):
+        self.names = []
+        self.parents = array.array('l')
+        self.methods = array.array('l')
+
+    def string(self, context):
+        '''
+        Returns the string of a calling context, as written in the CSV format.
+        '''
+        if context == MISSING_ID:
+            return MISSING_CONTEXT
+        if context == EMPTY_ID:
+            return ""
+        names = []
+        while context >= 0:
+            names.append(self.names[self.methods[context]])
+            context = self.parents[context]
+        names.reverse()
+        return METHOD_SEPARATOR.join(names)
+
+    def iter_records(self, lines):
+        '''
+        Parses the lines of a trace in compact format following its first line, adding the method names and the calling contexts they define to the dictionary.
+        Yields the header of the original trace (as a line without terminator), and the fields of each task row (as strings, calling contexts being IDs).
+        Raises ValueError if a line is not a valid record.
+        '''
+        for line in lines:
+            line = line.rstrip("\r\n")
+            tag = line[:2]
+            if tag == TASK_RECORD:
+                fields = line[2:].split(",")
+                if len(fields) != FIELDS_CC_TASKS:
+                    raise ValueError("Wrong compact calling-context trace format")
+                yield fields
+            elif tag == CONTEXT_RECORD:
+                parent, method = line[2:].split(",")
+                self.parents.append(int(parent))
+                self.methods.append(int(method))
+            elif tag == METHOD_RECORD:
+                self.names.append(line[2:])
+            elif tag == HEADER_RECORD:
+                yield line[2:]
+            else:
+                raise ValueError("Wrong compact calling-context trace format")
+
+    def iter_tasks(self, lines):
+        '''
+        Parses the lines of a trace in compact format following its first line (see iter_records).
+        Yields the ID, the execution number (both as strings), and the calling contexts of each row, as IDs in the dictionary (None for contexts which were not collected).
+        '''
+        for fields in self.iter_records(lines):
+            if isinstance(fields, list):
+                contexts = [int(context) for context in fields[3:]]
+                yield fields[0], fields[2], [context if context >= 0 else None for context in contexts]
+
+class ContextEncoder:
+    '''
+    Assigns an ID to each distinct calling context while a trace is converted into compact format, defining the contexts (and method names) which were not seen before.
+    '''
+    def __init__(self, output, frames, contexts):
+        '''
+        output: the file where the definitions of new methods and contexts are written.
+        frames: the FrameTable of the methods defined so far.
+        contexts: the dictionary associating the ID of each context defined so far with its (parent, method) pair, keyed by ((parent + 1) << FRAME_BITS) | method, where the parent of outermost methods is -1.
+        '''
+        self.output = output
+        self.frames = frames
+        self.contexts = contexts
+        #The last context encoded, its methods, and the IDs of its prefixes, as in CallingContextTree.node
+        self.last_context = None
+        self.last_names = []
+        self.last_path = [MISSING_ID]
+
+    def encode(self, context):
+        '''
+        Returns the ID of a calling context (as written in the CSV format), writing the definitions of its new prefixes.
+        '''
+        if context == self.last_context:
+            return self.last_path[-1]
+        if context == MISSING_CONTEXT:
+            return MISSING_ID
+        if context == "":
+            return EMPTY_ID
+        #Empty names (e.g., after the final separator) are kept, so that the string can be rebuilt exactly
+        names = context.split(METHOD_SEPARATOR)
+        last_names = self.last_names
+        path = self.last_path
+        depth = 0
+        shared = min(len(names), len(last_names))
+        while depth < shared and names[depth] == last_names[depth]:
+            depth += 1
+        del path[depth + 1:]
+        parent = path[depth]
+        for name in names[depth:]:
+            method = self.frames.codes.get(name)
+            if method is None:
+                method = self.frames.intern(name)
+                self.output.write("%s%s\n" % (METHOD_RECORD, name))
+            key = ((parent + 1) << FRAME_BITS) | method
+            encoded = self.contexts.get(key)
+            if encoded is None:
+                encoded = len(self.contexts)
+                self.contexts[key] = encoded
+                self.output.write("%s%d,%d\n" % (CONTEXT_RECORD, parent, method))
+            parent = encoded
+            path.append(parent)
+        self.last_context = context
+        self.last_names = names
+        return parent
+
+def compact_trace(source, destination):
+    '''
+    Converts a task trace produced in the calling-context profiling mode from CSV into compact format, reading and writing it as a stream.
+    In compact format, each method name and each distinct calling context (including the prefixes of calling contexts) is written once, as a record defining its ID. Task rows are written as in CSV format, except that calling contexts are replaced by their IDs. Each definition precedes the first row using it.
+    The first line of the trace identifies the format, and is followed by the header of the CSV trace. Records are tagged by their first field: 'H' (header), 'M' (method name), 'C' (context: ID of the parent context and of the innermost method), and 'T' (task). A context which was not collected ('null') has ID -1, and an empty context has ID -2.
+    source: the path to the trace in CSV format.
+    destination: the path to the trace in compact format.
+    Returns the number of task rows, of distinct method names, and of distinct contexts.
+    Raises ValueError if a row does not have the expected number of columns.
+    '''
+    tasks = 0
+    with open_trace(source, 'r') as csvfile:
+        with open_trace(destination, 'w') as output:
+            output.write(COMPACT_MAGIC + "\n")
+            #All kinds of contexts share the same definitions
+            frames = FrameTable()
+            contexts = {}
+            encoders = [ContextEncoder(output, frames, contexts) for kind in CONTEXT_KINDS]
+            header = csvfile.readline()
+            if header == "":
+                return 0, 0, 0
+            if len(header.rstrip("\r\n").split(",")) != FIELDS_CC_TASKS:
+                raise ValueError("Wrong calling-context trace format")
+            output.write(HEADER_RECORD + header.rstrip("\r\n") + "\n")
+            for line in csvfile:
+                fields = line.rstrip("\r\n").split(",")
+                if len(fields) != FIELDS_CC_TASKS:
+                    raise ValueError("Wrong calling-context trace format")
+                encoded = [str(encoder.encode(context)) for encoder, context in zip(encoders, fields[3:])]
+                output.write("%s%s,%s,%s,%s\n" % (TASK_RECORD, fields[0], fields[1], fields[2], ",".join(encoded)))
+                tasks += 1
+    return tasks, len(frames.names), len(contexts)
+
+def expand_trace(source, destination):
+    '''
+    Converts a task trace produced in the calling-context profiling mode from compact (see compact_trace) into CSV format, as it was written by tgp.
+    source: the path to the trace in compact format.
+    destination: the path to the trace in CSV format.
+    Returns the number of task rows.
+    Raises ValueError if the source trace is not in compact format.
+    '''
+    tasks = 0
+    with open_trace(source, 'r') as compactfile:
+        if compactfile.readline().rstrip("\r\n") != COMPACT_MAGIC:
+            raise ValueError("Wrong compact calling-context trace format")
+        dictionary = ContextDictionary()
+        with open_trace(destination, 'w') as output:
+            for fields in dictionary.iter_records(compactfile):
+                if isinstance(fields, list):
+                    output.write(",".join(fields[:3] + [dictionary.string(int(context)) for context in fields[3:]]) + "\n")
+                    tasks += 1
+                else:
+                    output.write(fields + "\n")
+    return tasks
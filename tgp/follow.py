@@ -0,0 +1,194 @@
+'''
+Incremental readers of traces which are still being written by a running profiling session (e.g., by CSVDumper with tgp.csvdumper.append, by perf, or by time-cpu.sh), and running per-class totals built from them.
+
+Each reader remembers the offset up to which its trace has been read, and each poll parses only the complete rows appended since the previous one. A last row which is still being written (i.e., not terminated by a newline) is left for the next poll.
+'''
+
+import csv
+import os
+import numpy
+
+from tgp.compression import compression
+from tgp.intervals import IntervalUnion
+from tgp.traces import Categorical, TaskTrace, TASK_COLUMNS, FIELDS_TASKS, CS_COLUMNS, CPU_COLUMNS, KIND_TYPES, TEXT, exact_sum, filter_invalid, invalid_mask, parse_rows, parse_sample_rows
+
+class TraceTail:
+    '''
+    Reads the lines appended to a trace since the previous read.
+    '''
+    def __init__(self, path):
+        self.path = path
+        #The offset of the first byte not read yet
+        self.offset = 0
+        #The number of lines read so far
+        self.line = 0
+
+    def read_lines(self):
+        '''
+        Returns the complete lines appended to the trace since the previous call (all complete lines at the first call), without line terminators.
+        Returns an empty list if the trace does not exist yet.
+        Raises ValueError if the trace is shorter than the part already read, i.e., it has been truncated or replaced, or if it is compressed.
+        '''
+        if compression(self.path) is not None:
+            raise ValueError("Cannot follow a compressed trace: %s" % self.path)
+        try:
+            csvfile = open(self.path, 'rb')
+        except IOError:
+            return []
+        with csvfile:
+            size = os.fstat(csvfile.fileno()).st_size
+            if size < self.offset:
+                raise ValueError("Trace truncated: %s" % self.path)
+            csvfile.seek(self.offset)
+            data = csvfile.read(size - self.offset)
+        #Leaves the last row for the next call, unless it is complete
+        data = data[:data.rfind(b"\n") + 1]
+        self.offset += len(data)
+        if str is not bytes:
+            data = data.decode("utf-8", "surrogateescape")
+        lines = data.split("\n")[:-1]
+        self.line += len(lines)
+        return lines
+
+class TaskTail(TraceTail):
+    '''
+    Parses the rows appended to a task trace, as iter_tasks does. Text columns are interned in the same list of categories across all polls.
+    '''
+    def __init__(self, path, columns):
+        '''
+        path: the path to the task trace.
+        columns: the names of the columns to parse.
+        '''
+        TraceTail.__init__(self, path)
+        self.columns = columns
+        self.categories = dict((name, []) for name, kind in TASK_COLUMNS if kind == TEXT and name in columns)
+        self.lookups = dict((name, {}) for name in self.categories)
+
+    def poll(self):
+        '''
+        Returns a TaskTrace containing the rows appended since the previous poll.
+        The header is skipped, as well as all rows where one of the requested numeric columns does not contain an integer.
+        Raises ValueError if a row does not have the expected number of columns, or if the trace has been truncated.
+        '''
+        first = self.line == 0
+        rows = list(csv.reader(self.read_lines()))
+        if first and len(rows) > 0:
+            header = rows.pop(0)
+            if len(header) != FIELDS_TASKS:
+                raise ValueError("Wrong task trace format")
+        if len(rows) == 0:
+            return self.empty()
+        chunk, invalid = parse_rows(rows, self.columns, self.categories, self.lookups)
+        return filter_invalid(chunk, invalid, invalid_mask(self.columns))
+
+    def empty(self):
+        '''
+        Returns a TaskTrace without rows.
+        '''
+        result = {}
+        for name, kind in TASK_COLUMNS:
+            if name in self.categories:
+                result[name] = Categorical(numpy.zeros(0, dtype=numpy.int32), self.categories[name])
+            elif name in self.columns:
+                result[name] = numpy.zeros(0, dtype=KIND_TYPES[kind])
+        return TaskTrace(result)
+
+class SampleTail(TraceTail):
+    '''
+    Parses the rows appended to a CS or CPU trace, as load_samples does.
+    '''
+    def __init__(self, path, kind):
+        '''
+        path: the path to the trace.
+        kind: the kind of trace, either "cs" or "cpu".
+        '''
+        TraceTail.__init__(self, path)
+        self.columns = {"cs": CS_COLUMNS, "cpu": CPU_COLUMNS}[kind]
+
+    def poll(self):
+        '''
+        Returns a Trace containing the rows appended since the previous poll (see parse_samples). Column 'line' keeps counting the lines from the beginning of the trace.
+        Raises ValueError if a row does not have the expected number of columns, or if the trace has been truncated.
+        '''
+        first_line = self.line
+        return parse_sample_rows(csv.reader(self.read_lines()), self.columns, first_line)
+
+def insert_sorted(array, values):
+    '''
+    Merges new values into a sorted array, sorting only the new values.
+    array: the sorted array.
+    values: the new values, in any order.
+    Returns the sorted array containing both.
+    '''
+    values = numpy.sort(values)
+    return numpy.insert(array, numpy.searchsorted(array, values), values)
+
+class ClassTotals:
+    '''
+    Running totals of the tasks of a class, and of the samples (e.g., context switches or CPU utilization measurements) taken during their execution, updated as tasks and samples are appended to the traces.
+    A sample is counted once for each task of the class whose execution interval [entry, exit] contains its timestamp, no matter whether the task or the sample is read first.
+    '''
+    def __init__(self, kinds):
+        '''
+        kinds: the number of kinds of samples.
+        '''
+        self.count = 0
+        self.min = None
+        self.max = None
+        self.total_gran = 0
+        #The total value and the number of samples of each kind taken during the execution of the tasks
+        self.sample_totals = [0] * kinds
+        self.sample_counts = [0] * kinds
+        #The entry and exit times of the tasks, each sorted independently, and the union of their execution intervals (None once released)
+        self.entries = numpy.zeros(0, dtype=numpy.int64)
+        self.exits = numpy.zeros(0, dtype=numpy.int64)
+        self.union = IntervalUnion([])
+
+    def add_tasks(self, entries, exits, grans, indexes):
+        '''
+        Adds new tasks of the class, counting the samples read so far which were taken during their execution.
+        entries: the entry times of the tasks.
+        exits: the exit times of the tasks.
+        grans: the granularity of the tasks.
+        indexes: a SampleIndex of the samples of each kind read so far.
+        '''
+        if len(grans) == 0:
+            return
+        self.count += len(grans)
+        low = int(grans.min())
+        high = int(grans.max())
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+        self.total_gran += exact_sum(grans)
+        if self.union is not None:
+            for kind, index in enumerate(indexes):
+                for entry_time, exit_time in zip(entries.tolist(), exits.tolist()):
+                    self.sample_totals[kind] += index.total(entry_time, exit_time)
+                    self.sample_counts[kind] += index.count(entry_time, exit_time)
+            #Intervals whose exit precedes their entry cannot contain any sample
+            valid = entries <= exits
+            self.entries = insert_sorted(self.entries, entries[valid])
+            self.exits = insert_sorted(self.exits, exits[valid])
+            self.union.add(zip(entries.tolist(), exits.tolist()))
+
+    def add_samples(self, kind, timestamps, values):
+        '''
+        Counts the new samples of a kind which were taken during the execution of the tasks read so far.
+        timestamps: the timestamps of the samples.
+        values: the values of the samples.
+        '''
+        if len(timestamps) == 0 or len(self.entries) == 0:
+            return
+        timestamps = numpy.asarray(timestamps)
+        #The number of tasks with entry <= timestamp, minus those with exit < timestamp
+        contained = numpy.searchsorted(self.entries, timestamps, side='right') - numpy.searchsorted(self.exits, timestamps, side='left')
+        self.sample_totals[kind] += float(numpy.dot(contained, numpy.asarray(values, dtype=numpy.float64)))
+        self.sample_counts[kind] += int(contained.sum())
+
+    def release(self):
+        '''
+        Releases the execution intervals of the tasks, e.g., once the class can no longer satisfy the conditions of an analysis. From then on, only the number and the granularity of new tasks are counted, while samples are not.
+        '''
+        self.entries = numpy.zeros(0, dtype=numpy.int64)
+        self.exits = numpy.zeros(0, dtype=numpy.int64)
+        self.union = None
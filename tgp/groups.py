@@ -0,0 +1,243 @@
+'''
+Statistics of the diagnosis (see tgp.analysis.diagnose) computed for each group of executed tasks, in a single pass over the traces.
+
+The tasks are grouped by any combination of class, executor class, creation thread class, and execution thread class (see GROUP_KEYS). The interned codes of the key columns are combined into a single group number per task, and the tasks are sorted once by group and granularity, so that the percentiles of each group are read at fixed offsets from the first row of the group, and counts and totals are computed for all groups at once (with bincount and reduceat) instead of rescanning the trace for each group.
+The CS and CPU measurements taken during the execution of the tasks of each group are found with two binary searches per task over the measurements sorted by timestamp. The resulting ranges of measurements are merged per group (so that each measurement is counted once per group, as in diagnose) and summed with prefix sums.
+'''
+
+from __future__ import division
+import csv
+import math
+import numpy
+
+from tgp.analysis import DEFAULT_CENTRAL_GRAN, Z_SCORE, Diagnosis, cpu_utilization
+from tgp.compression import open_trace
+from tgp.histogram import around
+
+#The keys by which tasks can be grouped, associated with their column in the task trace and their name in the output csv file
+GROUP_KEYS = {"class": ("class", "Class"),
+              "executor": ("executor_class", "Executor class"),
+              "creation-thread": ("create_thread_class", "Creation thread class"),
+              "execution-thread": ("exec_thread_class", "Execution thread class")}
+
+#The statistics computed for each group, in the order of the columns of the output csv file
+GROUP_STATISTICS = ["Total number of tasks",
+                    "Average granularity",
+                    "1st percentile - granularity",
+                    "5th percentile - granularity",
+                    "50th percentile (median) - granularity",
+                    "95th percentile - granularity",
+                    "99th percentile - granularity",
+                    "IQC - granularity",
+                    "Lower whiskers range - granularity",
+                    "Upper whiskers range - granularity",
+                    "Percentage of tasks having granularity within whiskers range",
+                    "Central granularity",
+                    "Percentage of tasks with granularity around central granularity",
+                    "Average number of context switches",
+                    "Average CPU utilization",
+                    "STD CPU utilization"]
+
+class GroupDiagnosis:
+    '''
+    The statistics of the diagnosis of each group of tasks.
+    '''
+    def __init__(self, keys, groups):
+        '''
+        keys: the keys by which tasks have been grouped (see GROUP_KEYS).
+        groups: a list of (values, Diagnosis) pairs, where values is the tuple of the values of the keys of the group. Groups are sorted by their values.
+        '''
+        self.keys = keys
+        self.groups = groups
+
+    def report(self):
+        '''
+        Returns a summary of the statistics of each group, one group per line.
+        '''
+        lines = []
+        for values, diagnosis in self.groups:
+            name = ", ".join("%s: %s" % (GROUP_KEYS[key][1], value) for key, value in zip(self.keys, values))
+            lines.append("-> %s \n   Tasks: %s \n   Average granularity: %s \n   Median granularity: %s \n   Average number of context switches: %scs/100ms \n   Average CPU utilization: %s+-%s" % (name, diagnosis.value("Total number of tasks"), diagnosis.value("Average granularity"), diagnosis.value("50th percentile (median) - granularity"), diagnosis.value("Average number of context switches"), diagnosis.value("Average CPU utilization"), diagnosis.value("STD CPU utilization")))
+        return "\n".join(lines)
+
+    def write(self, path):
+        '''
+        Writes the statistics on a csv file, one group per row.
+        '''
+        with open_trace(path, 'w') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow([GROUP_KEYS[key][1] for key in self.keys] + GROUP_STATISTICS)
+            for values, diagnosis in self.groups:
+                writer.writerow(list(values) + [diagnosis.value(name) for name in GROUP_STATISTICS])
+
+def group_numbers(tasks, columns):
+    '''
+    Assigns a number to each distinct combination of the values of the input text columns of a TaskTrace.
+    The codes of the columns are combined one column at a time, and renumbered after each step, so that the combined numbers never exceed the number of tasks times the number of distinct values of a column.
+    Returns the group number of each task, and the index of the first task of each group.
+    '''
+    numbers = numpy.zeros(len(tasks), dtype=numpy.int64)
+    for column in columns:
+        codes = tasks[column].codes.astype(numpy.int64)
+        numbers = numpy.unique(numbers * (len(tasks[column].categories) + 1) + codes, return_inverse=True)[1]
+    distinct, first = numpy.unique(numbers, return_index=True)
+    return numbers, first
+
+def covered_totals(groups, entries, exits, timestamps, values, count):
+    '''
+    Computes, for each group of tasks, the number, the total value, and the total squared value of the samples taken during the execution of at least one task of the group.
+    groups: the group number of each task.
+    entries: the entry execution time of each task.
+    exits: the exit execution time of each task.
+    timestamps: the timestamps of the samples.
+    values: the values of the samples, in the same order as the timestamps.
+    count: the number of groups.
+    Returns three arrays, indexed by group.
+    '''
+    order = numpy.argsort(timestamps, kind='mergesort')
+    timestamps = numpy.asarray(timestamps)[order]
+    values = numpy.asarray(values, dtype=numpy.float64)[order]
+    #Extended precision, so that the difference of two prefix sums is accurate even for a small group in a long trace
+    prefix = numpy.concatenate([[0], numpy.cumsum(values.astype(numpy.longdouble))])
+    squares = numpy.concatenate([[0], numpy.cumsum(values.astype(numpy.longdouble) ** 2)])
+    #The range [low, high) of sorted positions of the samples taken during each task
+    low = numpy.searchsorted(timestamps, entries, side='left')
+    high = numpy.searchsorted(timestamps, exits, side='right')
+    nonempty = low < high
+    low = low[nonempty]
+    high = high[nonempty]
+    groups = groups[nonempty]
+    numbers = numpy.zeros(count, dtype=numpy.int64)
+    totals = numpy.zeros(count)
+    total_squares = numpy.zeros(count)
+    if len(low) == 0:
+        return numbers, totals, total_squares
+    order = numpy.lexsort((low, groups))
+    low = low[order]
+    high = high[order]
+    groups = groups[order]
+    #Shifts the ranges of each group after those of the previous group, so that the running maximum of the ends never crosses groups
+    shift = groups * (len(timestamps) + 1)
+    running = numpy.maximum.accumulate(high + shift)
+    #A range starts a new merged range if it begins after the end of all previous ranges of its group
+    new = numpy.concatenate([[True], low[1:] + shift[1:] > running[:-1]])
+    starts = numpy.flatnonzero(new)
+    merged_low = low[starts]
+    merged_high = numpy.maximum.reduceat(high, starts)
+    merged_groups = groups[starts]
+    numbers = numpy.bincount(merged_groups, weights=merged_high - merged_low, minlength=count).astype(numpy.int64)
+    totals = numpy.bincount(merged_groups, weights=(prefix[merged_high] - prefix[merged_low]).astype(numpy.float64), minlength=count)
+    total_squares = numpy.bincount(merged_groups, weights=(squares[merged_high] - squares[merged_low]).astype(numpy.float64), minlength=count)
+    return numbers, totals, total_squares
+
+def quartiles(grans):
+    '''
+    Returns the first and third quartile of the sorted granularity values of a group, at the same positions as tgp.analysis.Diagnoser.tasks_statistics.
+    '''
+    m_index = int(len(grans)/2)
+    third_q = int((len(grans) - m_index)/2) + m_index
+    first_q = int(m_index/2)
+    return int(grans[first_q]), int(grans[third_q])
+
+def whiskers_range(grans):
+    '''
+    Returns the whiskers range of the sorted granularity values of a group, as tgp.analysis.Diagnoser.tasks_statistics computes it.
+    '''
+    first_q, third_q = quartiles(grans)
+    inter_quartile = third_q - first_q
+    low_w = first_q - 1.5 * inter_quartile
+    if low_w < 0:
+        low_w = 0
+    high_w = third_q + 1.5 * inter_quartile
+    if high_w > int(grans[-1]):
+        high_w = int(grans[-1])
+    return low_w, high_w
+
+def tasks_statistics(grans, central_gran, in_whiskers, in_range, total):
+    '''
+    Computes the statistics related to the tasks of a group, as tgp.analysis.Diagnoser.tasks_statistics does.
+    grans: the sorted granularity values of the group.
+    central_gran: the central granularity.
+    in_whiskers: the number of tasks having granularity within the whiskers range.
+    in_range: the number of tasks with granularity having the same order of magnitude as central_gran.
+    total: the total granularity of the group.
+    Returns a dictionary containing such statistics.
+    '''
+    exec_tasks = len(grans)
+    first_q, third_q = quartiles(grans)
+    low_w, high_w = whiskers_range(grans)
+    res_dict = {}
+    res_dict["Total number of tasks"] = str(exec_tasks)
+    res_dict["Average granularity"] = str(total/exec_tasks)
+    res_dict["1st percentile - granularity"] = str(int(grans[int(exec_tasks*0.01)]))
+    res_dict["5th percentile - granularity"] = str(int(grans[int(exec_tasks*0.05)]))
+    res_dict["50th percentile (median) - granularity"] = str(int(grans[int(exec_tasks/2)]))
+    res_dict["95th percentile - granularity"] = str(int(grans[int(exec_tasks*0.9)]))
+    res_dict["99th percentile - granularity"] = str(int(grans[int(exec_tasks*0.95)]))
+    res_dict["IQC - granularity"] = str(third_q - first_q)
+    res_dict["Lower whiskers range - granularity"] = str(low_w)
+    res_dict["Upper whiskers range - granularity"] = str(high_w)
+    res_dict["Percentage of tasks having granularity within whiskers range"] = str((in_whiskers/exec_tasks)*100)
+    res_dict["Central granularity"] = str(central_gran)
+    res_dict["Percentage of tasks with granularity around central granularity"] = str((in_range/exec_tasks)*100)
+    return res_dict
+
+def group_diagnose(tasks, cs, cpu, keys, central_gran=DEFAULT_CENTRAL_GRAN):
+    '''
+    Computes the statistics of the diagnosis for each group of executed tasks.
+    The statistics of each group are the same as those computed by tgp.analysis.diagnose for the tasks of the group only (e.g., with the class as the only key, the same as diagnose with each class as specific class), except that the CS and CPU averages may differ in the last digits, as measurements are summed in a different order.
+    tasks: the TaskTrace (with the entry, exit, and granularity columns, and the columns of the keys).
+    cs: the CS Trace.
+    cpu: the CPU Trace.
+    keys: the list of keys by which tasks are grouped (see GROUP_KEYS).
+    central_gran: the central granularity.
+    Returns a GroupDiagnosis.
+    '''
+    tasks = tasks.select(tasks.executed())
+    columns = [GROUP_KEYS[key][0] for key in keys]
+    numbers, first = group_numbers(tasks, columns)
+    count = len(first)
+    #Sorts the tasks once by group and granularity
+    order = numpy.lexsort((tasks["granularity"], numbers))
+    grans = tasks["granularity"][order]
+    sorted_numbers = numbers[order]
+    starts = numpy.searchsorted(sorted_numbers, numpy.arange(count))
+    ends = numpy.append(starts[1:], len(grans))
+    #The total granularity of each group, summed as the high and low 32 bits separately, so that it does not overflow
+    totals = []
+    if count > 0:
+        high_totals = numpy.add.reduceat(grans >> 32, starts).tolist()
+        low_totals = numpy.add.reduceat(grans & 0xffffffff, starts).tolist()
+        totals = [(high << 32) + low for high, low in zip(high_totals, low_totals)]
+    #The number of tasks of each group within its whiskers range
+    whiskers = [whiskers_range(grans[start:end]) for start, end in zip(starts.tolist(), ends.tolist())]
+    low_w = numpy.array([low for low, high in whiskers], dtype=numpy.float64)
+    high_w = numpy.array([high for low, high in whiskers], dtype=numpy.float64)
+    in_whiskers = numpy.bincount(sorted_numbers, weights=(grans >= low_w[sorted_numbers]) & (grans <= high_w[sorted_numbers]), minlength=count).astype(numpy.int64)
+    #The number of tasks of each group around the central granularity
+    in_range = numpy.bincount(sorted_numbers, weights=around(grans, central_gran), minlength=count).astype(numpy.int64)
+    #The CS and CPU measurements taken during the execution of the tasks of each group
+    cs_numbers, cs_totals, cs_squares = covered_totals(numbers, tasks["entry"], tasks["exit"], cs["timestamp"], cs["cs"], count)
+    cpu_numbers, cpu_totals, cpu_squares = covered_totals(numbers, tasks["entry"], tasks["exit"], cpu["timestamp"], cpu_utilization(cpu), count)
+    groups = []
+    for group in range(count):
+        tasks_stats = tasks_statistics(grans[starts[group]:ends[group]], central_gran, int(in_whiskers[group]), int(in_range[group]), totals[group])
+        avg_cs = 0
+        if cs_numbers[group] > 0:
+            avg_cs = float(cs_totals[group]) / int(cs_numbers[group])
+        cpus = int(cpu_numbers[group])
+        mean = 0
+        sd = 0
+        interval = 0
+        if cpus > 0:
+            mean = float(cpu_totals[group]) / cpus
+        if cpus > 1:
+            sd = math.sqrt(max(float(cpu_squares[group]) - float(cpu_totals[group]) * mean, 0) / (cpus - 1))
+        if mean != 0 or sd != 0:
+            interval = (Z_SCORE * sd) / math.sqrt(cpus)
+        values = tuple(tasks[column][int(first[group])] for column in columns)
+        specific_class = values[keys.index("class")] if "class" in keys else None
+        diagnosis = Diagnosis(specific_class, tasks_stats, {"Average number of context switches": str(avg_cs)}, {"Average CPU utilization": str(mean), "STD CPU utilization": str(interval)})
+        groups.append((values, diagnosis))
+    groups.sort(key=lambda group: group[0])
+    return GroupDiagnosis(keys, groups)
@@ -0,0 +1,295 @@
+'''
+Log-linear histogram of integer values (e.g., task granularities), used to compute percentiles without keeping all values in memory.
+
+Buckets are log-linear: values smaller than 2^(SUB_BUCKET_BITS + 1) have a bucket each, while larger values are grouped in buckets whose width grows with the magnitude of the values, so that every bucket spans a range of at most 2^-SUB_BUCKET_BITS times its lowest value.
+Every int64 value therefore falls in one of a fixed set of buckets, and is approximated with a relative error of at most 2^-(SUB_BUCKET_BITS + 1).
+Only non-empty buckets are stored, so the histogram of the tasks of a class takes a few kilobytes even if granularity spans from 1 to 10^11. Histograms are merged by adding the counts of their buckets, hence the histograms of each class can be computed once per run (see class_histograms), saved (see save_histograms), and merged across runs (see merge_histograms).
+'''
+
+from __future__ import division
+import math
+import numpy
+
+from tgp.traces import exact_sum
+
+#Number of bits of precision of each bucket
+SUB_BUCKET_BITS = 10
+
+#Number of buckets for each power of two
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+
+#The powers of two representable in int64, used to compute the number of bits of a value
+POWERS_OF_TWO = numpy.array([1 << bits for bits in range(63)], dtype=numpy.int64)
+
+#The number of buckets needed to represent all non-negative int64 values
+BUCKETS = (64 - SUB_BUCKET_BITS) * SUB_BUCKETS
+
+def bucket_index(values, bits=SUB_BUCKET_BITS):
+    '''
+    Returns the bucket of each input value.
+    values: an array of non-negative integers.
+    bits: the number of bits of precision of the buckets.
+    '''
+    values = numpy.asarray(values, dtype=numpy.int64)
+    #The number of bits of each value beyond the bits of precision
+    shift = numpy.maximum(numpy.searchsorted(POWERS_OF_TWO, values, side='right') - (bits + 1), 0)
+    return shift * (1 << bits) + (values >> shift)
+
+def bucket_bounds(index, bits=SUB_BUCKET_BITS):
+    '''
+    Returns the lowest and highest value of a bucket (or of each bucket of an array).
+    '''
+    shift = numpy.maximum(index // (1 << bits) - 1, 0)
+    low = (index - shift * (1 << bits)) << shift
+    return low, low + (1 << shift) - 1
+
+def bucket_keys(values, bits=SUB_BUCKET_BITS):
+    '''
+    Returns the key of the bucket of each input value: the bucket of non-negative values, and -1 minus the bucket of the magnitude of negative values, so that keys are sorted as the values they stand for.
+    '''
+    values = numpy.asarray(values, dtype=numpy.int64)
+    negative = values < 0
+    return numpy.where(negative, -1 - bucket_index(numpy.abs(values), bits), bucket_index(numpy.abs(values), bits))
+
+def key_bounds(keys, bits=SUB_BUCKET_BITS):
+    '''
+    Returns the lowest and highest value of the bucket of each key (see bucket_keys).
+    '''
+    negative = keys < 0
+    low, high = bucket_bounds(numpy.where(negative, -1 - keys, keys), bits)
+    return numpy.where(negative, -high, low), numpy.where(negative, -low, high)
+
+def add_buckets(keys, counts):
+    '''
+    Adds up the counts of the same bucket.
+    keys: the keys of the buckets, in any order and possibly repeated.
+    counts: the count of each key.
+    Returns the sorted distinct keys and their total count.
+    '''
+    order = numpy.argsort(keys, kind='mergesort')
+    keys = keys[order]
+    counts = counts[order]
+    if len(keys) == 0:
+        return keys, counts
+    starts = numpy.flatnonzero(numpy.concatenate([[True], keys[1:] != keys[:-1]]))
+    return keys[starts], numpy.add.reduceat(counts, starts)
+
+def around(values, central, orders=1):
+    '''
+    Returns a boolean array stating which values have the same order of magnitude as 'central', i.e., differ from it by at most 'orders' orders of magnitude (none if central is not positive).
+    The orders of magnitude are computed as math.log(value, 10) does, so that values at the bounds of the range are classified as they are by the scalar computation.
+    '''
+    values = numpy.asarray(values, dtype=numpy.float64)
+    if central <= 0:
+        return numpy.zeros(len(values), dtype=bool)
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        return numpy.abs(math.log(central, 10) - numpy.log(values) / math.log(10)) <= orders
+
+class LogLinearHistogram:
+    '''
+    A log-linear histogram of integer values, holding the sorted keys of its non-empty buckets (see bucket_keys) and their counts. The minimum, maximum, and total of the recorded values are kept exactly.
+    Negative values are recorded by magnitude in a separate set of buckets.
+    '''
+    def __init__(self):
+        self.keys = numpy.zeros(0, dtype=numpy.int64)
+        self.counts = numpy.zeros(0, dtype=numpy.int64)
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def record(self, values):
+        '''
+        Records an array of integer values.
+        '''
+        values = numpy.asarray(values, dtype=numpy.int64)
+        if len(values) == 0:
+            return
+        keys, counts = numpy.unique(bucket_keys(values), return_counts=True)
+        self.keys, self.counts = add_buckets(numpy.concatenate((self.keys, keys)), numpy.concatenate((self.counts, counts.astype(numpy.int64))))
+        self.count += len(values)
+        self.total += exact_sum(values)
+        low = int(values.min())
+        high = int(values.max())
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+
+    def merge(self, other):
+        '''
+        Adds all values recorded by another histogram to this histogram.
+        '''
+        if other.count == 0:
+            return
+        self.keys, self.counts = add_buckets(numpy.concatenate((self.keys, other.keys)), numpy.concatenate((self.counts, other.counts)))
+        self.count += other.count
+        self.total += other.total
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def mean(self):
+        '''
+        Returns the (exact) average of the recorded values (0 if no value has been recorded).
+        '''
+        if self.count == 0:
+            return 0
+        return self.total / self.count
+
+    def buckets(self, bits=SUB_BUCKET_BITS):
+        '''
+        Returns the non-empty buckets in increasing order of value, as a list of (lowest value, highest value, count) triples.
+        bits: the number of bits of precision of the returned buckets, at most SUB_BUCKET_BITS. With fewer bits, the buckets of the histogram are merged into wider buckets (e.g., 2^bits buckets for each power of two), which is useful to plot the distribution.
+        '''
+        keys = self.keys
+        counts = self.counts
+        if bits < SUB_BUCKET_BITS and len(keys) > 0:
+            #Each bucket is contained in the wider bucket of its lowest value (by magnitude)
+            low, high = key_bounds(keys)
+            keys = bucket_keys(numpy.where(keys < 0, high, low), bits)
+            keys, counts = add_buckets(keys, counts)
+        low, high = key_bounds(keys, bits)
+        return list(zip(low.tolist(), high.tolist(), counts.tolist()))
+
+    def middles(self):
+        '''
+        Returns the value standing for each bucket: its middle, bounded by the minimum and maximum recorded values.
+        '''
+        low, high = key_bounds(self.keys)
+        return numpy.minimum(numpy.maximum(low + (high - low) // 2, self.min), self.max)
+
+    def value_at(self, rank):
+        '''
+        Returns (an approximation of) the value which would be at the input position if all recorded values were sorted.
+        The value is the middle of its bucket, bounded by the minimum and maximum recorded values.
+        '''
+        position = int(numpy.searchsorted(numpy.cumsum(self.counts), rank, side='right'))
+        if position >= len(self.keys):
+            return self.max
+        return int(self.middles()[position])
+
+    def count_between(self, low_value, high_value):
+        '''
+        Returns (an approximation of) the number of recorded values within [low_value, high_value].
+        A bucket is counted if its middle value (see value_at) falls within the range.
+        '''
+        if self.count == 0:
+            return 0
+        middles = self.middles()
+        return int(self.counts[(middles >= low_value) & (middles <= high_value)].sum())
+
+    def count_around(self, central, orders=1):
+        '''
+        Returns (an approximation of) the number of recorded values having the same order of magnitude as 'central' (see around).
+        A bucket is counted if its middle value (see value_at) is around 'central'.
+        '''
+        if self.count == 0:
+            return 0
+        return int(self.counts[around(self.middles(), central, orders)].sum())
+
+def class_histograms(tasks):
+    '''
+    Computes the histogram of the granularity of the executed tasks of a TaskTrace (with at least the class, entry, exit, and granularity columns), and of those of each class.
+    The tasks are sorted once by class and granularity, so that the buckets of each class are consecutive runs of equal keys.
+    Returns a dictionary associating each class (None for all tasks) with its LogLinearHistogram.
+    '''
+    tasks = tasks.select(tasks.executed())
+    histograms = {None: LogLinearHistogram()}
+    histograms[None].record(tasks["granularity"])
+    if len(tasks) == 0:
+        return histograms
+    codes = tasks["class"].codes
+    order = numpy.lexsort((tasks["granularity"], codes))
+    grans = tasks["granularity"][order]
+    codes = codes[order]
+    keys = bucket_keys(grans)
+    #The first task of each class, and the first task of each bucket of each class
+    class_starts = numpy.flatnonzero(numpy.concatenate([[True], codes[1:] != codes[:-1]]))
+    class_ends = numpy.append(class_starts[1:], len(grans))
+    bucket_starts = numpy.flatnonzero(numpy.concatenate([[True], (codes[1:] != codes[:-1]) | (keys[1:] != keys[:-1])]))
+    bucket_counts = numpy.diff(numpy.append(bucket_starts, len(grans)))
+    #The buckets of each class
+    bounds = numpy.searchsorted(bucket_starts, numpy.append(class_starts, len(grans)))
+    for position, (start, end) in enumerate(zip(class_starts.tolist(), class_ends.tolist())):
+        histogram = LogLinearHistogram()
+        histogram.keys = keys[bucket_starts[bounds[position]:bounds[position + 1]]]
+        histogram.counts = bucket_counts[bounds[position]:bounds[position + 1]].astype(numpy.int64)
+        histogram.count = end - start
+        histogram.total = exact_sum(grans[start:end])
+        histogram.min = int(grans[start])
+        histogram.max = int(grans[end - 1])
+        histograms[tasks["class"].categories[codes[start]]] = histogram
+    return histograms
+
+def merge_histograms(all_histograms):
+    '''
+    Merges several dictionaries of histograms (e.g., those of several runs), adding up the histograms of the same class.
+    Returns a new dictionary associating each class (None for all tasks) with its LogLinearHistogram.
+    '''
+    merged = {}
+    for histograms in all_histograms:
+        for name, histogram in histograms.items():
+            if name not in merged:
+                merged[name] = LogLinearHistogram()
+            merged[name].merge(histogram)
+    return merged
+
+def histogram_arrays(histograms, prefix=""):
+    '''
+    Returns a dictionary associating the names of the arrays storing a list of histograms in a .npz file (starting with the input prefix) with their content.
+    Only the non-empty buckets are stored.
+    '''
+    #The totals are stored as strings, as they may not fit in an int64
+    arrays = {"counts": numpy.array([histogram.count for histogram in histograms], dtype=numpy.int64),
+              "totals": numpy.array([str(histogram.total) for histogram in histograms], dtype=str),
+              "bounds": numpy.array([[histogram.min if histogram.min is not None else 0, histogram.max if histogram.max is not None else 0] for histogram in histograms], dtype=numpy.int64).reshape(-1, 2),
+              "sizes": numpy.array([len(histogram.keys) for histogram in histograms], dtype=numpy.int64),
+              "keys": numpy.concatenate([histogram.keys for histogram in histograms] + [numpy.zeros(0, dtype=numpy.int64)]),
+              "bucket_counts": numpy.concatenate([histogram.counts for histogram in histograms] + [numpy.zeros(0, dtype=numpy.int64)])}
+    return dict((prefix + name, array) for name, array in arrays.items())
+
+def read_histogram_arrays(content, prefix=""):
+    '''
+    Reads the list of histograms stored in the arrays of a .npz file starting with the input prefix (see histogram_arrays).
+    '''
+    #Each array is read (and decompressed) once
+    keys = content[prefix + "keys"]
+    bucket_counts = content[prefix + "bucket_counts"]
+    counts = content[prefix + "counts"].tolist()
+    totals = content[prefix + "totals"].tolist()
+    bounds = content[prefix + "bounds"].tolist()
+    ends = numpy.cumsum(content[prefix + "sizes"]).tolist()
+    histograms = []
+    for position in range(len(counts)):
+        histogram = LogLinearHistogram()
+        start = ends[position - 1] if position > 0 else 0
+        histogram.keys = keys[start:ends[position]]
+        histogram.counts = bucket_counts[start:ends[position]]
+        histogram.count = counts[position]
+        histogram.total = int(totals[position])
+        if histogram.count > 0:
+            histogram.min, histogram.max = bounds[position]
+        histograms.append(histogram)
+    return histograms
+
+def save_histograms(path, histograms):
+    '''
+    Saves a dictionary of histograms (see class_histograms) into a compressed NumPy .npz file, from which it can be loaded with load_histograms.
+    The histograms of the classes are stored in the 'names', 'counts', 'totals', 'bounds', 'sizes', 'keys', and 'bucket_counts' arrays, and the histogram of all tasks (if any) in the same arrays prefixed by 'total_', so that it cannot be mistaken for a class.
+    '''
+    names = sorted(name for name in histograms if name is not None)
+    arrays = histogram_arrays([histograms[name] for name in names])
+    arrays.update(histogram_arrays([histograms[None]] if None in histograms else [], "total_"))
+    numpy.savez_compressed(path, bits=SUB_BUCKET_BITS, names=numpy.array(names, dtype=str), **arrays)
+
+def load_histograms(path):
+    '''
+    Loads the histograms saved with save_histograms.
+    Returns a dictionary associating each class (None for all tasks) with its LogLinearHistogram.
+    Raises a ValueError if the histograms have been saved with a different precision (see SUB_BUCKET_BITS).
+    '''
+    content = numpy.load(path)
+    if int(content["bits"]) != SUB_BUCKET_BITS:
+        raise ValueError("The histograms in %s have %s bits of precision instead of %s" % (path, str(int(content["bits"])), str(SUB_BUCKET_BITS)))
+    histograms = dict(zip(content["names"].tolist(), read_histogram_arrays(content)))
+    for histogram in read_histogram_arrays(content, "total_"):
+        histograms[None] = histogram
+    return histograms
@@ -0,0 +1,188 @@
+'''
+Index structures used to attribute time-stamped measurements (e.g., context switches and CPU utilization samples) to time intervals (e.g., task executions).
+'''
+
+import bisect
+import numpy
+
+class SampleIndex:
+    '''
+    Holds a set of samples sorted by timestamp, together with the prefix sums of their values.
+    The number and the total value of the samples whose timestamp falls within an interval [entry, exit] are then obtained with two binary searches, instead of scanning all samples.
+    '''
+    def __init__(self, timestamps, values):
+        '''
+        Sorts the samples and computes the prefix sums of their values.
+        timestamps: the timestamps of the samples, in any order.
+        values: the values of the samples, in the same order as the timestamps.
+        '''
+        #The positions of the samples in the input lists, sorted by timestamp
+        self.order = []
+        #The sorted timestamps, and the values in the same order
+        self.timestamps = []
+        self.values = []
+        #The same positions and timestamps as arrays, to look up many intervals at once
+        self.order_array = numpy.zeros(0, dtype=numpy.int64)
+        self.timestamps_array = numpy.zeros(0, dtype=numpy.int64)
+        #prefix[i] is the total value of the first i samples (in timestamp order)
+        self.prefix = [0]
+        self.extend(timestamps, values)
+
+    def extend(self, timestamps, values):
+        '''
+        Adds new samples to the index, as if they had been appended to the input lists of the constructor.
+        Only the sorted samples following the earliest new one are merged with the new samples, and their prefix sums computed again: when samples are added in timestamp order (e.g., as they are appended to a trace being written), they are simply appended.
+        timestamps: the timestamps of the new samples, in any order.
+        values: the values of the new samples, in the same order as the timestamps.
+        '''
+        if len(timestamps) == 0:
+            return
+        first = len(self.order)
+        added = sorted(range(len(timestamps)), key=lambda i: timestamps[i])
+        #The first sorted position whose timestamp follows the earliest new one (samples with the same timestamp are kept in input order)
+        start = bisect.bisect_right(self.timestamps, timestamps[added[0]])
+        if start == first:
+            self.order.extend(first + i for i in added)
+            self.timestamps.extend(timestamps[i] for i in added)
+            self.values.extend(values[i] for i in added)
+        else:
+            #Merges two sorted runs, ties broken by input position as in a stable sort
+            merged = sorted(list(zip(self.timestamps[start:], self.order[start:], self.values[start:])) + [(timestamps[i], first + i, values[i]) for i in added])
+            self.timestamps[start:] = [this_time for this_time, position, value in merged]
+            self.order[start:] = [position for this_time, position, value in merged]
+            self.values[start:] = [value for this_time, position, value in merged]
+        del self.prefix[start + 1:]
+        total = self.prefix[start]
+        for value in self.values[start:]:
+            total += value
+            self.prefix.append(total)
+        if start > 0:
+            self.order_array = numpy.concatenate((self.order_array[:start], numpy.array(self.order[start:], dtype=numpy.int64)))
+            self.timestamps_array = numpy.concatenate((self.timestamps_array[:start], numpy.array(self.timestamps[start:])))
+        else:
+            self.order_array = numpy.array(self.order, dtype=numpy.int64)
+            self.timestamps_array = numpy.array(self.timestamps)
+
+    def bounds(self, entry_time, exit_time):
+        '''
+        Returns the range [low, high) of sorted positions of the samples whose timestamp falls within [entry_time, exit_time].
+        '''
+        low = bisect.bisect_left(self.timestamps, entry_time)
+        high = bisect.bisect_right(self.timestamps, exit_time)
+        if high < low:
+            high = low
+        return low, high
+
+    def count(self, entry_time, exit_time):
+        '''
+        Returns the number of samples whose timestamp falls within [entry_time, exit_time].
+        '''
+        low, high = self.bounds(entry_time, exit_time)
+        return high - low
+
+    def total(self, entry_time, exit_time):
+        '''
+        Returns the total value of the samples whose timestamp falls within [entry_time, exit_time].
+        '''
+        low, high = self.bounds(entry_time, exit_time)
+        return self.prefix[high] - self.prefix[low]
+
+    def coverage(self, entries, exits):
+        '''
+        Computes the difference array of the number of input intervals containing each sample: each interval adds 1 at the first sorted position within it, and subtracts 1 after the last one.
+        The difference arrays of several sets of intervals (e.g., of each chunk of the task trace) can be summed, and passed once to covered_by.
+        entries: the array of the entry times of the intervals.
+        exits: the array of the exit times of the intervals, in the same order as the entry times.
+        Returns an int64 array, with one more element than the number of samples.
+        '''
+        entries = numpy.asarray(entries)
+        exits = numpy.asarray(exits)
+        valid = entries <= exits
+        #Once intervals exiting before their entry are skipped, an interval containing no sample adds and subtracts 1 at the same position, hence entries and exits can be searched separately, and sorted first (searching sorted values is considerably faster)
+        low = numpy.searchsorted(self.timestamps_array, numpy.sort(entries[valid]), side='left')
+        high = numpy.searchsorted(self.timestamps_array, numpy.sort(exits[valid]), side='right')
+        size = len(self.timestamps) + 1
+        return numpy.bincount(low, minlength=size) - numpy.bincount(high, minlength=size)
+
+    def covered_by(self, coverage):
+        '''
+        Checks which samples fall within at least one interval, given the difference array computed by coverage.
+        Returns a boolean array, one for each sample, in the same order as the samples passed to the constructor.
+        '''
+        flags = numpy.zeros(len(self.timestamps), dtype=bool)
+        flags[self.order_array] = numpy.cumsum(coverage[:-1]) > 0
+        return flags
+
+    def covered(self, entries, exits):
+        '''
+        Checks which samples fall within at least one of the input intervals.
+        Each sample is counted once, no matter how many intervals contain it.
+        entries: the array of the entry times of the intervals.
+        exits: the array of the exit times of the intervals, in the same order as the entry times.
+        Returns a boolean array, one for each sample, in the same order as the samples passed to the constructor.
+        '''
+        return self.covered_by(self.coverage(entries, exits))
+
+class IntervalUnion:
+    '''
+    Holds the union of a set of closed intervals [start, end] as a sorted list of non-overlapping intervals.
+    '''
+    def __init__(self, intervals):
+        '''
+        Sorts the input intervals by start time and merges overlapping ones. Intervals whose end precedes their start are discarded, as they cannot contain any timestamp.
+        intervals: an iterable of (start, end) pairs, in any order.
+        '''
+        #The start and end time of each merged interval
+        self.starts = []
+        self.ends = []
+        for start, end in sorted(interval for interval in intervals if interval[0] <= interval[1]):
+            if len(self.ends) > 0 and start <= self.ends[-1]:
+                if end > self.ends[-1]:
+                    self.ends[-1] = end
+            else:
+                self.starts.append(start)
+                self.ends.append(end)
+
+    def add(self, intervals):
+        '''
+        Adds new intervals to the union, merging them with the existing ones.
+        The existing intervals which end before the earliest new one starts are left untouched, and only the following ones are merged again with the new intervals.
+        intervals: an iterable of (start, end) pairs, in any order.
+        '''
+        added = IntervalUnion(intervals)
+        if len(added.starts) == 0:
+            return
+        low = bisect.bisect_left(self.ends, added.starts[0])
+        merged = IntervalUnion(list(zip(self.starts[low:], self.ends[low:])) + list(zip(added.starts, added.ends)))
+        self.starts[low:] = merged.starts
+        self.ends[low:] = merged.ends
+
+    def contains(self, timestamp):
+        '''
+        Returns true if the timestamp falls within one of the intervals, false otherwise.
+        '''
+        position = bisect.bisect_right(self.starts, timestamp) - 1
+        return position >= 0 and timestamp <= self.ends[position]
+
+    def outside(self, timestamps):
+        '''
+        Checks which timestamps fall outside all intervals, walking the sorted timestamps and the sorted intervals in a single merge pass.
+        If the timestamps are not sorted, they are sorted first.
+        timestamps: the timestamps to check.
+        Returns a list of booleans, one for each timestamp, in the same order as the input.
+        '''
+        order = range(len(timestamps))
+        for i in range(1, len(timestamps)):
+            if timestamps[i - 1] > timestamps[i]:
+                order = sorted(order, key=lambda j: timestamps[j])
+                break
+        flags = [True] * len(timestamps)
+        current = 0
+        for i in order:
+            timestamp = timestamps[i]
+            #Skips the intervals which end before the timestamp, as all following timestamps are larger
+            while current < len(self.ends) and self.ends[current] < timestamp:
+                current += 1
+            if current < len(self.ends) and self.starts[current] <= timestamp:
+                flags[i] = False
+        return flags
@@ -0,0 +1,166 @@
+'''
+Instrumentation of the phases of a script (e.g., reading the traces, analyzing them, writing the results), enabled with the --profile option of each script.
+
+For each phase, the profiler measures the wall-clock time, the CPU time (including the processes started and waited for by the script), the number of rows processed per second, and the peak resident set size (RSS).
+On Linux, the peak RSS of the process is reset at the beginning of each phase (through /proc/self/clear_refs), hence it is the peak of the phase itself. Otherwise, it is the peak since the beginning of the script.
+Optionally, the whole script is also profiled with cProfile, and the statistics are dumped in pstats format (e.g., to be read with 'python -m pstats <file>').
+'''
+
+import contextlib
+import cProfile
+import csv
+import os
+import resource
+import sys
+import time
+
+#The columns of the summary file
+SUMMARY_FIELDS = ["Timestamp", "Script", "Arguments", "Phase", "Rows", "Wall time (s)", "CPU time (s)", "Rows per second", "Peak RSS (MB)"]
+
+#The name of the phase standing for the whole script in the report
+TOTAL_PHASE = "total"
+
+def add_options(parser):
+    '''
+    Adds the profiling options to the OptionParser of a script.
+    '''
+    parser.add_option('--profile', dest='profile', action='store_true', default=False, help="report the wall-clock time, the CPU time, the number of rows processed per second, and the peak memory usage (RSS) of each phase of the script on standard error")
+    parser.add_option('--profile-summary', dest='profile_summary', type='string', help="append the measurements of each phase to the given csv file, which can collect the measurements of several runs (implies --profile)", metavar="SUMMARY_FILE")
+    parser.add_option('--profile-stats', dest='profile_stats', type='string', help="profile the script with cProfile, and dump the statistics in pstats format in the given file (implies --profile)", metavar="STATS_FILE")
+
+def cpu_time():
+    '''
+    Returns the CPU time (user and system) spent so far by the process and by the processes it waited for, in seconds.
+    '''
+    total = 0.0
+    for who in [resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN]:
+        usage = resource.getrusage(who)
+        total += usage.ru_utime + usage.ru_stime
+    return total
+
+def reset_peak_rss():
+    '''
+    Resets the peak RSS of the process, if supported (Linux 4.0 or later).
+    Returns true if the peak has been reset, false otherwise.
+    '''
+    try:
+        with open("/proc/self/clear_refs", 'w') as clear_refs:
+            clear_refs.write("5")
+    except (IOError, OSError):
+        return False
+    return True
+
+def peak_rss():
+    '''
+    Returns the peak RSS of the process (since the last reset, if supported), in MB.
+    '''
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024.0
+    except (IOError, OSError):
+        pass
+    #ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+class Phase:
+    '''
+    The measurements of a phase. The number of rows processed by the phase can be set by the script (None if not meaningful).
+    '''
+    def __init__(self, name):
+        self.name = name
+        self.rows = None
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+        self.peak_rss = 0.0
+
+    def rows_per_second(self):
+        '''
+        Returns the number of rows processed per second of wall-clock time, or None if unknown.
+        '''
+        if self.rows is None or self.wall_time <= 0:
+            return None
+        return self.rows / self.wall_time
+
+class Profiler:
+    '''
+    Measures the phases of a script, if profiling is enabled by its options.
+    '''
+    def __init__(self, script, options):
+        '''
+        script: the name of the script.
+        options: the options of the script, parsed by an OptionParser to which add_options has been applied.
+        '''
+        self.script = script
+        self.summary_file = options.profile_summary
+        self.stats_file = options.profile_stats
+        self.enabled = options.profile or self.summary_file is not None or self.stats_file is not None
+        self.phases = []
+        self.start = time.time()
+        self.start_cpu = cpu_time()
+        self.profile = None
+        if self.stats_file is not None:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        '''
+        Measures the statements executed within a 'with' block as a phase, yielding the Phase, whose rows can be set within the block.
+        '''
+        phase = Phase(name)
+        if not self.enabled:
+            yield phase
+            return
+        reset_peak_rss()
+        start = time.time()
+        start_cpu = cpu_time()
+        try:
+            yield phase
+        finally:
+            phase.wall_time = time.time() - start
+            phase.cpu_time = cpu_time() - start_cpu
+            phase.peak_rss = peak_rss()
+            self.phases.append(phase)
+
+    def finish(self):
+        '''
+        Ends profiling: dumps the cProfile statistics, reports the measurements of each phase and of the whole script on standard error, and appends them to the summary file (if requested).
+        '''
+        if not self.enabled:
+            return
+        if self.profile is not None:
+            self.profile.disable()
+            self.profile.dump_stats(self.stats_file)
+        total = Phase(TOTAL_PHASE)
+        total.wall_time = time.time() - self.start
+        total.cpu_time = cpu_time() - self.start_cpu
+        #ru_maxrss is not reset with the peak RSS of the phases
+        total.peak_rss = max([resource.getrusage(who).ru_maxrss / 1024.0 for who in [resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN]] + [phase.peak_rss for phase in self.phases])
+        phases = self.phases + [total]
+        sys.stderr.write("\nPROFILE OF %s:\n" % self.script)
+        for phase in phases:
+            rate = phase.rows_per_second()
+            sys.stderr.write("Phase: %s -> Wall time: %ss -> CPU time: %ss -> Rows: %s -> Rows per second: %s -> Peak RSS: %sMB\n" % (phase.name, str(round(phase.wall_time, 3)), str(round(phase.cpu_time, 3)),
+                             "-" if phase.rows is None else str(phase.rows), "-" if rate is None else str(int(rate)), str(round(phase.peak_rss, 1))))
+        if self.stats_file is not None:
+            sys.stderr.write("cProfile statistics dumped in %s\n" % self.stats_file)
+        sys.stderr.write("\n")
+        if self.summary_file is not None:
+            self.write_summary(phases)
+
+    def write_summary(self, phases):
+        '''
+        Appends the measurements of the phases to the summary file, writing its header if the file is new.
+        '''
+        new = not os.path.isfile(self.summary_file)
+        timestamp = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.start))
+        arguments = " ".join(sys.argv[1:])
+        with open(self.summary_file, 'a') as csvfile:
+            writer = csv.writer(csvfile)
+            if new:
+                writer.writerow(SUMMARY_FIELDS)
+            for phase in phases:
+                rate = phase.rows_per_second()
+                writer.writerow([timestamp, self.script, arguments, phase.name, "" if phase.rows is None else phase.rows, phase.wall_time, phase.cpu_time, "" if rate is None else rate, phase.peak_rss])
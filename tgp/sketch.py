@@ -0,0 +1,198 @@
+'''
+Mergeable quantile sketch (KLL sketch) of integer values (e.g., task granularities).
+
+The sketch keeps a hierarchy of compactors: level h holds values standing for 2^h recorded values each. When a level exceeds its capacity, it is sorted and every other value (starting from a random offset) is promoted to the next level, halving its size.
+Capacities decrease geometrically from the top level (which holds k values) to the bottom one, so the sketch holds O(k log(n / k)) values after recording n values, and two sketches are merged by merging their levels.
+A level receiving many values at once (e.g., a whole chunk of the task trace) is compacted in blocks of about k values, each sorted and halved independently, so that recording n values costs O(n log k) instead of sorting all of them.
+The rank of any value is estimated within +-epsilon * n, where epsilon depends on k only (see rank_error). Minimum, maximum, and total of the recorded values are kept exactly.
+'''
+
+import math
+import numpy
+
+from tgp.histogram import around
+from tgp.traces import exact_sum
+
+#The ratio between the capacities of two adjacent levels
+CAPACITY_RATIO = 2.0 / 3.0
+
+#The minimum capacity of a level
+MIN_CAPACITY = 2
+
+#The minimum value of k
+MIN_K = 8
+
+#The default value of k, corresponding to a rank error of about 1.3%
+DEFAULT_K = 200
+
+#The seed of the random offsets of compactions, fixed so that the same values always produce the same sketch
+SEED = 0
+
+def rank_error(k):
+    '''
+    Returns the normalized rank error of a sketch with parameter k, i.e., the maximum difference between the estimated and the actual rank of a value (divided by the number of values), which holds with a probability of 99%.
+    The formula is the empirical fit of the KLL error bound computed by the Apache DataSketches project.
+    '''
+    return 2.296 / math.pow(k, 0.9723)
+
+def k_for_error(error):
+    '''
+    Returns the smallest parameter k of a sketch whose normalized rank error (see rank_error) is at most the input error.
+    '''
+    return max(int(math.ceil(math.pow(2.296 / error, 1 / 0.9723))), MIN_K)
+
+class QuantileSketch:
+    '''
+    A KLL sketch of integer values.
+    '''
+    def __init__(self, k=DEFAULT_K):
+        self.k = k
+        #The values held by each level, unsorted
+        self.levels = [numpy.zeros(0, dtype=numpy.int64)]
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+        self.random = numpy.random.RandomState(SEED)
+
+    def error(self):
+        '''
+        Returns the normalized rank error of the sketch (see rank_error).
+        '''
+        return rank_error(self.k)
+
+    def capacity(self, level):
+        '''
+        Returns the maximum number of values held by a level.
+        '''
+        return max(int(math.ceil(self.k * math.pow(CAPACITY_RATIO, len(self.levels) - 1 - level))), MIN_CAPACITY)
+
+    def record(self, values):
+        '''
+        Records an array of integer values.
+        '''
+        values = numpy.asarray(values, dtype=numpy.int64)
+        if len(values) == 0:
+            return
+        self.levels[0] = numpy.concatenate((self.levels[0], values))
+        self.count += len(values)
+        self.total += exact_sum(values)
+        low = int(values.min())
+        high = int(values.max())
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+        self.compress()
+
+    def merge(self, other):
+        '''
+        Adds all values recorded by another sketch to this sketch.
+        '''
+        if other.count == 0:
+            return
+        while len(self.levels) < len(other.levels):
+            self.levels.append(numpy.zeros(0, dtype=numpy.int64))
+        for level, values in enumerate(other.levels):
+            self.levels[level] = numpy.concatenate((self.levels[level], values))
+        self.count += other.count
+        self.total += other.total
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        self.compress()
+
+    def compress(self):
+        '''
+        Compacts the levels exceeding their capacity, from the bottom one to the top one.
+        If a level holds an odd number of values, its smallest value is not compacted, so that the total weight of the sketch is always equal to the number of recorded values.
+        '''
+        level = 0
+        while level < len(self.levels):
+            if len(self.levels[level]) > self.capacity(level):
+                promoted, self.levels[level] = self.compact(self.levels[level], self.capacity(level))
+                if level + 1 == len(self.levels):
+                    self.levels.append(promoted)
+                    #A new level lowers the capacity of all levels below it, hence they are checked again
+                    level = 0
+                    continue
+                self.levels[level + 1] = numpy.concatenate((self.levels[level + 1], promoted))
+            level += 1
+
+    def compact(self, values, capacity):
+        '''
+        Compacts the values of a level: the values are sorted and every other value (starting from a random offset) is promoted.
+        If the level holds at least two blocks of about k values, then each block is sorted and compacted independently (with its own random offset), and the remaining values are compacted only if they still exceed the capacity of the level.
+        values: the values held by the level.
+        capacity: the capacity of the level.
+        Returns the promoted values and the values kept at the level.
+        '''
+        size = 2 * int(math.ceil(self.k / 2.0))
+        blocks = len(values) // size
+        if blocks < 2:
+            values = numpy.sort(values)
+            kept = values[:len(values) % 2]
+            values = values[len(values) % 2:]
+            return values[self.random.randint(2)::2], kept
+        sorted_blocks = numpy.sort(values[:blocks * size].reshape(blocks, size), axis=1)
+        offsets = self.random.randint(2, size=blocks).astype(bool)
+        promoted = numpy.where(offsets[:, None], sorted_blocks[:, 1::2], sorted_blocks[:, ::2]).ravel()
+        kept = values[blocks * size:]
+        if len(kept) > capacity:
+            rest, kept = self.compact(kept, capacity)
+            promoted = numpy.concatenate((promoted, rest))
+        return promoted, kept
+
+    def weighted_values(self):
+        '''
+        Returns the values held by the sketch in increasing order, and the cumulative weight of each value (i.e., the estimated number of recorded values smaller than or equal to it).
+        '''
+        values = numpy.concatenate(self.levels)
+        weights = numpy.concatenate([numpy.full(len(level_values), 1 << level, dtype=numpy.int64) for level, level_values in enumerate(self.levels)])
+        order = numpy.argsort(values, kind='mergesort')
+        return values[order], numpy.cumsum(weights[order])
+
+    def value_at(self, rank):
+        '''
+        Returns (an approximation of) the value which would be at the input position if all recorded values were sorted.
+        '''
+        values, cumulative = self.weighted_values()
+        position = int(numpy.searchsorted(cumulative, rank, side='right'))
+        if position >= len(values):
+            return self.max
+        return min(max(int(values[position]), self.min), self.max)
+
+    def count_between(self, low_value, high_value):
+        '''
+        Returns (an approximation of) the number of recorded values within [low_value, high_value].
+        '''
+        values, cumulative = self.weighted_values()
+        cumulative = numpy.append(0, cumulative)
+        return int(cumulative[numpy.searchsorted(values, high_value, side='right')] - cumulative[numpy.searchsorted(values, low_value, side='left')])
+
+    def count_around(self, central, orders=1):
+        '''
+        Returns (an approximation of) the number of recorded values having the same order of magnitude as 'central' (see tgp.histogram.around).
+        '''
+        if self.count == 0:
+            return 0
+        return sum((1 << level) * int(numpy.count_nonzero(around(values, central, orders))) for level, values in enumerate(self.levels))
+
+    def save(self, path):
+        '''
+        Saves the sketch into a NumPy .npz file, from which it can be loaded with load_sketch (e.g., to merge the sketches of several runs).
+        '''
+        #The total is stored as a string, as it may not fit in an int64
+        numpy.savez(path, k=self.k, count=self.count, total=str(self.total), bounds=numpy.array([self.min if self.min is not None else 0, self.max if self.max is not None else 0], dtype=numpy.int64),
+                    sizes=numpy.array([len(level_values) for level_values in self.levels], dtype=numpy.int64), values=numpy.concatenate(self.levels))
+
+def load_sketch(path):
+    '''
+    Loads a sketch saved with QuantileSketch.save.
+    '''
+    content = numpy.load(path)
+    sketch = QuantileSketch(int(content["k"]))
+    sketch.count = int(content["count"])
+    sketch.total = int(content["total"])
+    if sketch.count > 0:
+        sketch.min, sketch.max = [int(value) for value in content["bounds"]]
+    sizes = content["sizes"].tolist()
+    sketch.levels = numpy.split(content["values"], numpy.cumsum(sizes)[:-1].tolist()) if len(sizes) > 0 else [numpy.zeros(0, dtype=numpy.int64)]
+    return sketch
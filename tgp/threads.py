@@ -0,0 +1,145 @@
+'''
+Activity of the threads executing tasks: busy time, idle gaps between consecutive tasks, and load imbalance among the threads of the same executor (or thread class).
+
+The executed tasks are sorted once by execution thread and entry execution time. The execution intervals of each thread are then merged with a single running maximum over all threads (each thread is shifted after the previous one, so that the maximum never crosses threads), hence nested tasks (which run within their outer task on the same thread) are not counted twice. All steps are vectorized, in O(n log n) time for n tasks.
+'''
+
+from __future__ import division
+import math
+import numpy
+
+from tgp.traces import Trace
+
+#The columns of the task trace needed to compute thread activity
+THREAD_COLUMNS = ["exec_thread_id", "exec_thread_class", "exec_thread_name", "executor_id", "executor_class", "entry", "exit", "granularity"]
+
+#The columns of ThreadActivity.threads by which the threads can be grouped to compute load imbalance
+IMBALANCE_KEYS = {"executor": "executor_id", "class": "thread_class"}
+
+#The percentiles of the idle gaps reported by ThreadActivity.gap_percentiles
+GAP_PERCENTILES = [1, 5, 50, 95, 99]
+
+class ThreadActivity:
+    '''
+    The activity of each execution thread, and the idle gaps between the tasks executed by the same thread.
+    '''
+    def __init__(self, threads, gaps):
+        '''
+        threads: a Trace with one row per thread, containing the ID, class, and name of the thread ('thread_id', 'thread_class', and 'thread_name'), the ID and class of the executor of its first task ('executor_id' and 'executor_class'), the number and total granularity of its tasks ('tasks' and 'granularity'), its first entry and last exit execution time ('first_entry' and 'last_exit'), the time during which it executed at least one task ('busy'), the time between its first entry and last exit during which it did not ('idle'), and the number and longest of its idle gaps ('gaps' and 'max_gap').
+        gaps: the duration of all idle gaps, i.e., the time between the end of a task (merged with the tasks overlapping it) and the entry of the next task on the same thread.
+        '''
+        self.threads = threads
+        self.gaps = gaps
+
+    def utilization(self):
+        '''
+        Returns the fraction of time each thread has been busy between its first entry and last exit (1 if it executed tasks of zero duration only).
+        '''
+        lifetime = self.threads["last_exit"] - self.threads["first_entry"]
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            return numpy.where(lifetime > 0, self.threads["busy"] / numpy.maximum(lifetime, 1), 1.0)
+
+    def gap_percentiles(self):
+        '''
+        Returns the percentiles (see GAP_PERCENTILES) of the idle gaps, as a list of (percentile, gap) pairs. Empty if there is no gap.
+        '''
+        if len(self.gaps) == 0:
+            return []
+        gaps = numpy.sort(self.gaps)
+        return [(percentile, int(gaps[int(len(gaps) * percentile / 100)])) for percentile in GAP_PERCENTILES]
+
+    def gap_histogram(self):
+        '''
+        Returns the distribution of the idle gaps in power-of-two buckets, as a list of (lowest gap, highest gap, count) triples for all non-empty buckets, in increasing order.
+        '''
+        if len(self.gaps) == 0:
+            return []
+        buckets = numpy.floor(numpy.log2(self.gaps.astype(numpy.float64))).astype(numpy.int64)
+        counts = numpy.bincount(buckets)
+        return [(1 << bucket, (1 << (bucket + 1)) - 1, int(counts[bucket])) for bucket in numpy.flatnonzero(counts).tolist()]
+
+    def imbalance(self, key="executor"):
+        '''
+        Computes the load imbalance among the threads of each executor (key 'executor') or thread class (key 'class').
+        The imbalance of a group of threads is the ratio between the largest busy time of its threads and their average busy time, minus 1 (0 if all threads have been busy for the same time), i.e., the fraction of time the busiest thread worked beyond the average.
+        Returns a list with one row per group, in order of first appearance, each containing the group, the number of threads, the total, average, minimum, and maximum busy time, the imbalance, and the coefficient of variation of the busy time.
+        '''
+        column = self.threads[IMBALANCE_KEYS[key]]
+        if key == "class":
+            values = column.codes
+        else:
+            values = column
+        rows = []
+        if len(values) == 0:
+            return rows
+        #Groups the threads by key, in order of first appearance
+        distinct, first, inverse = numpy.unique(values, return_index=True, return_inverse=True)
+        busy = self.threads["busy"].astype(numpy.float64)
+        for group in numpy.argsort(first, kind='mergesort').tolist():
+            group_busy = busy[inverse == group]
+            mean = group_busy.mean()
+            imbalance = 0
+            variation = 0
+            if mean > 0:
+                imbalance = group_busy.max() / mean - 1
+                variation = math.sqrt(((group_busy - mean) ** 2).mean()) / mean
+            name = column[int(first[group])]
+            if key != "class":
+                name = int(name)
+            rows.append((name, len(group_busy), int(group_busy.sum()), float(mean), int(group_busy.min()), int(group_busy.max()), float(imbalance), float(variation)))
+        return rows
+
+def thread_activity(tasks):
+    '''
+    Computes the activity of the threads which executed the tasks of a TaskTrace (with at least the columns of THREAD_COLUMNS).
+    Tasks whose exit execution time precedes their entry execution time are skipped.
+    Returns a ThreadActivity.
+    '''
+    tasks = tasks.select(tasks.executed() & (tasks["entry"] <= tasks["exit"]))
+    order = numpy.lexsort((tasks["entry"], tasks["exec_thread_id"]))
+    tasks = tasks.select(order)
+    thread_ids = tasks["exec_thread_id"]
+    entries = tasks["entry"]
+    exits = tasks["exit"]
+    if len(tasks) == 0:
+        empty = numpy.zeros(0, dtype=numpy.int64)
+        threads = dict((name, empty) for name in ["thread_id", "executor_id", "tasks", "granularity", "first_entry", "last_exit", "busy", "idle", "gaps", "max_gap"])
+        for name, column in [("thread_class", "exec_thread_class"), ("thread_name", "exec_thread_name"), ("executor_class", "executor_class")]:
+            threads[name] = tasks[column]
+        return ThreadActivity(Trace(threads), empty)
+    #The first row of each thread, and the thread of each row
+    starts = numpy.flatnonzero(numpy.concatenate([[True], thread_ids[1:] != thread_ids[:-1]]))
+    groups = numpy.cumsum(numpy.concatenate([[True], thread_ids[1:] != thread_ids[:-1]])) - 1
+    first_entries = entries[starts]
+    last_exits = numpy.maximum.reduceat(exits, starts)
+    #Shifts the tasks of each thread after those of the previous thread, so that the running maximum of the exits never crosses threads
+    spans = last_exits - first_entries + 1
+    shifts = (numpy.concatenate([[0], numpy.cumsum(spans)[:-1]]) - first_entries)[groups]
+    running = numpy.maximum.accumulate(exits + shifts)
+    #A task starts a new busy period if it enters after all previous tasks of its thread have exited
+    new = numpy.concatenate([[True], entries[1:] + shifts[1:] > running[:-1]])
+    period_rows = numpy.flatnonzero(new)
+    period_starts = entries[period_rows]
+    period_ends = numpy.maximum.reduceat(exits, period_rows)
+    period_groups = groups[period_rows]
+    busy = numpy.bincount(period_groups, weights=(period_ends - period_starts).astype(numpy.float64), minlength=len(starts)).astype(numpy.int64)
+    #The idle gaps between consecutive busy periods of the same thread
+    same = period_groups[1:] == period_groups[:-1]
+    gaps = (period_starts[1:] - period_ends[:-1])[same]
+    gap_groups = period_groups[1:][same]
+    max_gaps = numpy.zeros(len(starts), dtype=numpy.int64)
+    numpy.maximum.at(max_gaps, gap_groups, gaps)
+    threads = {"thread_id": thread_ids[starts],
+               "thread_class": tasks["exec_thread_class"][starts],
+               "thread_name": tasks["exec_thread_name"][starts],
+               "executor_id": tasks["executor_id"][starts],
+               "executor_class": tasks["executor_class"][starts],
+               "tasks": numpy.diff(numpy.append(starts, len(tasks))),
+               "granularity": numpy.add.reduceat(tasks["granularity"], starts),
+               "first_entry": first_entries,
+               "last_exit": last_exits,
+               "busy": busy,
+               "idle": last_exits - first_entries - busy,
+               "gaps": numpy.bincount(gap_groups, minlength=len(starts)),
+               "max_gap": max_gaps}
+    return ThreadActivity(Trace(threads), gaps)
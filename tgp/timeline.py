@@ -0,0 +1,191 @@
+'''
+Projection of the task, CS, CPU, and GC traces onto a common time grid, i.e., a sequence of consecutive bins of the same width (e.g., 100ms).
+
+The traces are sampled at different rates (e.g., context switches every 100ms, CPU utilization about every 150ms), and describe either instants (CS and CPU measurements) or intervals (task executions and GC cycles). Each trace is projected onto the grid in a single vectorized pass: instants are attributed to the bin containing them, and intervals are split across the bins they overlap. For each bin, the resulting timeline contains:
+- the average number of tasks in execution (i.e., the time spent executing tasks in the bin, divided by its width),
+- the number and the total granularity of the tasks completed in the bin,
+- the average number of context switches and the average user and system CPU utilization measured in the bin (empty if no measurement was taken),
+- the fraction of the bin spent in GC cycles.
+'''
+
+from __future__ import division
+import csv
+import math
+import numpy
+
+from tgp.compression import open_trace
+from tgp.intervals import IntervalUnion
+from tgp.traces import Trace
+
+#The columns of a timeline, and their names in the output csv file
+TIMELINE_COLUMNS = [("start", "Bin start (ns)"),
+                    ("end", "Bin end (ns)"),
+                    ("active_tasks", "Active tasks"),
+                    ("completed_tasks", "Completed tasks"),
+                    ("completed_granularity", "Completed granularity"),
+                    ("cs", "Context switches"),
+                    ("cpu_user", "CPU utilization (user)"),
+                    ("cpu_system", "CPU utilization (system)"),
+                    ("gc_paused", "GC-paused fraction")]
+
+class TimeGrid:
+    '''
+    A sequence of 'bins' consecutive bins of 'width' nanoseconds, the first one starting at 'start'. Each bin contains the timestamps in [start, start + width), except the last one, which also contains its end.
+    '''
+    def __init__(self, start, width, bins):
+        self.start = start
+        self.width = width
+        self.bins = bins
+
+    def end(self):
+        '''
+        Returns the end of the last bin.
+        '''
+        return self.start + self.width * self.bins
+
+    def edges(self):
+        '''
+        Returns the start of each bin, followed by the end of the last bin.
+        '''
+        return self.start + self.width * numpy.arange(self.bins + 1, dtype=numpy.int64)
+
+    def bins_of(self, timestamps):
+        '''
+        Returns the bin containing each timestamp (-1 if the timestamp falls outside the grid).
+        '''
+        timestamps = numpy.asarray(timestamps)
+        positions = numpy.floor((timestamps - self.start) / self.width).astype(numpy.int64)
+        positions[timestamps == self.end()] = self.bins - 1
+        positions[(positions < 0) | (positions >= self.bins)] = -1
+        return positions
+
+    def counts(self, timestamps):
+        '''
+        Returns the number of timestamps falling within each bin.
+        '''
+        positions = self.bins_of(timestamps)
+        return numpy.bincount(positions[positions >= 0], minlength=self.bins)
+
+    def totals(self, timestamps, values):
+        '''
+        Returns the total value of the samples taken within each bin.
+        timestamps: the timestamps of the samples.
+        values: the values of the samples, in the same order as the timestamps.
+        '''
+        positions = self.bins_of(timestamps)
+        inside = positions >= 0
+        return numpy.bincount(positions[inside], weights=numpy.asarray(values, dtype=numpy.float64)[inside], minlength=self.bins).astype(numpy.float64)
+
+    def means(self, timestamps, values):
+        '''
+        Returns the average value of the samples taken within each bin (NaN if no sample was taken).
+        '''
+        counts = self.counts(timestamps)
+        totals = self.totals(timestamps, values)
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            return numpy.where(counts > 0, totals / numpy.maximum(counts, 1), numpy.nan)
+
+    def covered_time(self, starts, ends):
+        '''
+        Returns the time during which each bin overlaps the input intervals, summed over all intervals (hence, overlapping intervals are counted several times).
+        Each interval is clipped to the grid, and split into a partial first bin, a partial last bin, and the bins it covers entirely in between, which are counted with a difference array.
+        starts: the start of each interval.
+        ends: the end of each interval, in the same order as the starts.
+        '''
+        #Offsets from the start of the grid, which are exact even for large timestamps
+        span = self.width * self.bins
+        starts = numpy.clip(numpy.asarray(starts) - self.start, 0, span).astype(numpy.float64)
+        ends = numpy.clip(numpy.asarray(ends) - self.start, 0, span).astype(numpy.float64)
+        valid = starts <= ends
+        starts = starts[valid]
+        ends = ends[valid]
+        first = numpy.minimum((starts // self.width).astype(numpy.int64), self.bins - 1)
+        last = numpy.minimum((ends // self.width).astype(numpy.int64), self.bins - 1)
+        edges = self.width * numpy.arange(self.bins + 1, dtype=numpy.float64)
+        single = first == last
+        covered = numpy.zeros(self.bins)
+        #Intervals contained in a single bin
+        covered += numpy.bincount(first[single], weights=(ends - starts)[single], minlength=self.bins)
+        #Intervals spanning several bins: the end of the first bin and the beginning of the last bin
+        first = first[~single]
+        last = last[~single]
+        covered += numpy.bincount(first, weights=edges[first + 1] - starts[~single], minlength=self.bins)
+        covered += numpy.bincount(last, weights=ends[~single] - edges[last], minlength=self.bins)
+        #The bins in between are covered entirely
+        delta = numpy.bincount(first + 1, minlength=self.bins + 1) - numpy.bincount(last, minlength=self.bins + 1)
+        covered += numpy.cumsum(delta)[:self.bins] * self.width
+        return covered
+
+def spanning_grid(width, tasks=None, cs=None, cpu=None, gc=None):
+    '''
+    Returns the TimeGrid of bins of the input width spanning all timestamps of the input traces (from the earliest to the latest one).
+    width: the width of the bins, in nanoseconds.
+    tasks: the TaskTrace (only executed tasks are considered), or None.
+    cs: the CS Trace, or None.
+    cpu: the CPU Trace, or None.
+    gc: the GC Trace, or None.
+    '''
+    bounds = []
+    if tasks is not None:
+        executed = tasks.select(tasks.executed())
+        bounds.extend([executed["entry"], executed["exit"]])
+    if cs is not None:
+        bounds.append(cs["timestamp"])
+    if cpu is not None:
+        bounds.append(cpu["timestamp"])
+    if gc is not None:
+        bounds.extend([gc["start"], gc["end"]])
+    bounds = [values for values in bounds if len(values) > 0]
+    if len(bounds) == 0:
+        return TimeGrid(0, width, 1)
+    start = int(math.floor(min(values.min() for values in bounds)))
+    end = int(math.ceil(max(values.max() for values in bounds)))
+    return TimeGrid(start, width, (end - start) // width + 1)
+
+def resample(grid, tasks=None, cs=None, cpu=None, gc=None):
+    '''
+    Projects the input traces onto the TimeGrid.
+    tasks: the TaskTrace (with at least the entry, exit, and granularity columns), or None. Only executed tasks are considered. Nested tasks are counted together with their outer tasks, unless the task trace has been aggregated.
+    cs: the CS Trace, or None.
+    cpu: the CPU Trace, or None.
+    gc: the GC Trace, or None.
+    Returns a Trace with one row per bin, containing the columns of TIMELINE_COLUMNS related to the input traces.
+    '''
+    edges = grid.edges()
+    columns = {"start": edges[:-1], "end": edges[1:]}
+    if tasks is not None:
+        tasks = tasks.select(tasks.executed())
+        columns["active_tasks"] = grid.covered_time(tasks["entry"], tasks["exit"]) / grid.width
+        columns["completed_tasks"] = grid.counts(tasks["exit"])
+        columns["completed_granularity"] = grid.totals(tasks["exit"], tasks["granularity"])
+    if cs is not None:
+        columns["cs"] = grid.means(cs["timestamp"], cs["cs"])
+    if cpu is not None:
+        columns["cpu_user"] = grid.means(cpu["timestamp"], cpu["user"])
+        columns["cpu_system"] = grid.means(cpu["timestamp"], cpu["system"])
+    if gc is not None:
+        #GC cycles are merged first, so that overlapping cycles are not counted twice
+        cycles = IntervalUnion(zip(gc["start"].tolist(), gc["end"].tolist()))
+        columns["gc_paused"] = grid.covered_time(cycles.starts, cycles.ends) / grid.width
+    return Trace(columns)
+
+def format_value(value):
+    '''
+    Formats a value of a timeline for a csv file: NaN (no measurement) is written as an empty field, and integral floats as integers.
+    '''
+    if isinstance(value, float) and math.isnan(value):
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+def write_timeline(timeline, path):
+    '''
+    Writes a timeline on a csv file, one bin per row.
+    '''
+    names = [(name, header) for name, header in TIMELINE_COLUMNS if name in timeline]
+    with open_trace(path, 'w') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow([header for name, header in names])
+        for row in zip(*[timeline[name].tolist() for name, header in names]):
+            writer.writerow([format_value(value) for value in row])
@@ -0,0 +1,660 @@
+'''
+Columnar loaders for the traces produced by tgp in the bytecode profiling or reference-cycles profiling mode.
+
+Each column of a trace is stored in a single typed NumPy array instead of one Python object per row:
+  - IDs, execution numbers, timestamps and granularity are stored as int64
+  - class and thread names are interned, i.e., stored as int32 codes into a list of distinct names (see Categorical)
+  - the 'Is ...' flags are stored as booleans
+  - CS and CPU measurements are stored as float64
+Only the columns of the task trace requested by the caller are parsed.
+Loaders can optionally keep a binary cache of the parsed trace next to it (see tgp.cache), which is used instead of the trace on later runs.
+Compressed traces (e.g., 'tasks.csv.gz') are decompressed on the fly while they are parsed (see tgp.compression).
+'''
+
+import csv
+import gc
+import itertools
+import multiprocessing
+import numbers
+import os
+import re
+import warnings
+import numpy
+
+from tgp import cache as trace_cache
+from tgp.compression import compression, open_trace
+
+#Number of columns in the task trace
+FIELDS_TASKS = 22
+
+#Kinds of columns
+NUMBER = "number"
+DECIMAL = "decimal"
+TEXT = "text"
+FLAG = "flag"
+
+#The NumPy type of each kind of column
+KIND_TYPES = {NUMBER: numpy.int64, DECIMAL: numpy.float64, TEXT: numpy.int32, FLAG: bool}
+
+#The name and the kind of each column of the task trace, in trace order
+TASK_COLUMNS = [("id", NUMBER),
+                ("class", TEXT),
+                ("outer_id", NUMBER),
+                ("exec_n", NUMBER),
+                ("create_thread_id", NUMBER),
+                ("create_thread_class", TEXT),
+                ("create_thread_name", TEXT),
+                ("exec_thread_id", NUMBER),
+                ("exec_thread_class", TEXT),
+                ("exec_thread_name", TEXT),
+                ("executor_id", NUMBER),
+                ("executor_class", TEXT),
+                ("entry", NUMBER),
+                ("exit", NUMBER),
+                ("granularity", NUMBER),
+                ("is_thread", FLAG),
+                ("is_runnable", FLAG),
+                ("is_callable", FLAG),
+                ("is_forkjointask", FLAG),
+                ("is_run_executed", FLAG),
+                ("is_call_executed", FLAG),
+                ("is_exec_executed", FLAG)]
+
+#The names of all columns of the task trace
+TASK_COLUMN_NAMES = [name for name, kind in TASK_COLUMNS]
+
+#The name and the kind of each column of the CS, CPU, and GC traces
+CS_COLUMNS = [("timestamp", DECIMAL), ("cs", DECIMAL)]
+CPU_COLUMNS = [("timestamp", NUMBER), ("user", DECIMAL), ("system", DECIMAL)]
+GC_COLUMNS = [("start", NUMBER), ("end", NUMBER)]
+
+#The number of rows parsed before being converted into arrays
+CHUNK_SIZE = 65536
+
+#When the task trace is parsed by several processes, the number of byte ranges assigned to each process, and the maximum size of a range (in bytes)
+RANGES_PER_PROCESS = 4
+MAX_RANGE_SIZE = 32 * 1024 * 1024
+
+#A numeric field of the task trace: an integer, optionally signed and surrounded by spaces, as accepted by long()
+INTEGER = re.compile(r"\s*[+-]?\d+\s*\Z")
+#The characters which may appear in a comma-separated list of numeric fields
+INTEGER_CHARACTERS = numpy.zeros(256, dtype=bool)
+INTEGER_CHARACTERS[bytearray(b"0123456789+-, \t")] = True
+#The range of int64 values
+INT64_MIN = -(1 << 63)
+INT64_MAX = (1 << 63) - 1
+
+class Categorical:
+    '''
+    A column of interned strings: each value is stored as the index (code) of the string in a list of distinct strings (categories).
+    '''
+    def __init__(self, codes, categories):
+        self.codes = codes
+        self.categories = categories
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, rows):
+        '''
+        Returns the string at the given row, or a new Categorical restricted to the given rows (index array or boolean mask).
+        '''
+        if isinstance(rows, numbers.Integral):
+            return self.categories[self.codes[rows]]
+        return Categorical(self.codes[rows], self.categories)
+
+    def code(self, value):
+        '''
+        Returns the code of the input string, or -1 if the string never appears in the column.
+        '''
+        try:
+            return self.categories.index(value)
+        except ValueError:
+            return -1
+
+    def equals(self, value):
+        '''
+        Returns a boolean array stating which rows are equal to the input string.
+        '''
+        return self.codes == self.code(value)
+
+    def strings(self):
+        '''
+        Returns an object array containing the string of each row.
+        '''
+        return numpy.array(self.categories, dtype=object)[self.codes]
+
+class Trace:
+    '''
+    The content of a trace, as a dictionary associating the name of each loaded column with its values.
+    Numeric and flag columns are NumPy arrays, text columns are Categorical instances.
+    '''
+    def __init__(self, columns):
+        self.columns = columns
+
+    def __len__(self):
+        for name in self.columns:
+            return len(self.columns[name])
+        return 0
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def select(self, rows):
+        '''
+        Returns a new trace of the same type containing only the given rows (index array or boolean mask) of all columns.
+        '''
+        return self.__class__(dict((name, column[rows]) for name, column in self.columns.items()))
+
+class TaskTrace(Trace):
+    '''
+    The content of a task trace.
+    '''
+    def executed(self):
+        '''
+        Returns a boolean array stating which tasks have been executed, i.e., have non-negative entry and exit execution times.
+        '''
+        return (self.columns["entry"] >= 0) & (self.columns["exit"] >= 0)
+
+    def group_by(self, name):
+        '''
+        Groups the rows by the value of a text column.
+        Returns a list of (value, row indices) pairs, where values are sorted by their first appearance in the trace and row indices are in trace order.
+        '''
+        codes = self.columns[name].codes
+        categories = self.columns[name].categories
+        if len(codes) == 0:
+            return []
+        order = numpy.argsort(codes, kind='mergesort')
+        sorted_codes = codes[order]
+        bounds = numpy.flatnonzero(sorted_codes[1:] != sorted_codes[:-1]) + 1
+        groups = numpy.split(order, bounds)
+        groups.sort(key=lambda rows: rows[0])
+        return [(categories[codes[rows[0]]], rows) for rows in groups]
+
+def exact_sum(values):
+    '''
+    Sums an int64 array without overflowing, returning a Python integer.
+    The array is summed in blocks small enough not to overflow int64, and the partial sums are added as Python integers.
+    '''
+    total = 0
+    for start in range(0, len(values), CHUNK_SIZE):
+        total += int(values[start:start + CHUNK_SIZE].sum())
+    return total
+
+def invalid_mask(columns):
+    '''
+    Returns the bit mask selecting the numeric columns (among the input ones) in the invalid bits of a row.
+    '''
+    mask = 0
+    for index, (name, kind) in enumerate(TASK_COLUMNS):
+        if kind == NUMBER and name in columns:
+            mask |= 1 << index
+    return mask
+
+def iter_tasks(path, columns=None, chunk_size=CHUNK_SIZE, cache=False, processes=1):
+    '''
+    Reads the task trace in chunks, parsing only the requested columns.
+    The header is skipped, as well as all rows where one of the requested numeric columns does not contain an integer.
+    Text columns are interned in the same list of categories across all chunks.
+    path: the path to the task trace.
+    columns: the names of the columns to parse (all columns if None).
+    chunk_size: the maximum number of rows of each chunk (None to read the whole trace as a single chunk).
+    cache: whether to use the cache of the trace. If the cache is outdated or missing, the requested columns are parsed and the cache is written. If the cache lacks some of the requested columns, only these columns are parsed and they are added to the cache.
+    processes: the number of processes parsing the trace (0 to use all CPUs). If greater than 1, the trace is split into byte ranges which are parsed in parallel, and each range is yielded as a single chunk. Compressed traces are always parsed by a single process, as they cannot be split.
+    Yields a TaskTrace for each chunk, in trace order.
+    Raises ValueError if a row does not have the expected number of columns.
+    '''
+    if columns is None:
+        columns = TASK_COLUMN_NAMES
+    mask = invalid_mask(columns)
+    if processes == 0:
+        processes = multiprocessing.cpu_count()
+    if compression(path) is not None:
+        processes = 1
+    if processes > 1:
+        parse = lambda parsed_columns, categories: iter_ranges(path, parsed_columns, processes, categories)
+    else:
+        parse = lambda parsed_columns, categories: iter_parsed(path, parsed_columns, chunk_size, categories)
+    if cache:
+        cached = trace_cache.open_cache(path, "tasks")
+        if cached is not None and all(name in cached.arrays for name in columns):
+            for chunk in iter_cached(cached, columns, chunk_size):
+                yield chunk
+            return
+        #Only the columns missing from the cache are parsed, and the cache is rewritten with them (the cached columns are not written again)
+        missing = [name for name in columns if cached is None or name not in cached.arrays]
+        writer = trace_cache.CacheWriter(path, "tasks", dict((name, KIND_TYPES[kind]) for name, kind in TASK_COLUMNS + [("invalid", NUMBER)] if name in missing or name == "invalid"), cached)
+        categories = {}
+        start = 0
+        try:
+            for chunk, invalid in parse(missing, categories):
+                arrays = dict((name, column.codes if isinstance(column, Categorical) else column) for name, column in chunk.columns.items())
+                if cached is not None:
+                    #The invalid bits of the cached columns are kept
+                    invalid = invalid | cached.arrays["invalid"][start:start + len(invalid)]
+                    chunk.columns.update(cached_columns(cached, [name for name in columns if name not in missing], start, start + len(invalid)))
+                arrays["invalid"] = invalid
+                writer.append(arrays)
+                start += len(invalid)
+                yield filter_invalid(chunk, invalid, mask)
+        except:
+            writer.abort()
+            raise
+        writer.commit(categories)
+    else:
+        for chunk, invalid in parse(columns, {}):
+            yield filter_invalid(chunk, invalid, mask)
+
+def iter_cached(cached, columns, chunk_size):
+    '''
+    Reads the task trace from its cache in chunks, without copying the rows unless some of them must be skipped.
+    '''
+    mask = invalid_mask(columns)
+    if chunk_size is None:
+        chunk_size = max(cached.rows, 1)
+    for start in range(0, cached.rows, chunk_size):
+        yield filter_invalid(TaskTrace(cached_columns(cached, columns, start, start + chunk_size)), cached.arrays["invalid"][start:start + chunk_size], mask)
+
+def cached_columns(cached, columns, start, stop):
+    '''
+    Returns a dictionary associating the name of each input column with its cached rows from start to stop (excluded), without copying them.
+    '''
+    chunk = {}
+    for name in columns:
+        values = cached.arrays[name][start:stop]
+        if name in cached.categories:
+            values = Categorical(values, cached.categories[name])
+        chunk[name] = values
+    return chunk
+
+def filter_invalid(chunk, invalid, mask):
+    '''
+    Removes from the chunk the rows where one of the numeric columns selected by the mask does not contain an integer.
+    invalid: the invalid bits of each row of the chunk.
+    '''
+    skipped = (invalid & mask) != 0
+    if skipped.any():
+        return chunk.select(~skipped)
+    return chunk
+
+def iter_parsed(path, columns, chunk_size, categories):
+    '''
+    Parses the task trace in chunks.
+    path: the path to the task trace.
+    columns: the names of the columns to parse.
+    chunk_size: the maximum number of rows of each chunk (None to parse the whole trace as a single chunk).
+    categories: a dictionary which is filled with the categories of each text column.
+    Yields, for each chunk, a TaskTrace containing all rows and an array containing the invalid bits of each row, where the i-th bit is set if the i-th column does not contain an integer.
+    Raises ValueError if a row does not have the expected number of columns.
+    '''
+    with open_trace(path) as csvfile:
+        csvreader = csv.reader(csvfile)
+        header = next(csvreader, None)
+        if header is not None and len(header) != FIELDS_TASKS:
+            raise ValueError("Wrong task trace format")
+        for chunk in parse_chunks(csvreader, columns, chunk_size, categories):
+            yield chunk
+
+def parse_chunks(csvreader, columns, chunk_size, categories):
+    '''
+    Parses the rows returned by a csv reader in chunks (see iter_parsed).
+    '''
+    for name, kind in TASK_COLUMNS:
+        if kind == TEXT and name in columns:
+            categories[name] = []
+    #The dictionaries associating each category with its code
+    lookups = dict((name, {}) for name in categories)
+    while True:
+        #The cyclic garbage collector is not needed while parsing, and would repeatedly scan all rows of the chunk
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            rows = list(itertools.islice(csvreader, chunk_size))
+            if len(rows) > 0:
+                chunk = parse_rows(rows, columns, categories, lookups)
+        finally:
+            if gc_enabled:
+                gc.enable()
+        if len(rows) == 0:
+            return
+        yield chunk
+
+def split_ranges(path, count):
+    '''
+    Splits the rows of the task trace (excluding the header) into byte ranges of similar size, each starting at the beginning of a row.
+    Rows are assumed not to contain newlines, as in the traces produced by tgp.
+    path: the path to the task trace.
+    count: the number of ranges.
+    Returns a list of (start, end) pairs, where start is the offset of the first byte of the range and end the offset of the first byte after it.
+    '''
+    with open(path, 'rb') as csvfile:
+        csvfile.readline()
+        first = csvfile.tell()
+        size = os.fstat(csvfile.fileno()).st_size
+        bounds = [first]
+        for i in range(1, count):
+            offset = first + (size - first) * i // count
+            if offset <= bounds[-1]:
+                continue
+            #Moves to the beginning of the row containing the offset, unless the offset is already the beginning of a row
+            csvfile.seek(offset - 1)
+            csvfile.readline()
+            position = csvfile.tell()
+            if bounds[-1] < position < size:
+                bounds.append(position)
+        bounds.append(max(size, first))
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def parse_range(task):
+    '''
+    Parses the rows of the task trace within a byte range. This function is executed by the worker processes of iter_ranges.
+    task: a (path, start, end, columns) tuple, where start and end are the bounds of the range (see split_ranges), and columns the names of the columns to parse.
+    Returns a dictionary associating the name of each parsed column with its values (the codes, for text columns), the invalid bits of each row, and the categories of the text columns found in the range.
+    '''
+    path, start, end, columns = task
+    with open(path, 'rb') as csvfile:
+        csvfile.seek(start)
+        data = csvfile.read(end - start)
+    if str is not bytes:
+        data = data.decode("utf-8", "surrogateescape")
+    lines = data.split("\n")
+    if len(lines) > 0 and len(lines[-1]) == 0:
+        lines.pop()
+    categories = {}
+    chunks = []
+    invalid = []
+    for chunk, chunk_invalid in parse_chunks(csv.reader(lines), columns, CHUNK_SIZE, categories):
+        chunks.append(chunk)
+        invalid.append(chunk_invalid)
+    trace = concatenate(chunks, [(name, kind) for name, kind in TASK_COLUMNS if name in columns])
+    arrays = dict((name, column.codes if isinstance(column, Categorical) else column) for name, column in trace.columns.items())
+    return arrays, numpy.concatenate(invalid + [numpy.zeros(0, dtype=numpy.int64)]), categories
+
+def iter_ranges(path, columns, processes, categories):
+    '''
+    Parses the task trace in a pool of processes, each parsing a byte range at a time (see split_ranges).
+    The results are merged in trace order: the categories of each range are appended to the categories of the whole trace, so that codes are assigned in order of first appearance as when the trace is parsed by a single process.
+    path: the path to the task trace.
+    columns: the names of the columns to parse.
+    processes: the number of processes.
+    categories: a dictionary which is filled with the categories of each text column.
+    Yields, for each range, a TaskTrace containing all rows and an array containing the invalid bits of each row (see iter_parsed).
+    Raises ValueError if a row does not have the expected number of columns.
+    '''
+    with open(path) as csvfile:
+        header = next(csv.reader(csvfile), None)
+        if header is not None and len(header) != FIELDS_TASKS:
+            raise ValueError("Wrong task trace format")
+    for name, kind in TASK_COLUMNS:
+        if kind == TEXT and name in columns:
+            categories[name] = []
+    lookups = dict((name, {}) for name in categories)
+    count = max(processes * RANGES_PER_PROCESS, os.path.getsize(path) // MAX_RANGE_SIZE + 1)
+    tasks = [(path, start, end, columns) for start, end in split_ranges(path, count)]
+    pool = multiprocessing.Pool(processes)
+    try:
+        for arrays, invalid, range_categories in pool.imap(parse_range, tasks):
+            chunk = {}
+            for name in columns:
+                if name in categories:
+                    #Maps the codes of the range to the codes of the whole trace
+                    lookup = lookups[name]
+                    for value in range_categories[name]:
+                        if value not in lookup:
+                            lookup[value] = len(categories[name])
+                            categories[name].append(value)
+                    mapping = numpy.array([lookup[value] for value in range_categories[name]] + [0], dtype=numpy.int32)
+                    chunk[name] = Categorical(mapping[arrays[name]], categories[name])
+                else:
+                    chunk[name] = arrays[name]
+            yield TaskTrace(chunk), invalid
+    finally:
+        pool.terminate()
+        pool.join()
+
+def parse_rows(rows, columns, categories, lookups):
+    '''
+    Converts a list of rows of the task trace into a TaskTrace, one column at a time.
+    rows: the rows to convert, as lists of strings.
+    columns: the names of the columns to convert.
+    categories: a dictionary associating the name of each text column with its list of categories, which is extended with the new strings found in the rows.
+    lookups: a dictionary associating the name of each text column with a dictionary associating each category with its code, which is extended as well.
+    Returns the TaskTrace and an array containing the invalid bits of each row. Numeric fields which do not contain an integer are set to 0.
+    Raises ValueError if a row does not have the expected number of columns.
+    '''
+    if len(set(map(len, rows))) > 1 or len(rows[0]) != FIELDS_TASKS:
+        raise ValueError("Wrong task trace format")
+    invalid = numpy.zeros(len(rows), dtype=numpy.int64)
+    result = {}
+    for name in columns:
+        index = TASK_COLUMN_NAMES.index(name)
+        kind = TASK_COLUMNS[index][1]
+        values = [row[index] for row in rows]
+        if kind == NUMBER:
+            try:
+                result[name] = to_int64(values)
+            except ValueError:
+                result[name], valid = parse_integers(values)
+                invalid[~valid] |= 1 << index
+        elif kind == TEXT:
+            lookup = lookups[name]
+            missing = set(values).difference(lookup)
+            for value in values:
+                if len(missing) == 0:
+                    break
+                if value in missing:
+                    lookup[value] = len(categories[name])
+                    categories[name].append(value)
+                    missing.discard(value)
+            result[name] = Categorical(numpy.array([lookup[value] for value in values], dtype=numpy.int32), categories[name])
+        else:
+            result[name] = numpy.array([value != "F" for value in values], dtype=bool)
+    return TaskTrace(result), invalid
+
+def to_int64(values):
+    '''
+    Converts a list of strings into an int64 array, letting NumPy parse all of them at once.
+    NumPy does not fail on malformed integers (e.g., '12abc' is parsed as 12 and '-' as 0) and saturates the integers which do not fit in an int64. Hence, the strings are first checked to be integers all at once, and the saturated values are checked one at a time.
+    Raises ValueError if one of the strings is not an integer or does not fit in an int64.
+    '''
+    joined = ",".join(values)
+    if not is_integer_list(joined, len(values)):
+        raise ValueError("Not an integer")
+    array = numpy.fromstring(joined, dtype=numpy.int64, sep=",")
+    if len(array) != len(values):
+        raise ValueError("Not an integer")
+    for i in numpy.flatnonzero((array == INT64_MIN) | (array == INT64_MAX)).tolist():
+        to_integer(values[i])
+    return array
+
+def is_integer_list(joined, count):
+    '''
+    Checks whether a string is a comma-separated list of integers, as accepted by to_integer, working on all its characters at once.
+    joined: the string to check.
+    count: the number of integers which the string should contain.
+    Returns True if it is the case, False otherwise.
+    '''
+    try:
+        characters = numpy.frombuffer(joined if isinstance(joined, bytes) else joined.encode("ascii"), dtype=numpy.uint8)
+    except UnicodeError:
+        return False
+    if not INTEGER_CHARACTERS[characters].all():
+        return False
+    digits = (characters >= ord("0")) & (characters <= ord("9"))
+    #Each sign must be directly followed by a digit
+    signs = (characters == ord("+")) | (characters == ord("-"))
+    if (signs[:-1] & ~digits[1:]).any() or (len(signs) > 0 and signs[-1]):
+        return False
+    #Each field must contain exactly one run of digits (hence, at most one sign, which precedes it), i.e., runs of digits and commas must alternate
+    starts = digits.copy()
+    starts[1:] &= ~digits[:-1]
+    starts = numpy.flatnonzero(starts)
+    commas = numpy.flatnonzero(characters == ord(","))
+    if len(starts) != count or len(commas) != count - 1:
+        return False
+    return bool((starts[:-1] < commas).all() and (commas < starts[1:]).all())
+
+def to_integer(value):
+    '''
+    Converts a string into an integer.
+    Raises ValueError if the string is not an integer or does not fit in an int64.
+    '''
+    if INTEGER.match(value) is None:
+        raise ValueError("Not an integer")
+    integer = int(value)
+    if not INT64_MIN <= integer <= INT64_MAX:
+        raise ValueError("Integer out of the int64 range")
+    return integer
+
+def parse_integers(values):
+    '''
+    Converts a list of strings into an int64 array one string at a time, setting to 0 the strings which are not integers or do not fit in an int64.
+    Returns the array and a boolean array stating which strings are integers.
+    '''
+    array = numpy.zeros(len(values), dtype=numpy.int64)
+    valid = numpy.zeros(len(values), dtype=bool)
+    for i, value in enumerate(values):
+        try:
+            array[i] = to_integer(value)
+            valid[i] = True
+        except ValueError:
+            pass
+    return array, valid
+
+def concatenate(chunks, columns, trace_class=TaskTrace):
+    '''
+    Concatenates trace chunks sharing the same categories into a single trace.
+    A single chunk is returned as is, without copying it.
+    '''
+    if len(chunks) == 1:
+        return chunks[0]
+    result = {}
+    for name, kind in columns:
+        if kind == TEXT:
+            categories = chunks[0][name].categories if len(chunks) > 0 else []
+            result[name] = Categorical(numpy.concatenate([chunk[name].codes for chunk in chunks] + [numpy.zeros(0, dtype=numpy.int32)]), categories)
+        else:
+            result[name] = numpy.concatenate([chunk[name] for chunk in chunks] + [numpy.zeros(0, dtype=KIND_TYPES[kind])])
+    return trace_class(result)
+
+def load_tasks(path, columns=None, cache=False, processes=1):
+    '''
+    Loads the task trace, parsing only the requested columns.
+    path: the path to the task trace.
+    columns: the names of the columns to parse (all columns if None).
+    cache: whether to use the cache of the trace (see iter_tasks).
+    processes: the number of processes parsing the trace (see iter_tasks).
+    Returns a TaskTrace.
+    Raises ValueError if a row does not have the expected number of columns.
+    '''
+    if columns is None:
+        columns = TASK_COLUMN_NAMES
+    chunk_size = None if cache else CHUNK_SIZE
+    return concatenate(list(iter_tasks(path, columns, chunk_size, cache, processes)), [(name, kind) for name, kind in TASK_COLUMNS if name in columns])
+
+def contains_letters(string):
+    '''
+    Checks whether the input string contains letters.
+    string: the string on which to check the presence of letters.
+    Returns true if the string contains letters, false otherwise.
+    '''
+    for s in string:
+        if s.isalpha():
+            return True
+    return False
+
+def parse_samples(path, columns):
+    '''
+    Parses a CS or CPU trace. Rows where a field contains letters or is not a number (such as the header) are skipped.
+    path: the path to the trace.
+    columns: the name and the kind of each column of the trace.
+    Returns a Trace containing the parsed columns and, in column 'line', the line of the trace each row was read from (starting from 0).
+    Raises ValueError if a row does not have the expected number of columns.
+    '''
+    with open_trace(path) as csvfile:
+        return parse_sample_rows(csv.reader(csvfile), columns)
+
+def parse_sample_rows(rows, columns, first_line=0):
+    '''
+    Parses the rows of a CS or CPU trace (see parse_samples).
+    rows: the rows to parse, as lists of strings.
+    columns: the name and the kind of each column of the trace.
+    first_line: the line of the trace the first row was read from.
+    '''
+    values = [[] for column in columns]
+    lines = []
+    for line, row in enumerate(rows, first_line):
+        if len(row) != len(columns):
+            raise ValueError("Wrong trace format")
+        try:
+            parsed = []
+            for field, (name, kind) in zip(row, columns):
+                if contains_letters(field):
+                    raise ValueError("Not a number")
+                parsed.append(int(field) if kind == NUMBER else float(field))
+        except ValueError:
+            continue
+        for column, value in zip(values, parsed):
+            column.append(value)
+        lines.append(line)
+    result = dict((name, numpy.array(column, dtype=KIND_TYPES[kind])) for (name, kind), column in zip(columns, values))
+    result["line"] = numpy.array(lines, dtype=numpy.int64)
+    return Trace(result)
+
+def parse_gc(path):
+    '''
+    Parses a GC trace, where each two rows contain the start and end timestamp of a GC cycle.
+    GC cycles where a timestamp contains letters, is not an integer or is negative are skipped.
+    Returns a Trace containing the start and end timestamp of each cycle.
+    Raises ValueError if a row does not have the expected number of columns.
+    '''
+    starts = []
+    ends = []
+    with open_trace(path) as csvfile:
+        csvreader = csv.reader(csvfile)
+        start = None
+        for line, row in enumerate(csvreader):
+            if len(row) != len(GC_COLUMNS):
+                raise ValueError("Wrong trace format")
+            if line % 2 == 0:
+                start = row[1]
+                continue
+            if contains_letters(start) or contains_letters(row[1]) or start.startswith("-") or row[1].startswith("-"):
+                continue
+            try:
+                start_time, end_time = int(start), int(row[1])
+            except ValueError:
+                continue
+            starts.append(start_time)
+            ends.append(end_time)
+    return Trace({"start": numpy.array(starts, dtype=numpy.int64), "end": numpy.array(ends, dtype=numpy.int64)})
+
+def load_samples(path, kind, cache=False):
+    '''
+    Loads a CS, CPU, or GC trace.
+    path: the path to the trace.
+    kind: the kind of trace, either "cs", "cpu", or "gc".
+    cache: whether to use the cache of the trace. If the cache is outdated or missing, the trace is parsed and the cache is written.
+    Returns a Trace.
+    Raises ValueError if a row does not have the expected number of columns.
+    '''
+    columns = {"cs": CS_COLUMNS, "cpu": CPU_COLUMNS, "gc": GC_COLUMNS}[kind]
+    if kind != "gc":
+        columns = columns + [("line", NUMBER)]
+    if cache:
+        cached = trace_cache.open_cache(path, kind)
+        if cached is not None:
+            return Trace(dict((name, cached.arrays[name]) for name, column_kind in columns))
+    if kind == "gc":
+        trace = parse_gc(path)
+    else:
+        trace = parse_samples(path, columns[:-1])
+    if cache:
+        writer = trace_cache.CacheWriter(path, kind, dict((name, KIND_TYPES[column_kind]) for name, column_kind in columns))
+        writer.append(trace.columns)
+        writer.commit({})
+    return trace